@@ -3,6 +3,8 @@
 from dash import Dash, html, page_container
 import dash_bootstrap_components as dbc
 from navbar import create_navbar
+from pages.functions import metrics_functions as mfu
+from pages.functions import export_functions as efu
 
 NAVBAR = create_navbar()
 APP_TITLE = "Design Group Dashboard"
@@ -23,6 +25,8 @@ app = Dash(
 )
 
 server = app.server
+mfu.instrument_app(app)  # Callback timings and the /metrics route
+efu.register_export_routes(app)  # CSV and Parquet downloads
 
 app.layout = html.Div(
     children=[
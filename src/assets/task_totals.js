@@ -0,0 +1,93 @@
+// Clientside callbacks for the Task Specific Metrics page. Dash loads every
+// .js file in assets/ automatically.
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    task_metrics: {
+        // Same output as update_totals_calc, computed from the bars already
+        // in the figure so zooming needs no server round trip. The last
+        // output is totals-fallback, set to relayoutData when the figure
+        // doesn't have the bars' data so the server totals the zoom instead.
+        totals: function(relayoutData, figure, ddStartDate, ddEndDate) {
+            const PreventUpdate = window.dash_clientside.PreventUpdate;
+            const noUpdate = window.dash_clientside.no_update;
+            if (!relayoutData) {
+                throw PreventUpdate;
+            }
+
+            // Dates are compared as "YYYY-MM-DD" strings
+            let startDate;
+            let endDate;
+            // Compared tasks have one x axis per task (xaxis2, xaxis3, ...)
+            // that all share a range
+            const firstKey = Object.keys(relayoutData)[0];
+            const match = /^(xaxis\d*)\.(range\[0\]|autorange)$/.exec(firstKey);
+            const axis = match ? match[1] : null;
+            const prop = match ? match[2] : null;
+            if (prop === "range[0]") {  // Scaled by user
+                startDate = String(relayoutData[`${axis}.range[0]`]).slice(0, 10);
+                endDate = String(relayoutData[`${axis}.range[1]`]).slice(0, 10);
+            } else if (prop === "autorange") {  // Autoscaled
+                startDate = ddStartDate.slice(0, 10);
+                endDate = ddEndDate.slice(0, 10);
+            } else {  // Axis not scaled
+                throw PreventUpdate;
+            }
+
+            // Bars sent as plain arrays, not e.g. typed array specs
+            const hasBars = figure && Array.isArray(figure.data)
+                && figure.data.every(function(trace) {
+                    return Array.isArray(trace.x) && Array.isArray(trace.y);
+                });
+            if (!hasBars) {
+                return [noUpdate, noUpdate, noUpdate, relayoutData];
+            }
+            if (figure.data.length === 0) {  // Nothing selected
+                throw PreventUpdate;
+            }
+
+            // Match Python's str(float), e.g. 12.0 and 12.25
+            const formatHours = function(hours) {
+                const rounded = Math.round(hours * 100) / 100;
+                return Number.isInteger(rounded)
+                    ? rounded.toFixed(1) : String(rounded);
+            };
+            const formatDate = function(isoDate) {
+                const [year, month, day] = isoDate.split("-");
+                return `${month}/${day}/${year}`;
+            };
+
+            const totals = {};
+            let department = 0;
+            figure.data.forEach(function(trace) {
+                let total = 0;
+                const xs = trace.x;
+                const ys = trace.y;
+                for (let i = 0; i < xs.length; i++) {
+                    const bucket = String(xs[i]).slice(0, 10);
+                    if (bucket >= startDate && bucket <= endDate) {
+                        total += Number(ys[i]) || 0;
+                    }
+                }
+                // Compared tasks draw each engineer once per task
+                totals[trace.name] = (totals[trace.name] || 0) + total;
+                department += total;
+            });
+
+            const engineerTotal = function(name) {
+                return `${name}: ${formatHours(totals[name] || 0)} Hours`;
+            };
+            // One header per engineer on the team, indexed by display name
+            const headers = window.dash_clientside.callback_context
+                .outputs_list[2];
+
+            return [
+                `Results: ${formatDate(startDate)} to ${formatDate(endDate)}`,
+                `Department Total: ${formatHours(department)} Hours`,
+                headers.map(function(output) {
+                    return engineerTotal(output.id.index);
+                }),
+                noUpdate,
+            ];
+        },
+    },
+});
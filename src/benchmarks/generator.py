@@ -0,0 +1,146 @@
+#!python3.11
+
+import numpy as np
+import polars as pl
+import datetime as dt
+from pages.functions.global_vars import (
+    TS_COLUMNS,
+    TS_DB_DTYPES,
+    ENGINEER_NAMES,
+)
+
+# Share of timesheet entries per category, close to the production table
+CATEGORY_WEIGHTS = {
+    "ECR": 0.30,
+    "EWR": 0.15,
+    "NPR": 0.10,
+    "NCR": 0.04,
+    "TR": 0.04,
+    "EN": 0.04,
+    "Model": 0.10,
+    "Meetings": 0.11,
+    "Misc.": 0.12,
+}
+MEETING_NAMES = ["STANDUP", "DESIGN REVIEW", "SAFETY", "TRAINING", "1:1"]
+
+
+def engineer_usernames(engineers: int) -> list[str]:
+    """
+    Function that returns the usernames used for generated entries, the known
+    engineers first and numbered ones after
+    :param engineers: Number of engineers
+    return usernames: List of usernames
+    """
+    usernames = list(ENGINEER_NAMES.keys())[:engineers]
+    usernames += [f"engineer{i}" for i in range(len(usernames), engineers)]
+    return usernames
+
+
+def generate_ts_frame(
+    rows: int,
+    engineers: int = 4,
+    tasks: int = 500,
+    start_date: dt.date = dt.date(2018, 1, 1),
+    years: int = 6,
+    seed: int = 0,
+) -> pl.DataFrame:
+    """
+    Function that builds a synthetic timesheet table shaped like the output of
+    page_functions.query_ts_table before normalize_ts_frame. Each task number
+    is worked on by a few engineers over a window of weeks to months, task
+    numbers are reused with a skew so some tasks get most of the hours, and a
+    small share of entries carry lower case or padded task numbers and blank
+    strings like hand entered rows do.
+    :param rows: Number of timesheet entries
+    :param engineers: Number of engineers
+    :param tasks: Number of task numbers per task type
+    :param start_date: Date of the earliest possible entry
+    :param years: Length of the generated history in years
+    :param seed: Random seed, the same arguments always give the same table
+    return df: DataFrame with TS_COLUMNS and TS_DB_DTYPES, sorted by Date
+    """
+    rng = np.random.default_rng(seed)
+    total_days = 365 * years
+    categories = list(CATEGORY_WEIGHTS.keys())
+    weights = np.array(list(CATEGORY_WEIGHTS.values()))
+
+    category_idx = rng.choice(
+        len(categories), size=rows, p=weights / weights.sum()
+    )
+    # Zipf-like reuse, low task ids get far more entries than high ones
+    task_idx = np.minimum(rng.zipf(1.3, size=rows) - 1, tasks - 1)
+    task_idx = (task_idx * 7919 + category_idx) % tasks  # Spread hot tasks
+
+    # Every task has its own start and a lognormal lifetime in days
+    task_starts = rng.integers(0, total_days, size=tasks)
+    task_lengths = np.clip(
+        rng.lognormal(mean=3.5, sigma=0.8, size=tasks), 1, total_days
+    ).astype(np.int64)
+    offsets = (rng.random(rows) * task_lengths[task_idx]).astype(np.int64)
+    days = np.minimum(task_starts[task_idx] + offsets, total_days - 1)
+
+    # Quarter hour entries, mostly under a full day
+    hours = np.clip(np.round(rng.gamma(2.0, 1.5, size=rows) * 4) / 4, 0.25, 12)
+
+    # Every task number spelled three ways, row labels are gathered from it
+    task_columns = TS_COLUMNS[3:10]  # Task columns and Model
+    numbers = [f"{i:05d}" for i in range(tasks)]
+    labels = []
+    for column in task_columns:
+        labels += [f"{column}-{number}" for number in numbers]
+        labels += [f"{column}-{number}".lower() for number in numbers]
+        labels += [f" {column}-{number} " for number in numbers]
+    noise = rng.random(rows)
+    # About 2% lower case and 1% padded with spaces
+    variant = np.select([noise < 0.02, noise < 0.03], [1, 2], 0)
+    column_idx = np.minimum(category_idx, len(task_columns) - 1)
+    label_idx = (column_idx * 3 + variant) * tasks + task_idx
+
+    df = pl.DataFrame({
+        "Day": days,
+        TS_COLUMNS[1]: pl.Series(engineer_usernames(engineers)).gather(
+            rng.integers(0, engineers, size=rows)
+        ),
+        TS_COLUMNS[2]: hours,
+        "Category": pl.Series(categories).gather(category_idx),
+        "Task": pl.Series(labels).gather(label_idx),
+        "Meeting": pl.Series(MEETING_NAMES).gather(
+            task_idx % len(MEETING_NAMES)
+        ),
+        "Noise": noise,
+    }).with_columns(
+        (pl.lit(start_date) + pl.duration(days=pl.col("Day"))).alias(
+            TS_COLUMNS[0]
+        ),
+    )
+
+    # 1% of untouched cells are blank instead of null
+    empty = pl.when(pl.col("Noise") > 0.99).then(pl.lit("")).otherwise(None)
+    columns = [
+        pl.when(pl.col("Category") == column).then(
+            pl.col("Task")
+        ).otherwise(empty).alias(column)
+        for column in task_columns
+    ]
+    columns.append(
+        pl.when(pl.col("Category") == "Meetings").then(
+            pl.col("Meeting")
+        ).otherwise(None).alias(TS_COLUMNS[10])
+    )
+    columns.append(
+        pl.when(pl.col("Category") == "Misc.").then(
+            pl.lit("General support")
+        ).otherwise(None).alias(TS_COLUMNS[11])
+    )
+    columns.append(
+        pl.when(pl.col("Noise") < 0.25).then(
+            pl.lit("Updated drawings per markup")
+        ).otherwise(None).alias(TS_COLUMNS[12])
+    )
+
+    df = df.with_columns(columns).select(
+        pl.col(column).cast(dtype)
+        for column, dtype in zip(TS_COLUMNS, TS_DB_DTYPES)
+    ).sort(TS_COLUMNS[0])
+
+    return df
@@ -0,0 +1,266 @@
+#!python3.11
+"""
+Times the dashboard's hot paths on synthetic timesheet data and saves the
+results as JSON so two commits can be compared. Run from src/:
+
+    python -m benchmarks.run --rows 10000 100000 1000000
+    python -m benchmarks.run --compare benchmarks/results/<old>.json
+"""
+
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from io import StringIO
+import polars as pl
+from pages.functions import page_functions as pfu
+from pages.functions import time_allocation_functions as tafu
+from pages.functions import task_specific_metrics_functions as tsmfu
+from pages.functions.global_vars import TS_COLUMNS
+from .generator import generate_ts_frame
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+# Task numbers passed to the task specific benchmarks, busiest first
+BENCH_TASK_TYPE = "ECR"
+BENCH_TASK_COUNT = 3
+# Date groupings the hours cube benchmarks slice at, one level each
+CUBE_BENCH_GROUPINGS = ["1d", "1w", "1mo"]
+
+
+def time_call(func, repeat: int) -> dict:
+    """
+    Function that calls func repeat times after one warm up call
+    :param func: Callable without arguments
+    :param repeat: Number of timed calls
+    return timings: Dictionary of min, median, and mean seconds
+    """
+    func()  # Warm up caches and lazy imports
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+
+    return {
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.fmean(samples),
+        "repeat": repeat,
+    }
+
+
+def busiest_tasks(df: pl.DataFrame, task_type: str, count: int) -> list[str]:
+    """
+    Function that finds the task numbers with the most entries
+    :param df: Output from page_functions.normalize_ts_frame
+    :param task_type: Task column to look in
+    :param count: Number of task numbers to return
+    return tasks: List of task numbers, busiest first
+    """
+    return df.filter(
+        pl.col(task_type).is_not_null()
+    ).group_by(
+        pl.col(task_type).cast(pl.Utf8)
+    ).len().sort(
+        "len", descending=True
+    ).head(count)[task_type].to_list()
+
+
+def build_cases(raw_df: pl.DataFrame) -> dict:
+    """
+    Function that builds one callable per benchmark case for a table
+    :param raw_df: Output from generator.generate_ts_frame
+    return cases: Dictionary of case name -> callable without arguments
+    """
+    df = pfu.normalize_ts_frame(raw_df)
+    task_numbers = busiest_tasks(df, BENCH_TASK_TYPE, BENCH_TASK_COUNT)
+    start_date, end_date, date_grouping = tsmfu.find_task_dates(
+        df, BENCH_TASK_TYPE, task_numbers
+    )
+    stats_df, _ = tsmfu.task_specific_metrics(
+        df,
+        BENCH_TASK_TYPE,
+        task_numbers,
+        start_date,
+        end_date,
+        date_grouping,
+    )
+
+    hours_cube = tsmfu.build_hours_cube(df)
+
+    def cube_metrics(date_grouping):
+        # What the Task Workflow graph runs for a METRICS_CACHE miss
+        return lambda: tsmfu.cube_task_specific_metrics(
+            hours_cube,
+            BENCH_TASK_TYPE,
+            task_numbers,
+            start_date,
+            end_date,
+            date_grouping,
+        )
+
+    def store_round_trip():
+        # What the page did before the dataset moved server side
+        json_data = raw_df.write_json()
+        pl.read_json(StringIO(json_data))
+
+    return {
+        "normalize_ts_frame": lambda: pfu.normalize_ts_frame(raw_df),
+        "find_task_type_hours": lambda: tafu.find_task_type_hours(df),
+        "find_unique_tasks": lambda: tsmfu.find_unique_tasks(
+            df, BENCH_TASK_TYPE
+        ),
+        "find_task_dates": lambda: tsmfu.find_task_dates(
+            df, BENCH_TASK_TYPE, task_numbers
+        ),
+        "task_specific_metrics": lambda: tsmfu.task_specific_metrics(
+            df,
+            BENCH_TASK_TYPE,
+            task_numbers,
+            start_date,
+            end_date,
+            date_grouping,
+        ),
+        "build_totals_dict": lambda: tsmfu.build_totals_dict(stats_df),
+        "build_task_index": lambda: tsmfu.build_task_index(df),
+        "build_hours_cube": lambda: tsmfu.build_hours_cube(df),
+        **{
+            f"cube_metrics_{date_grouping}": cube_metrics(date_grouping)
+            for date_grouping in CUBE_BENCH_GROUPINGS
+        },
+        "store_round_trip": store_round_trip,
+    }
+
+
+def git_commit() -> str | None:
+    """
+    Function that returns the current git commit hash, None outside a checkout
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(__file__),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(
+    rows: list[int],
+    engineers: int,
+    tasks: int,
+    repeat: int,
+    case_names: list[str] | None = None,
+) -> dict:
+    """
+    Function that times every case at every table size
+    :param rows: Table sizes to generate
+    :param engineers: Number of engineers in the generated tables
+    :param tasks: Number of task numbers per task type
+    :param repeat: Number of timed calls per case
+    :param case_names: Cases to run, None for all of them
+    return report: Dictionary with run metadata and a list of results
+    """
+    results = []
+    for row_count in rows:
+        raw_df = generate_ts_frame(row_count, engineers=engineers, tasks=tasks)
+        cases = build_cases(raw_df)
+        for name, func in cases.items():
+            if case_names and name not in case_names:
+                continue
+            timings = time_call(func, repeat)
+            results.append({"case": name, "rows": row_count, **timings})
+            print(
+                f"{name:<24} {row_count:>10,} rows "
+                f"{timings['median'] * 1000:>10.2f} ms"
+            )
+
+    return {
+        "commit": git_commit(),
+        "created": dt.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "polars": pl.__version__,
+        "machine": platform.machine(),
+        "columns": TS_COLUMNS,
+        "params": {
+            "rows": rows,
+            "engineers": engineers,
+            "tasks": tasks,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare_reports(old_report: dict, new_report: dict) -> list[str]:
+    """
+    Function that lines up two reports by case and table size
+    :param old_report: Report from an earlier run
+    :param new_report: Report from this run
+    return lines: One line per case found in both, with the median ratio
+    """
+    old_results = {
+        (result["case"], result["rows"]): result
+        for result in old_report["results"]
+    }
+    lines = []
+    for result in new_report["results"]:
+        old_result = old_results.get((result["case"], result["rows"]))
+        if old_result is None:
+            continue
+        ratio = result["median"] / old_result["median"]
+        lines.append(
+            f"{result['case']:<24} {result['rows']:>10,} rows "
+            f"{old_result['median'] * 1000:>10.2f} -> "
+            f"{result['median'] * 1000:>10.2f} ms ({ratio:.2f}x)"
+        )
+
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--engineers", type=int, default=4)
+    parser.add_argument("--tasks", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--cases", nargs="+", default=None)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--compare", default=None)
+    args = parser.parse_args()
+
+    report = run_benchmarks(
+        args.rows, args.engineers, args.tasks, args.repeat, args.cases
+    )
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(
+            RESULTS_DIR,
+            f"{report['commit'] or 'nocommit'}-"
+            f"{dt.datetime.now().strftime('%Y%m%d%H%M%S')}.json",
+        )
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            old_report = json.load(f)
+        print(f"Compared to {old_report.get('commit')}:")
+        for line in compare_reports(old_report, report):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
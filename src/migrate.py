@@ -0,0 +1,37 @@
+#!python3.11
+"""
+Creates the database objects the dashboard reads but never creates itself.
+Run from src/ with a role that can create tables, triggers and indexes on
+TS_TABLE:
+
+    python migrate.py rollup        # Daily rollup table and its triggers
+    python migrate.py keyset-index  # (Date, primary key) index for the grid
+"""
+
+import argparse
+from pages.functions import page_functions as pfu
+from pages.functions import grid_functions as gfu
+
+MIGRATIONS = {
+    "rollup": pfu.install_ts_rollup,
+    "keyset-index": gfu.install_ts_keyset_index,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "migrations",
+        nargs="+",
+        choices=list(MIGRATIONS),
+        help="Migrations to run, in order",
+    )
+    args = parser.parse_args()
+
+    for name in args.migrations:
+        MIGRATIONS[name]()
+        print(f"{name}: done")
+
+
+if __name__ == "__main__":
+    main()
@@ -24,6 +24,10 @@ def create_navbar():
                         "Task Specific Metrics",
                         href="/task-specific-metrics"
                     ),
+                    dbc.DropdownMenuItem(
+                        "Timesheet Browser",
+                        href="/timesheet-browser"
+                    ),
                 ],
             ),
         ],
@@ -1,3 +1,11 @@
 from . import page_functions as pfu
 from . import time_allocation_functions as tafu
 from . import task_specific_metrics_functions as tmsfu
+from . import dataset_functions as dsfu
+from . import cache_functions as cfu
+from . import figure_functions as ffu
+from . import metrics_functions as mfu
+from . import background_functions as bgfu
+from . import roster_functions as rfu
+from . import export_functions as efu
+from . import grid_functions as gfu
@@ -0,0 +1,101 @@
+#!python3.11
+
+import os
+import uuid
+import tempfile
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+import diskcache
+from dash import DiskcacheManager
+from dash.exceptions import PreventUpdate
+from dotenv import load_dotenv
+
+load_dotenv()
+# Directory shared by every worker for background callback jobs and results
+BACKGROUND_CACHE_DIR = os.environ.get(
+    "BACKGROUND_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "dashboard-background-callbacks"),
+)
+# Seconds a finished job's result is kept for the browser to collect
+BACKGROUND_RESULT_EXPIRE = int(
+    os.environ.get("BACKGROUND_RESULT_EXPIRE", "600")
+)
+# Background jobs run at once per worker process, later jobs wait their turn
+BACKGROUND_THREADS = int(os.environ.get("BACKGROUND_THREADS", "4"))
+
+_CURRENT_JOB = contextvars.ContextVar("background_job", default=None)
+
+
+class ThreadedDiskcacheManager(DiskcacheManager):
+    """
+    DiskcacheManager that runs jobs on a thread pool in the worker process
+    instead of forking a process per job. Polars deadlocks in a process
+    forked after its thread pool has started, which every worker's has once
+    the dataset is cached. Results, progress and job state still go through
+    the disk cache, so any worker can answer the browser's polling requests.
+    Jobs cannot be killed, so cancelling is cooperative, see
+    raise_if_cancelled.
+    :param cache: diskcache.Cache shared by every worker
+    :param expire: Seconds results and job state are kept
+    :param max_workers: Number of jobs run at once
+    """
+
+    def __init__(
+        self,
+        cache: diskcache.Cache,
+        expire: int | None = None,
+        max_workers: int = BACKGROUND_THREADS,
+    ):
+        super().__init__(cache, expire=expire)
+        self.expire = expire
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="background-callback",
+        )
+
+    def call_job_fn(self, key, job_fn, args, context) -> str:
+        job = uuid.uuid4().hex
+        self.handle.set(f"{job}-running", True, expire=self.expire)
+
+        def run_job():
+            _CURRENT_JOB.set(job)
+            try:
+                job_fn(key, self._make_progress_key(key), args, context)
+            finally:
+                self.handle.delete(f"{job}-running")
+
+        self._executor.submit(contextvars.copy_context().run, run_job)
+        return job
+
+    def job_running(self, job) -> bool:
+        return self.handle.get(f"{job}-running") is not None
+
+    def terminate_job(self, job) -> None:
+        if job and self.job_running(job):
+            self.handle.set(f"{job}-cancelled", True, expire=self.expire)
+
+    def terminate_unhealthy_job(self, job) -> bool:
+        return False  # Job ids are not process ids
+
+    def cancelled(self, job: str | None) -> bool:
+        """
+        Method that checks whether a job has been cancelled
+        :param job: Job id from call_job_fn
+        """
+        return job is not None and self.handle.get(f"{job}-cancelled") is not None
+
+
+BACKGROUND_MANAGER = ThreadedDiskcacheManager(
+    diskcache.Cache(BACKGROUND_CACHE_DIR),
+    expire=BACKGROUND_RESULT_EXPIRE,
+)
+
+
+def raise_if_cancelled() -> None:
+    """
+    Function for background callbacks to call between steps. Raises
+    PreventUpdate once the user has cancelled the running job, which ends it
+    without changing any outputs. Does nothing outside a background job.
+    """
+    if BACKGROUND_MANAGER.cancelled(_CURRENT_JOB.get()):
+        raise PreventUpdate
@@ -0,0 +1,195 @@
+#!python3.11
+
+import time
+import threading
+import datetime as dt
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+import polars as pl
+
+
+class LRUCache:
+    """
+    Bounded, thread safe least-recently-used cache with hit, miss and
+    eviction counters.
+    :param max_size: Number of entries kept before the oldest is evicted
+    """
+
+    def __init__(self, max_size: int = 128):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Method that looks up a key and marks it as recently used
+        :param key: Hashable cache key
+        :param default: Value returned when the key is not cached
+        return value: Cached value or default
+        """
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Method that stores a value, evicting the least recently used entries
+        once the cache is full
+        :param key: Hashable cache key
+        :param value: Value to cache
+        """
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Method that returns the cached value for a key, computing and caching
+        it on a miss. compute runs outside the lock, so two threads missing
+        on the same key may both compute it.
+        :param key: Hashable cache key
+        :param compute: Function with no arguments returning the value
+        return value: Cached or freshly computed value
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value)
+
+        return value
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """
+        Method that drops every entry whose key matches a predicate
+        :param predicate: Function taking a key, True to drop the entry
+        return num_dropped: Number of entries dropped
+        """
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+
+        return len(keys)
+
+    def stats(self) -> dict:
+        """
+        Method that reports the cache counters
+        return stats: Dictionary with size, max_size, hits, misses and
+                      evictions
+        """
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class DayRangeCache:
+    """
+    Cache of per-day DataFrames for date range queries. A range is answered
+    from the cached days and only the gaps need fetching. Days within
+    volatile_days of today may still be edited, so they are fetched again
+    once older than ttl seconds; earlier days are kept until evicted.
+    :param schema: Schema of the cached frames, including date_column
+    :param date_column: Column holding the day of each row
+    :param max_days: Days kept before the least recently used is evicted
+    :param ttl: Seconds a recent day is trusted before it is fetched again
+    :param volatile_days: Days before today counted as recent
+    """
+
+    def __init__(
+        self,
+        schema: dict,
+        date_column: str = "Date",
+        max_days: int = 3660,
+        ttl: float = 900,
+        volatile_days: int = 14,
+    ):
+        self.schema = schema
+        self.date_column = date_column
+        self.ttl = ttl
+        self.volatile_days = volatile_days
+        self._days = LRUCache(max_days)  # Day -> (fetched at, DataFrame)
+
+    def _is_fresh(self, day: dt.date, fetched_at: float) -> bool:
+        recent = day >= dt.date.today() - dt.timedelta(days=self.volatile_days)
+        return not recent or time.time() - fetched_at < self.ttl
+
+    def get_range(
+        self,
+        start_date: dt.date,
+        end_date: dt.date,
+    ) -> (pl.DataFrame, list[tuple[dt.date, dt.date]]):
+        """
+        Method that looks up every day in a range
+        :param start_date: dt.date of the first day
+        :param end_date: dt.date after the last day
+        return df: DataFrame with the rows of every fresh cached day
+        return missing: List of (start, end) ranges of days to fetch, end
+                        exclusive, in order
+        """
+        frames = []
+        missing = []
+        gap_start = None
+        day = start_date
+        while day < end_date:
+            entry = self._days.get(day)
+            if entry is not None and self._is_fresh(day, entry[0]):
+                frames.append(entry[1])
+                if gap_start is not None:
+                    missing.append((gap_start, day))
+                    gap_start = None
+            elif gap_start is None:
+                gap_start = day
+            day += dt.timedelta(days=1)
+        if gap_start is not None:
+            missing.append((gap_start, end_date))
+
+        df = pl.concat(frames) if frames else pl.DataFrame(schema=self.schema)
+        return df, missing
+
+    def put_range(
+        self,
+        start_date: dt.date,
+        end_date: dt.date,
+        df: pl.DataFrame,
+    ) -> None:
+        """
+        Method that caches the rows fetched for a range. Days in the range
+        without rows are cached as empty.
+        :param start_date: dt.date of the first day
+        :param end_date: dt.date after the last day
+        :param df: DataFrame with the schema, rows for days in the range
+        """
+        fetched_at = time.time()
+        df = df.cast(self.schema)
+        days = df.partition_by([self.date_column], as_dict=True)
+        empty = df.clear()
+        day = start_date
+        while day < end_date:
+            self._days.put(day, (fetched_at, days.get((day,), empty)))
+            day += dt.timedelta(days=1)
+
+    def stats(self) -> dict:
+        """
+        Method that reports the cache counters, counted per day looked up
+        return stats: Dictionary like LRUCache.stats
+        """
+        return self._days.stats()
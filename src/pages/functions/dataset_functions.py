@@ -0,0 +1,496 @@
+#!python3.11
+
+import os
+import time
+import logging
+import threading
+import datetime as dt
+from contextlib import contextmanager
+from typing import Any, Callable
+try:
+    import fcntl
+except ImportError:  # Windows, the shared dataset needs a POSIX file lock
+    fcntl = None
+# Imported before any warm-up thread starts. Otherwise the first numpy import
+# can happen in the warm-up thread (polars) and a request thread (plotly) at
+# once, leaving one of them with a half initialized module.
+import numpy  # noqa: F401
+import polars as pl
+import schedule
+from dotenv import load_dotenv
+from . import page_functions as pfu
+from . import metrics_functions as mfu
+from . import roster_functions as rfu
+
+load_dotenv()
+TS_TABLE = os.environ.get("TS_TABLE")
+# Minutes between background refreshes of the cached dataset
+REFRESH_MINUTES = int(os.environ.get("DATASET_REFRESH_MINUTES", "15"))
+# "table" reads TS_TABLE (through the Parquet mirror when TS_MIRROR_DIR is
+# set), "rollup" reads the much smaller daily rollup table
+DATASET_SOURCE = os.environ.get("TS_DATASET_SOURCE", "table")
+# Directory holding an Arrow IPC copy of the dataset that every worker
+# memory-maps, so one copy is shared through the page cache. Empty to keep
+# a private copy per worker.
+SHARED_DATASET_DIR = os.environ.get("TS_SHARED_DATASET_DIR", "")
+
+# Number of dataset versions to keep in memory. Keeping the previous version
+# lets callbacks from a page loaded just before a refresh finish cleanly.
+MAX_VERSIONS = 2
+
+_DATASETS = {}  # Dataset version -> DataFrame
+_DERIVED = {}  # Dataset version -> {name: value built from that DataFrame}
+_VERSION_ORDER = []  # Oldest to newest
+_LOCK = threading.Lock()
+_LOAD_LOCK = threading.Lock()  # Only one thread queries the table at a time
+_LAST_REFRESHED = None
+_DROP_LISTENERS = []  # Called with each version id dropped from the cache
+_SCHEDULER_PID = None  # Process that owns the refresh thread
+
+logger = logging.getLogger(__name__)
+
+
+def dataset_version(df: pl.DataFrame) -> str:
+    """
+    Function that builds a version id for a DataFrame from its contents, so
+    every worker that loads the same data hands out the same id.
+    :param df: Output from page_functions.query_ts_table
+    return version: String id for the dataset
+    """
+    # Categorical codes depend on each process's string cache, hash the text
+    hash_df = df.with_columns(pl.col(pl.Categorical).cast(pl.Utf8))
+    row_hash = hash_df.hash_rows(seed=0).sum() if len(df) > 0 else 0
+    return f"{len(df)}-{row_hash:016x}"
+
+
+def cache_dataset(df: pl.DataFrame, version: str | None = None) -> str:
+    """
+    Function that stores a DataFrame in the process cache and makes it the
+    current dataset.
+    :param df: Output from page_functions.query_ts_table
+    :param version: String id already computed for df, None to compute it
+    return version: String id to keep in a dcc.Store in place of the data
+    """
+    if version is None:
+        version = dataset_version(df)
+    dropped_versions = []
+    with _LOCK:
+        _DATASETS[version] = df
+        if version in _VERSION_ORDER:
+            _VERSION_ORDER.remove(version)
+        _VERSION_ORDER.append(version)
+        # Drop the oldest versions once over the limit
+        while len(_VERSION_ORDER) > MAX_VERSIONS:
+            dropped = _VERSION_ORDER.pop(0)
+            del _DATASETS[dropped]
+            _DERIVED.pop(dropped, None)
+            dropped_versions.append(dropped)
+
+    for dropped in dropped_versions:
+        for listener in _DROP_LISTENERS:
+            listener(dropped)
+
+    return version
+
+
+def add_drop_listener(listener: Callable[[str], None]) -> None:
+    """
+    Function that registers a function to call whenever a dataset version is
+    dropped from the cache, so results cached per version can be cleared.
+    :param listener: Function taking the dropped version id
+    """
+    _DROP_LISTENERS.append(listener)
+
+
+def current_version() -> str | None:
+    """
+    Function that returns the version id of the newest cached dataset
+    return version: String id, None if nothing has been cached yet
+    """
+    with _LOCK:
+        return _VERSION_ORDER[-1] if _VERSION_ORDER else None
+
+
+def resolve_version(version: str | None = None) -> str:
+    """
+    Function that maps a version id from a dcc.Store to a cached version.
+    Falls back to the current dataset when the version has been dropped or
+    was cached by another worker, loading it if nothing is cached yet.
+    :param version: String id from cache_dataset
+    return version: String id of a cached dataset
+    """
+    with _LOCK:
+        if version in _DATASETS:
+            return version
+        latest = _VERSION_ORDER[-1] if _VERSION_ORDER else None
+
+    if latest is None:  # Warm-up has not finished, load on first use
+        latest = ensure_dataset()
+
+    return latest
+
+
+def get_dataset(version: str | None = None) -> pl.DataFrame:
+    """
+    Function that looks up a cached DataFrame by version id, see
+    resolve_version for the fallbacks.
+    :param version: String id from cache_dataset
+    return df: Cached Polars DataFrame
+    """
+    version = resolve_version(version)
+    with _LOCK:
+        if version not in _DATASETS:  # Replaced by a refresh in the meantime
+            version = _VERSION_ORDER[-1]
+        return _DATASETS[version]
+
+
+def get_derived(
+    version: str | None,
+    name: str,
+    builder: Callable[[pl.DataFrame], Any],
+) -> Any:
+    """
+    Function that returns a value built from a cached dataset, building it on
+    first use. The value is kept until the dataset version is dropped, so
+    indexes and lookups are built once per refresh instead of per callback.
+    :param version: String id from cache_dataset
+    :param name: Name of the derived value, e.g. "task_index"
+    :param builder: Function taking the DataFrame and returning the value
+    return value: Output of builder for the dataset
+    """
+    version = resolve_version(version)
+    with _LOCK:
+        derived = _DERIVED.get(version, {})
+        if name in derived:
+            return derived[name]
+
+    value = builder(get_dataset(version))
+    with _LOCK:
+        if version in _DATASETS:  # Don't keep values for dropped versions
+            _DERIVED.setdefault(version, {})[name] = value
+
+    return value
+
+
+def get_roster(version: str | None = None) -> pl.DataFrame:
+    """
+    Function that returns the roster for everyone in a cached dataset
+    :param version: String id from cache_dataset
+    return roster_df: Output from roster_functions.load_roster
+    """
+    return get_derived(version, "roster", rfu.dataset_roster)
+
+
+def get_team_dataset(
+    version: str | None,
+    team: str | None,
+) -> pl.DataFrame:
+    """
+    Function that returns one team's entries from a cached dataset. The
+    dataset is sorted by team, so this is a slice of it, not a copy.
+    :param version: String id from cache_dataset
+    :param team: Team name from get_roster, None for every team
+    return df: Polars DataFrame of the team's timesheet entries, empty for a
+               team with none
+    """
+    version = resolve_version(version)
+    df = get_dataset(version)
+    if team is None:
+        return df
+
+    slices = get_derived(version, "team_slices", rfu.team_slices)
+    offset, length = slices.get(team, (0, 0))
+    return df.slice(offset, length)
+
+
+def get_team_derived(
+    version: str | None,
+    team: str | None,
+    name: str,
+    builder: Callable[[pl.DataFrame], Any],
+) -> Any:
+    """
+    Function that does get_derived for one team's entries
+    :param version: String id from cache_dataset
+    :param team: Team name from get_roster, None for every team
+    :param name: Name of the derived value, e.g. "task_index"
+    :param builder: Function taking the team's DataFrame and returning the
+                    value
+    return value: Output of builder for the team's entries
+    """
+    version = resolve_version(version)
+    return get_derived(
+        version,
+        f"{name}:{team}",
+        lambda df: builder(get_team_dataset(version, team)),
+    )
+
+
+def load_ts_dataset() -> pl.DataFrame:
+    """
+    Function that loads the full timesheet table. When TS_MIRROR_DIR is set
+    the local Parquet mirror is synced and read instead, so a refresh only
+    pulls the newest rows from the database. When TS_DATASET_SOURCE is
+    "rollup" the daily rollup is read instead, which is enough for the task
+    metrics but not for Time Allocation categories. Entries are sorted by
+    team, so get_team_dataset can hand out each team's part without a copy.
+    return df: Polars DataFrame containing all timesheet entries
+    """
+    # Categorical, upper-cased task columns so callbacks skip string work
+    if DATASET_SOURCE == "rollup":
+        df = pfu.rollup_to_ts_frame(pfu.query_ts_rollup())  # Normalized
+    elif pfu.TS_MIRROR_DIR:
+        pfu.sync_ts_mirror()
+        # Read and normalized in one lazy plan over the Parquet partitions
+        df = pfu.scan_ts_mirror().collect()
+    else:
+        df = pfu.normalize_ts_frame(pfu.query_ts_table_partitioned())
+
+    return rfu.assign_teams(df, rfu.dataset_roster(df))
+
+
+@contextmanager
+def _shared_lock():
+    # Held while a worker checks, loads or publishes the shared dataset, so
+    # only one worker queries the database per refresh
+    if fcntl is None:
+        raise RuntimeError("TS_SHARED_DATASET_DIR needs fcntl (Linux, macOS)")
+    os.makedirs(SHARED_DATASET_DIR, exist_ok=True)
+    with open(os.path.join(SHARED_DATASET_DIR, ".lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _shared_pointer_path() -> str:
+    return os.path.join(SHARED_DATASET_DIR, "current")
+
+
+def shared_dataset_path() -> str | None:
+    """
+    Function that returns the Arrow IPC file currently published in
+    SHARED_DATASET_DIR
+    return path: Path of the file, None if nothing has been published
+    """
+    try:
+        with open(_shared_pointer_path()) as f:
+            file_name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return os.path.join(SHARED_DATASET_DIR, file_name)
+
+
+def publish_shared_dataset(df: pl.DataFrame) -> str:
+    """
+    Function that writes a dataset to SHARED_DATASET_DIR and points every
+    worker at it. The file and the pointer are each written under a temporary
+    name and renamed into place, so readers see the old dataset or the new
+    one, never a partial file. Files from older versions are removed; workers
+    still mapping them keep their mapping until they let go.
+    :param df: Output from load_ts_dataset
+    return path: Path of the published file
+    """
+    version = dataset_version(df)
+    file_name = f"ts-{version}.arrow"
+    path = os.path.join(SHARED_DATASET_DIR, file_name)
+    if not os.path.exists(path):
+        # Uncompressed so the columns can be mapped without decoding, and
+        # with future so String columns are written as views that map as
+        # they are instead of being copied into every worker
+        df.write_ipc(path + ".tmp", compression="uncompressed", future=True)
+        os.replace(path + ".tmp", path)
+    else:  # Same data as an earlier version, keep it from being pruned
+        os.utime(path)
+
+    pointer_path = _shared_pointer_path()
+    with open(pointer_path + ".tmp", "w") as f:
+        f.write(file_name)
+    os.replace(pointer_path + ".tmp", pointer_path)
+
+    # Keep as many files as versions cached in each worker
+    files = sorted(
+        (
+            os.path.join(SHARED_DATASET_DIR, f)
+            for f in os.listdir(SHARED_DATASET_DIR)
+            if f.startswith("ts-") and f.endswith(".arrow")
+        ),
+        key=os.path.getmtime,
+    )
+    for old_path in files[:-MAX_VERSIONS]:
+        if old_path != path:
+            os.remove(old_path)
+
+    return path
+
+
+def map_shared_dataset(path: str) -> (str, pl.DataFrame):
+    """
+    Function that memory-maps a published dataset file
+    :param path: Output from publish_shared_dataset or shared_dataset_path
+    return version: String id of the dataset, taken from the file name
+    return df: Polars DataFrame backed by the mapped file where the columns
+               allow it. Categorical codes are still rebuilt against each
+               worker's string cache; Enum columns would map as well, but
+               comparing them to a value outside their categories raises
+    """
+    version = os.path.basename(path)[len("ts-"):-len(".arrow")]
+    return version, pl.read_ipc(path, memory_map=True)
+
+
+def _load_shared(max_age: float) -> (str, pl.DataFrame):
+    with _shared_lock():
+        path = shared_dataset_path()
+        if (
+            path is None
+            or not os.path.exists(path)
+            or time.time() - os.path.getmtime(_shared_pointer_path()) > max_age
+        ):  # Nothing published yet, or too old, this worker reloads it
+            path = publish_shared_dataset(load_ts_dataset())
+
+    return map_shared_dataset(path)
+
+
+def _load_and_cache() -> str:
+    global _LAST_REFRESHED
+
+    if SHARED_DATASET_DIR:
+        # Workers refreshing within half an interval of another worker map
+        # the file it published instead of querying the database again
+        version, df = _load_shared(max_age=REFRESH_MINUTES * 60 / 2)
+        version = cache_dataset(df, version)
+    else:
+        df = load_ts_dataset()
+        version = cache_dataset(df)
+    _LAST_REFRESHED = dt.datetime.now()
+
+    return version
+
+
+def refresh_dataset() -> str:
+    """
+    Function that reloads the timesheet table and caches it as the current
+    dataset.
+    return version: String id of the refreshed dataset
+    """
+    with _LOAD_LOCK:
+        return _load_and_cache()
+
+
+def ensure_dataset() -> str:
+    """
+    Function that makes sure a dataset is cached, loading it if nothing has
+    been loaded yet, and that this process has a refresh thread running.
+    return version: String id of the current dataset
+    """
+    start_refresh_scheduler()
+    with _LOAD_LOCK:
+        version = current_version()
+        if version is None:  # First use in this process
+            version = _load_and_cache()
+
+    return version
+
+
+def last_refreshed() -> dt.datetime | None:
+    """
+    Function that returns when the cached dataset was last loaded
+    return last_refreshed: dt.datetime, None if it has not been loaded yet
+    """
+    return _LAST_REFRESHED
+
+
+def current_row_count() -> int:
+    """
+    Function that returns the number of rows in the newest cached dataset
+    without loading one
+    return num_rows: Row count, 0 if nothing has been cached yet
+    """
+    with _LOCK:
+        if not _VERSION_ORDER:
+            return 0
+        return len(_DATASETS[_VERSION_ORDER[-1]])
+
+
+def cached_bytes() -> int:
+    """
+    Function that returns the estimated size of every cached dataset version
+    return num_bytes: Sum of DataFrame.estimated_size over the versions
+    """
+    with _LOCK:
+        frames = list(_DATASETS.values())
+    return sum(df.estimated_size() for df in frames)
+
+
+mfu.DATASET_ROWS.set_function(current_row_count)
+mfu.DATASET_BYTES.set_function(cached_bytes)
+
+
+def start_warmup() -> threading.Thread:
+    """
+    Function that loads the dataset in a background thread so the worker can
+    serve requests while the table is queried.
+    return thread: The started warm-up thread
+    """
+    thread = threading.Thread(
+        target=ensure_dataset,
+        name="dataset-warmup",
+        daemon=True,
+    )
+    thread.start()
+
+    return thread
+
+
+def scheduled_refresh() -> None:
+    """
+    Function that does refresh_dataset for the refresh thread. A failed
+    refresh, e.g. while Postgres is down, is logged and the cached dataset
+    keeps being served until the next interval tries again.
+    """
+    try:
+        refresh_dataset()
+    except Exception:
+        logger.exception("Scheduled dataset refresh failed")
+
+
+def run_scheduler(scheduler: schedule.Scheduler, poll_seconds: float = 1):
+    """
+    Function that runs a scheduler's jobs forever, the refresh thread's
+    target. An exception from a job is logged and never ends the loop, the
+    thread is the only one a process gets.
+    :param scheduler: schedule.Scheduler with the jobs to run
+    :param poll_seconds: Seconds between checks for jobs that are due
+    """
+    while True:
+        try:
+            scheduler.run_pending()
+        except Exception:
+            logger.exception("Dataset refresh scheduler failed")
+        time.sleep(poll_seconds)
+
+
+def start_refresh_scheduler(minutes: int = REFRESH_MINUTES) -> None:
+    """
+    Function that starts a background thread refreshing the dataset every
+    few minutes. Safe to call repeatedly; each process (gunicorn worker)
+    starts at most one thread.
+    :param minutes: Minutes between refreshes
+    """
+    global _SCHEDULER_PID
+
+    with _LOCK:
+        if _SCHEDULER_PID == os.getpid():  # Already running in this process
+            return
+        _SCHEDULER_PID = os.getpid()
+
+    scheduler = schedule.Scheduler()
+    scheduler.every(minutes).minutes.do(scheduled_refresh)
+
+    threading.Thread(
+        target=run_scheduler,
+        args=(scheduler,),
+        name="dataset-refresh",
+        daemon=True,
+    ).start()
@@ -0,0 +1,317 @@
+#!python3.11
+
+import io
+import os
+import datetime as dt
+from typing import Iterator
+from urllib.parse import urlencode
+import flask
+import polars as pl
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+from . import dataset_functions as dsfu
+from . import roster_functions as rfu
+from . import task_specific_metrics_functions as tsmfu
+from . import time_allocation_functions as tafu
+from .global_vars import TS_COLUMNS, TS_DB_DTYPES, TASK_TYPES, DATE_GROUPINGS
+
+load_dotenv()
+# Route prefix the exports are served under, e.g. /export/entries
+EXPORT_PATH = os.environ.get("EXPORT_PATH", "/export")
+# Dataset rows filtered and written per chunk of an entries export
+EXPORT_BATCH_ROWS = int(os.environ.get("EXPORT_BATCH_ROWS", "50000"))
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+EXPORT_KINDS = ("entries", "task-workflow", "division-of-labor")
+# Exported entries have the table's columns and dtypes
+ENTRIES_SCHEMA = dict(zip(TS_COLUMNS, TS_DB_DTYPES))
+# Casts from the in-memory schema to ENTRIES_SCHEMA. Time is float32 in
+# memory, so it is rounded to the hundredth like HOURS_SUM, otherwise 0.1
+# would be written as 0.10000000149011612.
+ENTRIES_SELECT = [
+    pl.col(col).cast(dtype).round(2) if col == TS_COLUMNS[2]
+    else pl.col(col).cast(dtype)
+    for col, dtype in ENTRIES_SCHEMA.items()
+]
+
+
+def export_url(kind: str, export_format: str = "csv", **filters) -> str:
+    """
+    Function that builds the link to an export
+    :param kind: One of EXPORT_KINDS
+    :param export_format: One of EXPORT_FORMATS
+    :param filters: Query parameters read by parse_export_args, None values
+                    and empty lists are left out
+    return url: Path and query string of the export
+    """
+    params = [("format", export_format)]
+    for name, value in filters.items():
+        if isinstance(value, (list, tuple)):
+            params += [(name, item) for item in value]
+        elif value is not None:
+            params.append((name, value))
+
+    return f"{EXPORT_PATH}/{kind}?{urlencode(params)}"
+
+
+def _parse_date(args, name: str) -> dt.date | None:
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        return dt.date.fromisoformat(value[0:10])
+    except ValueError:
+        raise ValueError(f"{name} must be a date like 2024-01-31")
+
+
+def parse_export_args(args) -> dict:
+    """
+    Function that reads the filters of an export request, the same ones the
+    pages use
+    :param args: flask.request.args
+    return filters: Dictionary with format, team, task_type, task_numbers,
+                    start_date, end_date and date_grouping
+    """
+    filters = {
+        "format": args.get("format", "csv"),
+        "team": args.get("team") or None,
+        "task_type": args.get("task_type") or None,
+        "task_numbers": [
+            number.upper() for number in args.getlist("task_number")
+        ],
+        "start_date": _parse_date(args, "start_date"),
+        "end_date": _parse_date(args, "end_date"),
+        "date_grouping": args.get("date_grouping") or None,
+    }
+
+    if filters["format"] not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    if filters["task_type"] not in (None, *TASK_TYPES):
+        raise ValueError(f"task_type must be one of {', '.join(TASK_TYPES)}")
+    if filters["date_grouping"] not in (None, *DATE_GROUPINGS):
+        raise ValueError(
+            f"date_grouping must be one of {', '.join(DATE_GROUPINGS)}"
+        )
+    if filters["task_numbers"] and filters["task_type"] is None:
+        raise ValueError("task_number needs a task_type")
+
+    return filters
+
+
+def entry_batches(
+    df: pl.DataFrame,
+    slices: list[tuple[int, int]],
+    filters: dict,
+) -> Iterator[pl.DataFrame]:
+    """
+    Function that filters a cached dataset a batch at a time
+    :param df: Output from dataset_functions.get_dataset
+    :param slices: (offset, length) of each team to export, from
+                   roster_functions.team_slices. Each is sorted by Date.
+    :param filters: Output from parse_export_args
+    return batches: Iterator of DataFrames with ENTRIES_SCHEMA, never more
+                    than EXPORT_BATCH_ROWS rows each
+    """
+    condition = pl.lit(True)
+    if filters["task_type"] is not None:
+        task_col = pl.col(filters["task_type"])
+        if filters["task_numbers"]:
+            condition = condition & task_col.is_in(filters["task_numbers"])
+        else:
+            condition = condition & task_col.is_not_null()
+
+    for offset, length in slices:
+        team_df = df.slice(offset, length)
+        # Dates are sorted within a team, so the range is two binary searches
+        first, last = 0, length
+        if filters["start_date"] is not None:
+            first = team_df[TS_COLUMNS[0]].search_sorted(
+                filters["start_date"], side="left"
+            )
+        if filters["end_date"] is not None:
+            last = team_df[TS_COLUMNS[0]].search_sorted(
+                filters["end_date"], side="right"
+            )
+
+        for batch_start in range(first, last, EXPORT_BATCH_ROWS):
+            batch_length = min(EXPORT_BATCH_ROWS, last - batch_start)
+            batch = team_df.slice(batch_start, batch_length).lazy().filter(
+                condition
+            ).select(
+                ENTRIES_SELECT
+            ).collect()
+            if len(batch) > 0:
+                yield batch
+
+
+def csv_chunks(
+    batches: Iterator[pl.DataFrame],
+    schema: dict,
+) -> Iterator[bytes]:
+    """
+    Function that writes DataFrames as one CSV, a chunk per DataFrame
+    :param batches: Iterator of DataFrames with the same columns
+    :param schema: Dictionary of column name -> dtype, for the header
+    return chunks: Iterator of CSV bytes, the header first
+    """
+    yield pl.DataFrame(schema=schema).write_csv().encode()
+    for batch in batches:
+        yield batch.write_csv(include_header=False).encode()
+
+
+def parquet_chunks(
+    batches: Iterator[pl.DataFrame],
+    schema: dict,
+) -> Iterator[bytes]:
+    """
+    Function that writes DataFrames as one Parquet file, a row group per
+    DataFrame. Each row group is sent as soon as it is written and the
+    footer comes last, so only one batch is held at a time.
+    :param batches: Iterator of DataFrames with the same columns
+    :param schema: Dictionary of column name -> dtype
+    return chunks: Iterator of Parquet bytes
+    """
+    sink = io.BytesIO()
+    arrow_schema = pl.DataFrame(schema=schema).to_arrow().schema
+    with pq.ParquetWriter(sink, arrow_schema) as writer:
+        for batch in batches:
+            writer.write_table(batch.to_arrow())
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    yield sink.getvalue()
+
+
+def task_workflow_frame(version: str, filters: dict) -> pl.DataFrame:
+    """
+    Function that builds the numbers behind the Task Workflow graph
+    :param version: String id from dataset_functions.cache_dataset
+    :param filters: Output from parse_export_args, with a task type and task
+                    numbers. Dates and grouping default to the task's, like
+                    the page.
+    return stats_df: Output from task_specific_metrics
+    """
+    if filters["task_type"] is None or not filters["task_numbers"]:
+        raise ValueError("task-workflow needs a task_type and task_number")
+
+    team = filters["team"]
+    task_index = dsfu.get_team_derived(
+        version, team, "task_index", tsmfu.build_task_index
+    )
+    start_date, end_date, date_grouping = tsmfu.find_task_dates_from_index(
+        task_index, filters["task_type"], filters["task_numbers"]
+    )
+    if start_date is None:  # No entries for these tasks
+        start_date = end_date = dt.date.today()
+
+    stats_df, _, _ = tsmfu.cached_task_specific_metrics(
+        version,
+        dsfu.get_team_derived(
+            version, team, "hours_cube", tsmfu.build_hours_cube
+        ),
+        filters["task_type"],
+        filters["task_numbers"],
+        filters["start_date"] or start_date,
+        filters["end_date"] or end_date,
+        filters["date_grouping"] or date_grouping,
+        rfu.team_engineers(dsfu.get_roster(version), team),
+    )
+
+    return stats_df.sort(TS_COLUMNS[0])
+
+
+def division_of_labor_frame(version: str, filters: dict) -> pl.DataFrame:
+    """
+    Function that builds the numbers behind the Division of Labor graph
+    :param version: String id from dataset_functions.cache_dataset, for the
+                    roster
+    :param filters: Output from parse_export_args, with both dates. The end
+                    date is exclusive, like the page.
+    return stats_df: Output from time_allocation_functions
+                     format_task_type_hours
+    """
+    if filters["start_date"] is None or filters["end_date"] is None:
+        raise ValueError("division-of-labor needs a start_date and end_date")
+
+    engineer_names = rfu.team_engineers(
+        dsfu.get_roster(version), filters["team"]
+    )
+    hours_df = tafu.cached_task_type_hours(
+        filters["start_date"],
+        filters["end_date"],
+        engineers=list(engineer_names.keys()),
+    )
+
+    return tafu.format_task_type_hours(hours_df, engineer_names)
+
+
+def export_response(kind: str, filters: dict) -> flask.Response:
+    """
+    Function that streams an export. Entries are filtered and written a
+    batch at a time, so a long history is never held in memory at once.
+    :param kind: One of EXPORT_KINDS
+    :param filters: Output from parse_export_args
+    return response: Streamed flask.Response, sent as an attachment. Raises
+                     ValueError for entries when the dataset is loaded from
+                     the daily rollup.
+    """
+    if kind == "entries" and dsfu.DATASET_SOURCE == "rollup":
+        # The rollup keeps daily totals per task, not the entries themselves
+        raise ValueError("entries can't be exported from the daily rollup")
+
+    version = dsfu.resolve_version()
+    if kind == "entries":
+        # The frame is looked up now, a refresh mid-stream doesn't change it
+        df = dsfu.get_dataset(version)
+        team_slices = dsfu.get_derived(version, "team_slices", rfu.team_slices)
+        if filters["team"] is None:
+            slices = list(team_slices.values())
+        else:
+            slices = [team_slices.get(filters["team"], (0, 0))]
+        batches = entry_batches(df, slices, filters)
+        schema = ENTRIES_SCHEMA
+    else:
+        if kind == "task-workflow":
+            stats_df = task_workflow_frame(version, filters)
+        else:
+            stats_df = division_of_labor_frame(version, filters)
+        batches = iter([stats_df])
+        schema = stats_df.schema
+
+    if filters["format"] == "csv":
+        chunks = csv_chunks(batches, schema)
+    else:
+        chunks = parquet_chunks(batches, schema)
+
+    file_name = f"{kind}-{dt.date.today().isoformat()}.{filters['format']}"
+    return flask.Response(
+        chunks,
+        mimetype=EXPORT_FORMATS[filters["format"]],
+        headers={
+            "Content-Disposition": f'attachment; filename="{file_name}"'
+        },
+    )
+
+
+def register_export_routes(app) -> None:
+    """
+    Function that adds the export routes to the app's Flask server:
+    EXPORT_PATH/entries, EXPORT_PATH/task-workflow and
+    EXPORT_PATH/division-of-labor. Query parameters are format (csv or
+    parquet), team, task_type, task_number (repeated), start_date, end_date
+    and date_grouping.
+    :param app: dash.Dash instance
+    """
+
+    @app.server.route(f"{EXPORT_PATH}/<kind>")
+    def export(kind):
+        if kind not in EXPORT_KINDS:
+            flask.abort(404)
+        try:
+            filters = parse_export_args(flask.request.args)
+            return export_response(kind, filters)
+        except ValueError as e:
+            flask.abort(400, description=str(e))
@@ -0,0 +1,158 @@
+#!python3.11
+
+import plotly.graph_objects as go
+import plotly.io as pio
+from plotly.subplots import make_subplots
+from dash import Patch, html
+import dash_bootstrap_components as dbc
+
+
+def build_bar_figure(
+    x: list,
+    y_columns: dict,
+    title: str,
+    xaxis_title: str | None = None,
+    yaxis_title: str | None = None,
+) -> go.Figure:
+    """
+    Function that builds a stacked bar figure with one trace per column, laid
+    out like px.bar(df, x=..., y=[...], template="darkly")
+    :param x: List of x values shared by every trace
+    :param y_columns: Dictionary of trace name -> list of y values
+    :param title: Figure title
+    :param xaxis_title: x axis title, None for no title
+    :param yaxis_title: y axis title, None for no title
+    return fig: Plotly Figure
+    """
+    fig = go.Figure(
+        data=[
+            go.Bar(name=name, x=x, y=y, legendgroup=name)
+            for name, y in y_columns.items()
+        ],
+    )
+    fig.update_layout(
+        template="darkly",
+        title=title,
+        barmode="relative",
+        legend_title_text="variable" if y_columns else None,
+        xaxis_title=xaxis_title,
+        yaxis_title=yaxis_title,
+    )
+
+    return fig
+
+
+def update_bar_figure(
+    current_traces: list[str] | None,
+    x: list,
+    y_columns: dict,
+    title: str,
+    xaxis_title: str | None = None,
+    yaxis_title: str | None = None,
+) -> (go.Figure | Patch, list[str]):
+    """
+    Function that updates a figure from build_bar_figure. When the trace names
+    match the ones already drawn only the trace data and x axis title are
+    sent as a Patch, otherwise the whole figure is rebuilt.
+    :param current_traces: Trace names already drawn, kept in a dcc.Store
+    :param x: List of x values shared by every trace
+    :param y_columns: Dictionary of trace name -> list of y values
+    :param title: Figure title
+    :param xaxis_title: x axis title, None for no title
+    :param yaxis_title: y axis title, None for no title
+    return fig: Plotly Figure or Dash Patch for the figure property
+    return trace_names: Trace names drawn after the update
+    """
+    trace_names = list(y_columns.keys())
+    if trace_names != current_traces:  # Different traces, rebuild
+        fig = build_bar_figure(x, y_columns, title, xaxis_title, yaxis_title)
+        return fig, trace_names
+
+    patched_fig = Patch()
+    for i, y in enumerate(y_columns.values()):
+        patched_fig["data"][i]["x"] = x
+        patched_fig["data"][i]["y"] = y
+    patched_fig["layout"]["xaxis"]["title"]["text"] = xaxis_title
+    patched_fig["layout"]["xaxis"]["autorange"] = True  # Drop any zoom
+
+    return patched_fig, trace_names
+
+
+def build_faceted_bar_figure(
+    x_by_facet: dict,
+    y_columns_by_facet: dict,
+    title: str,
+    xaxis_title: str | None = None,
+    yaxis_title: str | None = None,
+) -> go.Figure:
+    """
+    Function that builds stacked bar figures like build_bar_figure, one row
+    per facet on a shared x axis. Traces with the same name share a color
+    and a legend entry across the facets.
+    :param x_by_facet: Dictionary of facet title -> list of x values
+    :param y_columns_by_facet: Dictionary of facet title -> dictionary of
+                               trace name -> list of y values
+    :param title: Figure title
+    :param xaxis_title: Bottom x axis title, None for no title
+    :param yaxis_title: y axis title, None for no title
+    return fig: Plotly Figure
+    """
+    facets = list(x_by_facet.keys())
+    rows = max(len(facets), 1)
+    fig = make_subplots(
+        rows=rows,
+        cols=1,
+        shared_xaxes=True,
+        subplot_titles=facets,
+        vertical_spacing=min(0.08, 0.3 / rows),
+    )
+
+    colorway = pio.templates["darkly"].layout.colorway
+    colors = {}
+    for row, facet in enumerate(facets, start=1):
+        for name, y in y_columns_by_facet[facet].items():
+            if name not in colors:
+                colors[name] = colorway[len(colors) % len(colorway)]
+            fig.add_trace(
+                go.Bar(
+                    name=name,
+                    x=x_by_facet[facet],
+                    y=y,
+                    legendgroup=name,
+                    showlegend=row == 1,
+                    marker_color=colors[name],
+                ),
+                row=row,
+                col=1,
+            )
+
+    fig.update_layout(
+        template="darkly",
+        title=title,
+        barmode="relative",
+        height=max(450, 220 * rows),
+    )
+    fig.update_xaxes(title_text=xaxis_title, row=rows, col=1)
+    fig.update_yaxes(title_text=yaxis_title)
+
+    return fig
+
+
+def build_table(columns: list[str], rows: list[list]) -> dbc.Table:
+    """
+    Function that builds a small table for results shown under a graph
+    :param columns: Header of each column
+    :param rows: List of rows, each a list of cell values
+    return table: dbc.Table
+    """
+    return dbc.Table(
+        [
+            html.Thead(html.Tr([html.Th(column) for column in columns])),
+            html.Tbody(
+                [html.Tr([html.Td(cell) for cell in row]) for row in rows]
+            ),
+        ],
+        bordered=True,
+        hover=True,
+        size="sm",
+    )
@@ -2,6 +2,7 @@ import polars as pl
 
 global TS_COLUMNS
 global TS_DTYPES
+global TS_DB_DTYPES
 
 TS_COLUMNS = [
     "Date",
@@ -19,7 +20,27 @@ TS_COLUMNS = [
     "Comments",
 ]
 
+# In-memory dtypes, applied by page_functions.normalize_ts_frame. Engineer and
+# task columns repeat a small set of values, so they are stored as
+# categoricals, and Time never needs more than float32 precision.
 TS_DTYPES = [
+    pl.Date,
+    pl.Categorical,
+    pl.Float32,
+    pl.Categorical,
+    pl.Categorical,
+    pl.Categorical,
+    pl.Categorical,
+    pl.Categorical,
+    pl.Categorical,
+    pl.Categorical,
+    pl.Categorical,
+    pl.Utf8,
+    pl.Utf8,
+]
+
+# Dtypes as read from the database and stored in the Parquet mirror
+TS_DB_DTYPES = [
     pl.Date,
     pl.Utf8,
     pl.Float64,
@@ -34,3 +55,53 @@ TS_DTYPES = [
     pl.Utf8,
     pl.Utf8,
 ]
+
+# Sum of Time over a group. Summed as float64 and rounded to the hundredth
+# so float32 hours like 0.1 don't show up as 0.10000000149.
+HOURS_SUM = pl.col(TS_COLUMNS[2]).cast(pl.Float64).sum().round(2)
+
+# Date groupings for the task graphs, finest first, with their approximate
+# length in days for counting the bars a date range needs
+DATE_GROUPINGS = {
+    "1d": 1,
+    "1w": 7,
+    "2w": 14,
+    "1mo": 30.44,
+    "1q": 91.31,
+    "1y": 365.25,
+}
+
+# Engineer usernames in TS_COLUMNS[1] and the names shown on the dashboard
+ENGINEER_NAMES = {
+    "ashahinian": "Andre",
+    "jbarron": "Jacob",
+    "jtorres": "Josiah",
+    "malpert": "Michael",
+}
+
+# Columns of the roster table, each engineer's display name and team
+ROSTER_COLUMNS = ["Engineer", "Name", "Team"]
+# Column added to the cached dataset holding each entry's team
+TEAM_COLUMN = ROSTER_COLUMNS[2]
+
+# Columns holding a task number (ECR, EWR, NPR, NCR, TR, EN)
+TASK_COLUMNS = TS_COLUMNS[3:9]
+
+# Rules for the Time Allocation categories, as (category, column that must be
+# filled, columns that must be null). A task only counts when no other task
+# and no meeting was logged on the same entry, and Misc. is an entry with no
+# task, model or meeting at all.
+TASK_CATEGORY_RULES = [
+    (col, col, [c for c in TASK_COLUMNS if c != col] + [TS_COLUMNS[10]])
+    for col in TASK_COLUMNS
+] + [
+    (TS_COLUMNS[9], TS_COLUMNS[9], TASK_COLUMNS + [TS_COLUMNS[10]]),
+    (TS_COLUMNS[10], TS_COLUMNS[10], []),
+    ("Misc.", None, TS_COLUMNS[3:11]),
+]
+
+# Task columns a task number can be looked up in (ECR through Meetings)
+TASK_TYPES = TS_COLUMNS[3:11]
+# Task columns summed into the daily rollup table
+ROLLUP_TASK_TYPES = TASK_TYPES
+ROLLUP_COLUMNS = ["Date", "Engineer", "TaskType", "TaskNumber", "Time"]
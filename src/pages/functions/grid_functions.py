@@ -0,0 +1,231 @@
+#!python3.11
+
+import os
+import json
+import polars as pl
+from dotenv import load_dotenv
+from . import page_functions as pfu
+from .cache_functions import LRUCache
+from .global_vars import TS_COLUMNS, TS_DB_DTYPES
+
+load_dotenv()
+TS_TABLE = os.environ.get("TS_TABLE")
+# Primary key of TS_TABLE, the tie breaker for rows on the same Date
+TS_PRIMARY_KEY = os.environ.get("TS_PRIMARY_KEY", "id")
+# Rows per block the Timesheet Browser grid asks for
+GRID_BLOCK_SIZE = int(os.environ.get("GRID_BLOCK_SIZE", "100"))
+# Block boundaries remembered per worker for keyset pagination
+GRID_CURSOR_CACHE_SIZE = int(
+    os.environ.get("GRID_CURSOR_CACHE_SIZE", "1024")
+)
+
+# (sort, filters, start row) -> (Date, primary key) of the row before it
+GRID_CURSORS = LRUCache(GRID_CURSOR_CACHE_SIZE)
+_KEY_CHECKED = False  # check_primary_key passed in this process
+
+TEXT_CONDITIONS = {  # AG Grid text filter type -> (operator, pattern)
+    "contains": ("ILIKE", "%{}%"),
+    "notContains": ("NOT ILIKE", "%{}%"),
+    "equals": ("ILIKE", "{}"),
+    "notEqual": ("NOT ILIKE", "{}"),
+    "startsWith": ("ILIKE", "{}%"),
+    "endsWith": ("ILIKE", "%{}"),
+}
+COMPARE_CONDITIONS = {  # AG Grid number and date filter type -> operator
+    "equals": "=",
+    "notEqual": "<>",
+    "lessThan": "<",
+    "lessThanOrEqual": "<=",
+    "greaterThan": ">",
+    "greaterThanOrEqual": ">=",
+}
+GRID_FILTER_OPTIONS = {  # Filter types offered per AG Grid filter
+    "agTextColumnFilter": list(TEXT_CONDITIONS) + ["blank", "notBlank"],
+    "agNumberColumnFilter": (
+        list(COMPARE_CONDITIONS) + ["inRange", "blank", "notBlank"]
+    ),
+    "agDateColumnFilter": [
+        "equals", "notEqual", "lessThan", "greaterThan", "inRange", "blank",
+        "notBlank",
+    ],
+}
+
+
+def check_primary_key() -> None:
+    """
+    Function that makes sure TS_PRIMARY_KEY is a column of TS_TABLE. The
+    grid sorts and pages on it, so a wrong name would otherwise only show up
+    as a failed query for every block. Raises ValueError if it is missing.
+    """
+    schema, _, table = TS_TABLE.rpartition(".")
+    q_string = (
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_name = %(table)s AND column_name = %(column)s AND "
+    )
+    params = {"table": table, "column": TS_PRIMARY_KEY}
+    if schema:
+        q_string += "table_schema = %(schema)s"
+        params["schema"] = schema
+    else:  # Unqualified, resolved through the search path
+        q_string += "table_schema = ANY(current_schemas(false))"
+    df = pfu.read_query(q_string, params, source="check_primary_key")
+    if len(df) == 0:
+        raise ValueError(
+            f"TS_PRIMARY_KEY {TS_PRIMARY_KEY!r} is not a column of {TS_TABLE}"
+        )
+
+
+def install_ts_keyset_index() -> None:
+    """
+    Function that creates the (Date, primary key) index the Timesheet
+    Browser pages through, if it is missing. The app never runs it, it is a
+    one-off migration run with "python migrate.py keyset-index" by a role
+    that can create indexes on TS_TABLE.
+    """
+    check_primary_key()
+    index_name = TS_TABLE.split(".")[-1] + "_date_key_idx"
+    with pfu.db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {index_name} ON {TS_TABLE} "
+                f'("{TS_COLUMNS[0]}", "{TS_PRIMARY_KEY}")'
+            )
+
+
+def _condition_sql(column: str, model: dict, params: dict) -> str:
+    # One AG Grid filter condition, values are bound as parameters
+    def bind(value) -> str:
+        name = f"p{len(params)}"
+        params[name] = value
+        return f"%({name})s"
+
+    col_sql = f'"{column}"'
+    filter_type = model.get("type")
+    if filter_type == "blank":
+        return f"({col_sql} IS NULL OR {col_sql}::text = '')"
+    if filter_type == "notBlank":
+        return f"({col_sql} IS NOT NULL AND {col_sql}::text <> '')"
+
+    if model.get("filterType") == "text":
+        if filter_type not in TEXT_CONDITIONS:
+            raise ValueError(f"Unsupported text filter: {filter_type}")
+        operator, pattern = TEXT_CONDITIONS[filter_type]
+        value = str(model.get("filter", ""))
+        # Match the typed text literally, not as a LIKE pattern
+        value = value.replace("\\", "\\\\").replace("%", "\\%")
+        value = value.replace("_", "\\_")
+        return f"{col_sql} {operator} {bind(pattern.format(value))}"
+
+    if model.get("filterType") == "date":
+        low = (model.get("dateFrom") or "")[0:10] or None
+        high = (model.get("dateTo") or "")[0:10] or None
+    elif model.get("filterType") == "number":
+        low, high = model.get("filter"), model.get("filterTo")
+    else:
+        raise ValueError(f"Unsupported filter: {model.get('filterType')}")
+
+    if filter_type == "inRange":
+        return f"{col_sql} BETWEEN {bind(low)} AND {bind(high)}"
+    if filter_type not in COMPARE_CONDITIONS:
+        raise ValueError(f"Unsupported filter: {filter_type}")
+    return f"{col_sql} {COMPARE_CONDITIONS[filter_type]} {bind(low)}"
+
+
+def filter_sql(filter_model: dict | None, params: dict) -> list[str]:
+    """
+    Function that turns an AG Grid filter model into SQL conditions. Only
+    TS_COLUMNS can be filtered and every value is a bound parameter.
+    :param filter_model: getRowsRequest filterModel, column -> filter
+    :param params: Dictionary the values are added to
+    return conditions: List of SQL conditions to AND together
+    """
+    conditions = []
+    for column, model in (filter_model or {}).items():
+        if column not in TS_COLUMNS:
+            raise ValueError(f"Unknown column: {column}")
+        if "conditions" in model:  # Two conditions joined by AND or OR
+            operator = " OR " if model.get("operator") == "OR" else " AND "
+            parts = [
+                _condition_sql(column, condition, params)
+                for condition in model["conditions"]
+            ]
+            conditions.append("(" + operator.join(parts) + ")")
+        else:
+            conditions.append(_condition_sql(column, model, params))
+
+    return conditions
+
+
+def query_grid_rows(
+    start_row: int,
+    end_row: int,
+    sort_model: list[dict] | None = None,
+    filter_model: dict | None = None,
+) -> (list[dict], int | None):
+    """
+    Function that reads one block of timesheet entries for the Timesheet
+    Browser. Blocks are read with keyset pagination on (Date, primary key):
+    the last row of each block is remembered, so the next block starts
+    from an index seek instead of skipping start_row rows. Jumping to a
+    block that hasn't been reached by scrolling falls back to OFFSET.
+    :param start_row: First row of the block
+    :param end_row: Row after the last row of the block
+    :param sort_model: getRowsRequest sortModel, only Date can be sorted
+    :param filter_model: getRowsRequest filterModel, see filter_sql
+    return rows: List of row dictionaries, Dates as "%Y-%m-%d" strings
+    return row_count: Total rows once the last block is reached, else None
+    """
+    global _KEY_CHECKED
+
+    if not _KEY_CHECKED:  # Once per process, before the first block
+        check_primary_key()
+        _KEY_CHECKED = True
+
+    descending = True  # Newest entries first
+    for sort in sort_model or []:
+        if sort.get("colId") == TS_COLUMNS[0]:
+            descending = sort.get("sort") != "asc"
+
+    params = {}
+    conditions = filter_sql(filter_model, params)
+    key = (descending, json.dumps(filter_model or {}, sort_keys=True))
+    cursor = GRID_CURSORS.get(key + (start_row,)) if start_row > 0 else None
+    if cursor is not None:
+        params["cursor_date"], params["cursor_key"] = cursor
+        conditions.append(
+            f'("{TS_COLUMNS[0]}", "{TS_PRIMARY_KEY}") '
+            + ("<" if descending else ">")
+            + " (%(cursor_date)s, %(cursor_key)s)"
+        )
+
+    direction = "DESC" if descending else "ASC"
+    columns = ", ".join(f'"{col}"' for col in [TS_PRIMARY_KEY] + TS_COLUMNS)
+    q_string = f"SELECT {columns} FROM {TS_TABLE}"
+    if conditions:
+        q_string += " WHERE " + " AND ".join(conditions)
+    q_string += (
+        f' ORDER BY "{TS_COLUMNS[0]}" {direction},'
+        f' "{TS_PRIMARY_KEY}" {direction}'
+        f" LIMIT {int(end_row - start_row)}"
+    )
+    if cursor is None and start_row > 0:  # Block not reached by scrolling
+        q_string += f" OFFSET {int(start_row)}"
+    df = pfu.read_query(
+        q_string,
+        params,
+        dict(zip(TS_COLUMNS, TS_DB_DTYPES)),
+        source="query_grid_rows",
+    )
+
+    if len(df) == end_row - start_row:  # Not the last block
+        row_count = None
+        GRID_CURSORS.put(
+            key + (end_row,),
+            (df[TS_COLUMNS[0]][-1], df[TS_PRIMARY_KEY][-1]),
+        )
+    else:
+        row_count = start_row + len(df)
+
+    rows = df.with_columns(pl.col(TS_COLUMNS[0]).cast(pl.Utf8)).to_dicts()
+
+    return rows, row_count
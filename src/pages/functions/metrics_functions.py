@@ -0,0 +1,360 @@
+#!python3.11
+
+import os
+import time
+import resource
+import threading
+from bisect import bisect_left
+from typing import Callable
+import flask
+from dotenv import load_dotenv
+
+load_dotenv()
+# Route the Prometheus text exposition is served on
+METRICS_PATH = os.environ.get("METRICS_PATH", "/metrics")
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+BYTES_BUCKETS = tuple(256 * 4 ** i for i in range(10))  # 256 B to 64 MiB
+ROWS_BUCKETS = (0, 10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+def _format_labels(label_names: tuple, label_values: tuple) -> str:
+    if not label_names:
+        return ""
+    pairs = []
+    for name, value in zip(label_names, label_values):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+        value = value.replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """
+    Base class for a named metric with optional labels. Values are kept per
+    process, so under gunicorn each worker reports its own.
+    :param name: Metric name, e.g. dash_callback_duration_seconds
+    :param documentation: One line description used for # HELP
+    :param label_names: Names of the labels every observation carries
+    """
+
+    kind = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple = (),
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = {}  # Tuple of label values -> value
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def samples(self) -> list[tuple[str, tuple, tuple, float]]:
+        """
+        Method that returns every sample as (name suffix, label names, label
+        values, value)
+        """
+        with self._lock:
+            return [
+                ("", self.label_names, key, value)
+                for key, value in self._values.items()
+            ]
+
+    def render(self) -> list[str]:
+        """
+        Method that renders the metric in the Prometheus text format
+        return lines: List of lines, without trailing newlines
+        """
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for suffix, names, values, value in self.samples():
+            labels = _format_labels(names, values)
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """
+    Metric that only goes up, e.g. number of queries run
+    """
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """
+    Metric that is set to a current value, or read from a function when
+    scraped
+    """
+
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._function = None
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], float | dict]) -> None:
+        """
+        Method that makes the gauge call function on every scrape instead of
+        holding a set value
+        :param function: Function returning the current value, or for a
+                         gauge with labels a dictionary of label values
+                         tuple -> value
+        """
+        self._function = function
+
+    def samples(self) -> list[tuple[str, tuple, tuple, float]]:
+        if self._function is None:
+            return super().samples()
+        if not self.label_names:
+            return [("", (), (), self._function())]
+        return [
+            ("", self.label_names, key, value)
+            for key, value in self._function().items()
+        ]
+
+
+class Histogram(Metric):
+    """
+    Metric that counts observations into cumulative buckets and keeps their
+    sum, e.g. callback latencies
+    :param buckets: Sorted upper bounds, +Inf is added automatically
+    """
+
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: tuple = LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            if key not in self._values:
+                # Per bucket counts (last is +Inf), sum, count
+                self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            counts, total, count = self._values[key]
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[key][1] = total + value
+            self._values[key][2] = count + 1
+
+    def samples(self) -> list[tuple[str, tuple, tuple, float]]:
+        samples = []
+        bucket_names = self.label_names + ("le",)
+        with self._lock:
+            for key, (counts, total, count) in self._values.items():
+                cumulative = 0
+                for bound, bucket_count in zip(
+                    self.buckets + (float("inf"),), counts
+                ):
+                    cumulative += bucket_count
+                    samples.append((
+                        "_bucket",
+                        bucket_names,
+                        key + (_format_value(float(bound)),),
+                        cumulative,
+                    ))
+                samples.append(("_sum", self.label_names, key, total))
+                samples.append(("_count", self.label_names, key, count))
+        return samples
+
+
+REGISTRY = []  # Every metric created, in render order
+
+CALLBACK_DURATION = Histogram(
+    "dash_callback_duration_seconds",
+    "Time spent answering a Dash callback request",
+    ("callback",),
+)
+CALLBACK_REQUEST_BYTES = Histogram(
+    "dash_callback_request_bytes",
+    "Size of Dash callback request bodies",
+    ("callback",),
+    buckets=BYTES_BUCKETS,
+)
+CALLBACK_RESPONSE_BYTES = Histogram(
+    "dash_callback_response_bytes",
+    "Size of Dash callback response bodies",
+    ("callback",),
+    buckets=BYTES_BUCKETS,
+)
+DB_QUERIES = Counter(
+    "db_queries_total",
+    "Number of database reads",
+    ("source",),
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Time spent on a database read",
+    ("source",),
+)
+DB_QUERY_ROWS = Histogram(
+    "db_query_rows",
+    "Rows returned by a database read",
+    ("source",),
+    buckets=ROWS_BUCKETS,
+)
+DATASET_ROWS = Gauge(
+    "dataset_rows",
+    "Rows in the current cached timesheet dataset",
+)
+DATASET_BYTES = Gauge(
+    "dataset_estimated_bytes",
+    "Estimated size of every cached timesheet dataset version",
+)
+PROCESS_MEMORY = Gauge(
+    "process_resident_memory_bytes",
+    "Resident memory of this worker process",
+)
+CACHE_ENTRIES = Gauge(
+    "cache_entries",
+    "Entries held in an in-process cache",
+    ("cache",),
+)
+CACHE_HITS = Gauge(
+    "cache_hits",
+    "Lookups answered from an in-process cache since the worker started",
+    ("cache",),
+)
+CACHE_MISSES = Gauge(
+    "cache_misses",
+    "Lookups an in-process cache could not answer since the worker started",
+    ("cache",),
+)
+CACHE_EVICTIONS = Gauge(
+    "cache_evictions",
+    "Entries dropped from a full in-process cache since the worker started",
+    ("cache",),
+)
+
+_CACHES = {}  # Cache name -> function returning its stats
+
+
+def resident_memory_bytes() -> int:
+    """
+    Function that returns the resident memory of this process, the peak
+    resident memory where /proc is not available
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+PROCESS_MEMORY.set_function(resident_memory_bytes)
+
+
+def watch_cache(name: str, stats: Callable[[], dict]) -> None:
+    """
+    Function that reports a cache's counters in the cache_* gauges
+    :param name: Value of the cache label, e.g. task_metrics
+    :param stats: Function returning a dictionary with size, hits, misses
+                  and evictions, like cache_functions.LRUCache.stats
+    """
+    _CACHES[name] = stats
+
+
+def _cache_stat(stat: str) -> Callable[[], dict]:
+    # Gauge function reading one counter from every watched cache
+    return lambda: {
+        (name,): stats()[stat] for name, stats in list(_CACHES.items())
+    }
+
+
+CACHE_ENTRIES.set_function(_cache_stat("size"))
+CACHE_HITS.set_function(_cache_stat("hits"))
+CACHE_MISSES.set_function(_cache_stat("misses"))
+CACHE_EVICTIONS.set_function(_cache_stat("evictions"))
+
+
+def observe_query(source: str, seconds: float, num_rows: int) -> None:
+    """
+    Function that records one database read
+    :param source: Function that ran the read, e.g. query_ts_table
+    :param seconds: Time the read took
+    :param num_rows: Rows returned
+    """
+    DB_QUERIES.inc(source=source)
+    DB_QUERY_DURATION.observe(seconds, source=source)
+    DB_QUERY_ROWS.observe(num_rows, source=source)
+
+
+def render_metrics() -> str:
+    """
+    Function that renders every metric in the Prometheus text format
+    return text: Exposition text ending in a newline
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+def instrument_app(app) -> None:
+    """
+    Function that times Dash callback requests and adds the METRICS_PATH
+    route to the app's Flask server. Callbacks are labeled with the name of
+    the decorated function, e.g. create_task_graph.
+    :param app: dash.Dash instance
+    """
+    server = app.server
+    update_path = f"{app.config.requests_pathname_prefix}_dash-update-component"
+
+    def callback_name() -> str:
+        body = flask.request.get_json(silent=True) or {}
+        callback = app.callback_map.get(body.get("output"), {}).get("callback")
+        return getattr(callback, "__name__", "unknown")
+
+    @server.before_request
+    def start_callback_timer():
+        if flask.request.path == update_path:
+            flask.g.callback_start = time.perf_counter()
+
+    @server.after_request
+    def observe_callback(response):
+        start = flask.g.pop("callback_start", None)
+        if start is None:
+            return response
+        name = callback_name()
+        CALLBACK_DURATION.observe(time.perf_counter() - start, callback=name)
+        CALLBACK_REQUEST_BYTES.observe(
+            flask.request.content_length or 0, callback=name
+        )
+        if not response.direct_passthrough:  # Streamed bodies are not sized
+            CALLBACK_RESPONSE_BYTES.observe(
+                response.calculate_content_length() or 0, callback=name
+            )
+        return response
+
+    @server.route(METRICS_PATH)
+    def metrics():
+        return flask.Response(
+            render_metrics(), mimetype="text/plain; version=0.0.4"
+        )
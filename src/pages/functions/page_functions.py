@@ -1,9 +1,30 @@
 #!python3.11
 
 import os
+import time
+import logging
+import threading
+import datetime as dt
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import fcntl
+except ImportError:  # Windows, mirror syncs there aren't locked
+    fcntl = None
 import polars as pl
+from psycopg2.pool import ThreadedConnectionPool
 from dotenv import load_dotenv
-from .global_vars import TS_COLUMNS
+from . import metrics_functions as mfu
+from .global_vars import (
+    TS_COLUMNS,
+    TS_DTYPES,
+    TS_DB_DTYPES,
+    TASK_TYPES,
+    TASK_CATEGORY_RULES,
+    ROLLUP_TASK_TYPES,
+    ROLLUP_COLUMNS,
+    ROSTER_COLUMNS,
+)
 
 load_dotenv()
 DATABASE = os.environ.get("DATABASE")
@@ -12,45 +33,598 @@ DB_PASSWORD = os.environ.get("DB_PASSWORD")
 DB_HOST = os.environ.get("DB_HOST")
 DB_PORT = os.environ.get("DB_PORT")
 TS_TABLE = os.environ.get("TS_TABLE")
+# Local Parquet mirror of TS_TABLE, one file per month of entries
+TS_MIRROR_DIR = os.environ.get("TS_MIRROR_DIR")
+# Days before the watermark that are re-read on every sync to catch edits
+TS_MIRROR_RESCAN_DAYS = int(os.environ.get("TS_MIRROR_RESCAN_DAYS", "14"))
+# Daily rollup of TS_TABLE kept in sync by triggers, see install_ts_rollup
+TS_ROLLUP_TABLE = os.environ.get(
+    "TS_ROLLUP_TABLE", f"{TS_TABLE}_daily_rollup"
+)
+ROLLUP_SQL_PATH = os.path.join(
+    os.path.dirname(__file__), "sql", "ts_daily_rollup.sql"
+)
+# Table with each engineer's display name and team, see roster_functions.
+# Empty to put everyone on one team, named from ENGINEER_NAMES.
+TS_ROSTER_TABLE = os.environ.get("TS_ROSTER_TABLE", "")
+# Size of each worker's connection pool
+DB_POOL_MIN = int(os.environ.get("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX", "8"))
+# Date ranges read in parallel for full table loads
+DB_READ_PARTITIONS = int(
+    os.environ.get("DB_READ_PARTITIONS", str(min(os.cpu_count() or 1, 8)))
+)
+# Date ranges read at once, each on its own connection outside the pool
+DB_READ_WORKERS = int(os.environ.get("DB_READ_WORKERS", "4"))
+
+# Categoricals from separately loaded frames (refreshes, mirror partitions)
+# must share one string cache to be compared or combined
+pl.enable_string_cache()
+
+logger = logging.getLogger(__name__)
+
+_POOL = None
+_POOL_SLOTS = None  # One per pooled connection, taken before getconn
+_POOL_PID = None
+_POOL_LOCK = threading.Lock()
+
+
+def _db_uri() -> str:
+    # Build Connection String
+    conn_string = f"{DB_USERNAME}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DATABASE}"
+    return "postgresql://" + conn_string
+
+
+def _get_pool() -> (ThreadedConnectionPool, threading.BoundedSemaphore):
+    # One pool per process, a pool inherited from a forked parent is not
+    # safe to share so gunicorn workers each build their own
+    global _POOL, _POOL_SLOTS, _POOL_PID
+
+    with _POOL_LOCK:
+        if _POOL is None or _POOL_PID != os.getpid():
+            _POOL = ThreadedConnectionPool(
+                DB_POOL_MIN,
+                DB_POOL_MAX,
+                dbname=DATABASE,
+                user=DB_USERNAME,
+                password=DB_PASSWORD,
+                host=DB_HOST,
+                port=DB_PORT,
+            )
+            _POOL_SLOTS = threading.BoundedSemaphore(DB_POOL_MAX)
+            _POOL_PID = os.getpid()
+
+    return _POOL, _POOL_SLOTS
+
+
+@contextmanager
+def db_connection():
+    """
+    Context manager that borrows a connection from the process connection
+    pool and hands it back afterwards. When all DB_POOL_MAX connections are
+    out it waits for one to come back, where getconn would raise PoolError.
+    yield conn: psycopg2 connection in autocommit mode
+    """
+    pool, slots = _get_pool()
+    with slots:
+        conn = pool.getconn()
+        try:
+            conn.autocommit = True  # Reads only, don't hold a transaction
+            yield conn
+        finally:
+            pool.putconn(conn)
+
+
+def _record_timing(
+    label: str,
+    seconds: float,
+    num_rows: int,
+    source: str,
+) -> None:
+    mfu.observe_query(source, seconds, num_rows)
+    logger.info("%s: %d rows in %.3fs", label, num_rows, seconds)
+
+
+def read_query(
+    q_string: str,
+    params: dict | None = None,
+    schema_overrides: dict | None = None,
+    source: str = "read_query",
+) -> pl.DataFrame:
+    """
+    Function that runs a query on a pooled connection and stores the result
+    to a DataFrame
+    :param q_string: String with the desired Query for the DataBase, using
+                     %(name)s placeholders for params
+    :param params: Dictionary of values bound to the query placeholders
+    :param schema_overrides: Dictionary of column name to Polars dtype for
+                             columns that should not be inferred
+    :param source: Name the read is counted under in /metrics
+    return df: Polars DataFrame containing the output from the query
+    """
+    start = time.perf_counter()
+    with db_connection() as conn:
+        df = pl.read_database(
+            q_string,
+            conn,
+            schema_overrides=schema_overrides,
+            infer_schema_length=None,  # Sparse task columns need every row
+            execute_options={"parameters": params} if params else None,
+        )
+    _record_timing(q_string, time.perf_counter() - start, len(df), source)
+
+    return df
 
 
 def query_ts_table(
-    q_string: str
+    q_string: str,
+    params: dict | None = None,
 ) -> pl.DataFrame:
     """
     Function that will query a timesheet_entries table and store to a DataFrame
-    :param db: Output from connect_to_database()
     :param q_string: String with the desired Query for the DataBase
+    :param params: Dictionary of values bound to %(name)s placeholders
     return df: Polars DataFrame containing the output from the query
     """
-    # Build Connection String
-    conn_string = f"{DB_USERNAME}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DATABASE}"
-    uri = "postgresql://" + conn_string
+    # Read Data, keeping all-null columns as their timesheet dtype
+    df = read_query(
+        q_string,
+        params,
+        dict(zip(TS_COLUMNS, TS_DB_DTYPES)),
+        source="query_ts_table",
+    )
+    df = df.sort(pl.col(TS_COLUMNS[0]))  # Sort by Date
 
-    df = pl.read_database_uri(q_string, uri)  # Read Data
+    return df
+
+
+def query_ts_table_partitioned(
+    start_date: dt.date | None = None,
+    end_date: dt.date | None = None,
+    partitions: int = DB_READ_PARTITIONS,
+) -> pl.DataFrame:
+    """
+    Function that reads a large slice of the timesheet table by splitting it
+    into Date ranges and reading each range on its own connection with
+    connectorx, in parallel. connectorx opens those connections itself, so
+    these reads bypass the pool on purpose; DB_READ_WORKERS bounds how many
+    are open at once.
+    :param start_date: dt.date of the first entry to read, None for the start
+                       of the table
+    :param end_date: dt.date of the last entry to read (inclusive), None for
+                     the end of the table
+    :param partitions: Number of Date ranges to split the read into
+    return df: Polars DataFrame containing the entries sorted by Date
+    """
+    uri = _db_uri()
+    bounds = pl.read_database_uri(
+        f'SELECT MIN("{TS_COLUMNS[0]}") AS lo, MAX("{TS_COLUMNS[0]}") AS hi '
+        f'FROM {TS_TABLE}',
+        uri,
+    )
+    lo = start_date or bounds["lo"][0]
+    hi = end_date or bounds["hi"][0]
+    if lo is None or hi is None:  # Empty table
+        return pl.read_database_uri(f"SELECT * FROM {TS_TABLE} LIMIT 0", uri)
+
+    # Split [lo, hi] into contiguous, non-overlapping Date ranges
+    num_days = (hi - lo).days + 1
+    partitions = max(1, min(partitions, num_days))
+    step = -(-num_days // partitions)  # Ceiling division
+    queries = []
+    for i in range(0, num_days, step):
+        range_start = lo + dt.timedelta(days=i)
+        range_end = min(lo + dt.timedelta(days=i + step), hi + dt.timedelta(1))
+        queries.append(
+            f'SELECT * FROM {TS_TABLE} WHERE '
+            f'"{TS_COLUMNS[0]}" >= \'{range_start.isoformat()}\' and '
+            f'"{TS_COLUMNS[0]}" < \'{range_end.isoformat()}\''
+        )
+
+    def read_partition(q_string):
+        start = time.perf_counter()
+        df = pl.read_database_uri(q_string, uri)
+        _record_timing(
+            q_string,
+            time.perf_counter() - start,
+            len(df),
+            "query_ts_table_partition",
+        )
+        return df
+
+    start = time.perf_counter()
+    workers = max(1, min(DB_READ_WORKERS, len(queries)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        frames = list(executor.map(read_partition, queries))
+    df = pl.concat(frames, how="vertical_relaxed")
     df = df.sort(pl.col(TS_COLUMNS[0]))  # Sort by Date
+    _record_timing(
+        f"{TS_TABLE} in {len(queries)} partitions",
+        time.perf_counter() - start,
+        len(df),
+        "query_ts_table_partitioned",
+    )
 
     return df
 
 
-def query_ts_table_between_dates(
+def _category_condition_sql(
+    task_col: str | None,
+    null_cols: list[str],
+) -> str:
+    # SQL version of time_allocation_functions.task_category_expr for one rule
+    # Blank task numbers count as null, like in normalize_ts_frame
+    conditions = [
+        f"NULLIF(BTRIM(\"{col}\"), '') IS NULL" for col in null_cols
+    ]
+    if task_col is not None:
+        conditions = [
+            f"NULLIF(BTRIM(\"{task_col}\"), '') IS NOT NULL"
+        ] + conditions
+    return " AND ".join(conditions) if conditions else "TRUE"
+
+
+def task_type_hours_sql(by_day: bool = False) -> str:
+    """
+    Function that builds the query totalling each engineer's hours in every
+    category of TASK_CATEGORY_RULES between two dates. The dates are bound as
+    the start_date and end_date parameters.
+    :param by_day: True to total each day separately, with a Date column
+    return q_string: String with the aggregate query
+    """
+    group_cols = [TS_COLUMNS[0], TS_COLUMNS[1]] if by_day else [TS_COLUMNS[1]]
+    group_sql = ", ".join(f'"{col}"' for col in group_cols)
+    sums = [
+        f'COALESCE(SUM("{TS_COLUMNS[2]}") FILTER (WHERE '
+        + _category_condition_sql(task_col, null_cols)
+        + f'), 0) AS "{name}"'
+        for name, task_col, null_cols in TASK_CATEGORY_RULES
+    ]
+    q_string = (
+        f'SELECT {group_sql}, ' + ", ".join(sums)
+        + f' FROM {TS_TABLE}'
+        # Date is greater than or equal to start date and less than end date
+        + f' WHERE "{TS_COLUMNS[0]}" >= %(start_date)s'
+        + f' AND "{TS_COLUMNS[0]}" < %(end_date)s'
+        + f' GROUP BY {group_sql}'
+    )
+
+    return q_string
+
+
+def query_task_type_hours_between_dates(
     start_date: str,
     end_date: str
 ) -> pl.DataFrame:
     """
-    Function that will query the timesheet table for all data between a given
-    start_date and end_date.
+    Function that has Postgres total the hours each engineer spent in each
+    Time Allocation category between a given start_date and end_date, so only
+    one row per engineer comes back instead of every timesheet entry.
     :param start_date: String for start date "%Y-%m-%d"
     :param end_date: String for end date "%Y-%m-%d"
-    return df: Polars DataFrame containing data from timesheet_entries between
-               start_date and end_date
-    """
-    # Build Query String
-    q_string = f'SELECT * FROM {TS_TABLE} WHERE '  # Select from table
-    # Date is greater than or equal to start date
-    q_string = q_string + f'"Date" >= \'{start_date}\' and '
-    # Date is less than end date
-    q_string = q_string + f'"Date" < \'{end_date}\''
-    df = query_ts_table(q_string)
+    return df: Polars DataFrame with an Engineer column and one column of
+               hours per category
+    """
+    df = read_query(
+        task_type_hours_sql(),
+        {"start_date": start_date, "end_date": end_date},
+        source="query_task_type_hours_between_dates",
+    )
+
+    return df
+
+
+def query_daily_task_type_hours(
+    start_date: dt.date,
+    end_date: dt.date,
+) -> pl.DataFrame:
+    """
+    Function that does query_task_type_hours_between_dates one day at a
+    time, so the totals can be cached per day
+    :param start_date: dt.date of the first day
+    :param end_date: dt.date after the last day
+    return df: Polars DataFrame with Date and Engineer columns and one column
+               of hours per category, one row per engineer and day worked
+    """
+    df = read_query(
+        task_type_hours_sql(by_day=True),
+        {"start_date": start_date, "end_date": end_date},
+        {
+            TS_COLUMNS[0]: pl.Date,
+            TS_COLUMNS[1]: pl.Utf8,
+            **{rule[0]: pl.Float64 for rule in TASK_CATEGORY_RULES},
+        },
+        source="query_daily_task_type_hours",
+    )
+
+    return df
+
+
+def query_roster() -> pl.DataFrame:
+    """
+    Function that reads the roster table
+    return df: Polars DataFrame with Engineer, Name and Team columns
+    """
+    cols = ", ".join(f'"{col}"' for col in ROSTER_COLUMNS)
+    df = read_query(
+        f"SELECT {cols} FROM {TS_ROSTER_TABLE}",
+        schema_overrides={col: pl.Utf8 for col in ROSTER_COLUMNS},
+        source="query_roster",
+    )
+
+    return df
+
+
+def normalize_ts_frame(
+    df: pl.DataFrame | pl.LazyFrame,
+) -> pl.DataFrame | pl.LazyFrame:
+    """
+    Function that puts timesheet entries into the in-memory schema: task
+    numbers are trimmed and upper-cased with blanks turned into nulls, and
+    every column gets its dtype from TS_DTYPES. Columns outside TS_COLUMNS are
+    dropped. Run once at load, so callbacks never redo the string work.
+    :param df: Output from query_ts_table, or a LazyFrame such as a Parquet
+               scan, which is normalized lazily and returned as a LazyFrame
+    return df: Polars DataFrame with the TS_COLUMNS columns
+    """
+    df = df.select(
+        pl.col(TS_COLUMNS[0]).cast(pl.Date),
+        pl.col(TS_COLUMNS[1]).cast(pl.Utf8).str.strip_chars(),
+        pl.col(TS_COLUMNS[2]),
+        *[
+            pl.col(col).cast(pl.Utf8).str.strip_chars().str.to_uppercase()
+            for col in TASK_TYPES
+        ],
+        pl.col(TS_COLUMNS[11:]),
+    ).with_columns(
+        pl.when(pl.col(col).str.len_chars() > 0)
+        .then(pl.col(col))
+        .otherwise(None)
+        .alias(col)
+        for col in TASK_TYPES
+    ).cast(
+        dict(zip(TS_COLUMNS, TS_DTYPES))
+    )
+
+    return df
+
+
+def _mirror_partition_path(mirror_dir: str, month: dt.date) -> str:
+    return os.path.join(mirror_dir, f"{month.strftime('%Y-%m')}.parquet")
+
+
+def _mirror_partitions(mirror_dir: str) -> list[str]:
+    if not os.path.isdir(mirror_dir):
+        return []
+    files = [f for f in os.listdir(mirror_dir) if f.endswith(".parquet")]
+    return [os.path.join(mirror_dir, f) for f in sorted(files)]
+
+
+def _write_mirror_partition(df: pl.DataFrame, path: str) -> None:
+    # Write next to the partition then swap it in, so readers never see a
+    # half written file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    df.sort(pl.col(TS_COLUMNS[0])).write_parquet(tmp_path)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def _mirror_lock(mirror_dir: str):
+    # Held for a whole sync, so two workers refreshing at once don't read
+    # the same watermark and rewrite the same partitions over each other
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(mirror_dir, ".lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _month_starts(start_date: dt.date, end_date: dt.date) -> list[dt.date]:
+    months = []
+    month = start_date.replace(day=1)
+    while month <= end_date:
+        months.append(month)
+        month = (month + dt.timedelta(days=32)).replace(day=1)
+    return months
+
+
+def mirror_watermark(mirror_dir: str = TS_MIRROR_DIR) -> dt.date | None:
+    """
+    Function that finds the newest date stored in the Parquet mirror
+    :param mirror_dir: Directory holding the mirror partitions
+    return watermark: dt.date of the newest entry, None if the mirror is empty
+    """
+    # Partitions are named by month, so the newest date is in the newest
+    # partition with any rows. Empty partitions aren't kept, but one left by
+    # an older sync must not make the whole table reload.
+    for path in reversed(_mirror_partitions(mirror_dir)):
+        watermark = pl.read_parquet(
+            path, columns=[TS_COLUMNS[0]]
+        )[TS_COLUMNS[0]].max()
+        if watermark is not None:
+            return watermark
+
+    return None
+
+
+def sync_ts_mirror(
+    mirror_dir: str = TS_MIRROR_DIR,
+    rescan_days: int = TS_MIRROR_RESCAN_DAYS,
+) -> int:
+    """
+    Function that brings the local Parquet mirror of the timesheet table up to
+    date. Only rows dated on or after the watermark minus rescan_days are
+    queried, and only the monthly partitions covering those dates are
+    rewritten. Edits older than the re-scan window are not picked up; delete
+    the mirror directory to force a full reload.
+    :param mirror_dir: Directory holding the mirror partitions
+    :param rescan_days: Days before the watermark to re-read for late edits
+    return num_rows: Number of rows read from the database
+    """
+    os.makedirs(mirror_dir, exist_ok=True)
+    with _mirror_lock(mirror_dir):
+        watermark = mirror_watermark(mirror_dir)
+
+        if watermark is None:  # Empty mirror, copy the whole table
+            df = query_ts_table_partitioned()
+            if len(df) == 0:
+                return 0
+            since = df[TS_COLUMNS[0]].min()
+            last_date = df[TS_COLUMNS[0]].max()
+        else:
+            since = watermark - dt.timedelta(days=rescan_days)
+            q_string = f'SELECT * FROM {TS_TABLE} WHERE '  # Select from table
+            # Date is greater than or equal to the re-scan start
+            q_string = q_string + '"Date" >= %(since)s'
+            df = query_ts_table(q_string, {"since": since})
+            last_date = max(watermark, df[TS_COLUMNS[0]].max() or watermark)
+
+        month_col = pl.col(TS_COLUMNS[0]).dt.truncate("1mo")
+        for month in _month_starts(since, last_date):
+            path = _mirror_partition_path(mirror_dir, month)
+            new_rows = df.filter(month_col == month)
+            if os.path.exists(path):
+                # Keep mirrored rows from before the re-scan window, everything
+                # after it is replaced by what the database returned
+                old_rows = pl.read_parquet(path).filter(
+                    pl.col(TS_COLUMNS[0]) < since
+                )
+                new_rows = pl.concat(
+                    [old_rows, new_rows], how="vertical_relaxed"
+                )
+            if len(new_rows) > 0:
+                _write_mirror_partition(new_rows, path)
+            elif os.path.exists(path):  # Every entry of the month was deleted
+                os.remove(path)
+
+        return len(df)
+
+
+def scan_ts_mirror(mirror_dir: str = TS_MIRROR_DIR) -> pl.LazyFrame:
+    """
+    Function that scans the Parquet mirror without reading it. Collecting it
+    reads and normalizes each partition in one plan, so the un-normalized
+    entries are never held in memory. The task metrics functions can also
+    run on it directly: only the columns and row groups a query needs are
+    read, and Date filters are checked against Parquet statistics.
+    :param mirror_dir: Directory holding the mirror partitions
+    return lf: Polars LazyFrame in the normalize_ts_frame schema. Not sorted,
+               but partitions are written sorted by Date and scanned in order
+    """
+    partitions = _mirror_partitions(mirror_dir)
+    if not partitions:  # Nothing synced yet
+        return normalize_ts_frame(
+            pl.LazyFrame(schema=dict(zip(TS_COLUMNS, TS_DB_DTYPES)))
+        )
+
+    # Normalized one partition at a time, partitions written from different
+    # reads may disagree on dtypes such as all-null task columns
+    return pl.concat(
+        [normalize_ts_frame(pl.scan_parquet(path)) for path in partitions]
+    )
+
+
+def install_ts_rollup(rebuild: bool = True) -> None:
+    """
+    Function that creates (or replaces) the daily rollup table and the
+    triggers that keep it in sync with the timesheet table. The app never
+    runs it, it is a one-off migration run with "python migrate.py rollup"
+    by a role that can create tables, functions and triggers on TS_TABLE.
+    :param rebuild: Refill the rollup from the timesheet table afterwards
+    """
+    with open(ROLLUP_SQL_PATH) as sql_file:
+        template = sql_file.read()
+
+    task_types = ", ".join(f"'{task_type}'" for task_type in ROLLUP_TASK_TYPES)
+    task_values = ", ".join(
+        f"('{task_type}', ts.\"{task_type}\")"
+        for task_type in ROLLUP_TASK_TYPES
+    )
+    script = template.format(
+        ts_table=TS_TABLE,
+        rollup_table=TS_ROLLUP_TABLE,
+        rollup_index=TS_ROLLUP_TABLE.split(".")[-1] + "_task_idx",
+        task_types=f"ARRAY[{task_types}]",
+        task_values=task_values,
+    )
+
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(script)
+            if rebuild:
+                cursor.execute(f"SELECT {TS_ROLLUP_TABLE}_rebuild()")
+
+
+def query_ts_rollup(
+    start_date: dt.date | None = None,
+    end_date: dt.date | None = None,
+    task_type: str | None = None,
+    task_numbers: list[str] | None = None,
+) -> pl.DataFrame:
+    """
+    Function that reads daily hours from the rollup table
+    :param start_date: dt.date of the first day to read, None for no limit
+    :param end_date: dt.date of the last day to read (inclusive), None for no
+                     limit
+    :param task_type: "ECR", "EWR", "NPR", "Model", ... None for every type
+    :param task_numbers: List of normalized task numbers, None for every task
+    return df: Polars DataFrame with ROLLUP_COLUMNS sorted by Date
+    """
+    conditions = []
+    params = {}
+    if start_date is not None:
+        conditions.append('"Date" >= %(start_date)s')
+        params["start_date"] = start_date
+    if end_date is not None:
+        conditions.append('"Date" <= %(end_date)s')
+        params["end_date"] = end_date
+    if task_type is not None:
+        conditions.append('"TaskType" = %(task_type)s')
+        params["task_type"] = task_type
+    if task_numbers is not None:
+        conditions.append('"TaskNumber" = ANY(%(task_numbers)s)')
+        params["task_numbers"] = list(task_numbers)
+
+    columns = ", ".join(f'"{col}"' for col in ROLLUP_COLUMNS)
+    q_string = f"SELECT {columns} FROM {TS_ROLLUP_TABLE}"
+    if conditions:
+        q_string = q_string + " WHERE " + " AND ".join(conditions)
+
+    df = read_query(q_string, params, {
+        "Date": pl.Date,
+        "Engineer": pl.Utf8,
+        "TaskType": pl.Utf8,
+        "TaskNumber": pl.Utf8,
+        "Time": pl.Float64,
+    }, source="query_ts_rollup")
+    df = df.sort(pl.col(ROLLUP_COLUMNS[0]))  # Sort by Date
+
+    return df
+
+
+def rollup_to_ts_frame(rollup_df: pl.DataFrame) -> pl.DataFrame:
+    """
+    Function that reshapes rollup rows into the timesheet layout, one row per
+    rollup row with only its task type column filled, so the task metrics
+    functions can run on it unchanged. Time Allocation categories depend on
+    which columns an entry leaves empty and can't be computed from it.
+    :param rollup_df: Output from query_ts_rollup
+    return df: Polars DataFrame with the TS_COLUMNS columns
+    """
+    df = rollup_df.select(
+        pl.col(TS_COLUMNS[0:3]),
+        *[
+            pl.when(pl.col("TaskType") == col)
+            .then(pl.col("TaskNumber"))
+            .otherwise(None)
+            .alias(col)
+            for col in TS_COLUMNS[3:]
+        ],
+    )
+    df = normalize_ts_frame(df)
 
     return df
@@ -0,0 +1,163 @@
+#!python3.11
+
+import os
+import polars as pl
+from dotenv import load_dotenv
+from . import page_functions as pfu
+from .global_vars import (
+    TS_COLUMNS,
+    ENGINEER_NAMES,
+    ROSTER_COLUMNS,
+    TEAM_COLUMN,
+)
+
+load_dotenv()
+# Team for engineers missing from the roster table, and for everyone when
+# there is no roster table
+DEFAULT_TEAM = os.environ.get("DEFAULT_TEAM", "Design")
+
+
+def load_roster(engineers: list[str] | None = None) -> pl.DataFrame:
+    """
+    Function that loads each engineer's display name and team. The roster
+    comes from page_functions.TS_ROSTER_TABLE, or from ENGINEER_NAMES when
+    that is not set. Engineers found in the timesheets but not the roster
+    are added to DEFAULT_TEAM, named from ENGINEER_NAMES or their username.
+    :param engineers: Usernames found in the timesheets
+    return roster_df: DataFrame with Engineer, Name and Team columns, one row
+                      per engineer. Names are unique within a team.
+    """
+    if pfu.TS_ROSTER_TABLE:
+        roster_df = pfu.query_roster().unique(
+            subset=ROSTER_COLUMNS[0], keep="first", maintain_order=True
+        )
+    else:
+        roster_df = pl.DataFrame(
+            {
+                ROSTER_COLUMNS[0]: list(ENGINEER_NAMES.keys()),
+                ROSTER_COLUMNS[1]: list(ENGINEER_NAMES.values()),
+                ROSTER_COLUMNS[2]: DEFAULT_TEAM,
+            }
+        )
+
+    missing = sorted(
+        set(engineers or []) - set(roster_df[ROSTER_COLUMNS[0]].to_list())
+    )
+    roster_df = pl.concat(
+        [
+            roster_df,
+            pl.DataFrame(
+                {
+                    ROSTER_COLUMNS[0]: missing,
+                    ROSTER_COLUMNS[1]: [
+                        ENGINEER_NAMES.get(eng, eng) for eng in missing
+                    ],
+                    ROSTER_COLUMNS[2]: DEFAULT_TEAM,
+                },
+                schema={col: pl.Utf8 for col in ROSTER_COLUMNS},
+            ),
+        ],
+        how="vertical_relaxed",
+    ).with_columns(
+        pl.col(ROSTER_COLUMNS[1]).fill_null(pl.col(ROSTER_COLUMNS[0])),
+        pl.col(ROSTER_COLUMNS[2]).fill_null(DEFAULT_TEAM),
+    )
+
+    # Names label traces and headers, add the username to repeated ones
+    repeated = pl.col(ROSTER_COLUMNS[1]).is_duplicated().over(TEAM_COLUMN)
+    roster_df = roster_df.with_columns(
+        pl.when(repeated).then(
+            pl.format("{} ({})", ROSTER_COLUMNS[1], ROSTER_COLUMNS[0])
+        ).otherwise(
+            pl.col(ROSTER_COLUMNS[1])
+        ).alias(ROSTER_COLUMNS[1])
+    )
+
+    return roster_df
+
+
+def dataset_roster(df: pl.DataFrame) -> pl.DataFrame:
+    """
+    Function that does load_roster for everyone in a DataFrame of timesheets
+    :param df: Output from dataset_functions.load_ts_dataset
+    return roster_df: Output from load_roster
+    """
+    engineers = df.select(
+        pl.col(TS_COLUMNS[1]).drop_nulls().unique().cast(pl.Utf8)
+    )[TS_COLUMNS[1]].to_list()
+
+    return load_roster(engineers)
+
+
+def team_names(roster_df: pl.DataFrame) -> list[str]:
+    """
+    Function that lists the teams in a roster
+    :param roster_df: Output from load_roster
+    return teams: Sorted list of team names
+    """
+    return sorted(roster_df[TEAM_COLUMN].unique().to_list())
+
+
+def team_engineers(
+    roster_df: pl.DataFrame,
+    team: str | None = None,
+) -> dict:
+    """
+    Function that maps the usernames on a team to their display names
+    :param roster_df: Output from load_roster
+    :param team: Team name, None for every engineer
+    return engineer_names: Dictionary of username -> display name, in roster
+                           order
+    """
+    if team is not None:
+        roster_df = roster_df.filter(pl.col(TEAM_COLUMN) == team)
+
+    return dict(
+        zip(roster_df[ROSTER_COLUMNS[0]], roster_df[ROSTER_COLUMNS[1]])
+    )
+
+
+def assign_teams(df: pl.DataFrame, roster_df: pl.DataFrame) -> pl.DataFrame:
+    """
+    Function that adds a Team column to a DataFrame of timesheets and sorts
+    it by team, then date, so each team's entries are one contiguous slice
+    :param df: Output from page_functions.normalize_ts_frame
+    :param roster_df: Output from load_roster
+    return df: df with a Categorical Team column, sorted by Team and Date
+    """
+    teams = dict(
+        zip(roster_df[ROSTER_COLUMNS[0]], roster_df[ROSTER_COLUMNS[2]])
+    )
+    df = df.with_columns(
+        pl.col(TS_COLUMNS[1]).cast(pl.Utf8).replace(
+            teams, default=DEFAULT_TEAM
+        ).cast(pl.Categorical).alias(TEAM_COLUMN)
+    )
+
+    return df.sort(
+        [pl.col(TEAM_COLUMN).cast(pl.Utf8), pl.col(TS_COLUMNS[0])]
+    )
+
+
+def team_slices(df: pl.DataFrame) -> dict:
+    """
+    Function that finds where each team's entries are in a DataFrame sorted
+    by assign_teams
+    :param df: Output from assign_teams
+    return slices: Dictionary of team name -> (offset, length). Frames
+                   without a Team column are one DEFAULT_TEAM slice.
+    """
+    if TEAM_COLUMN not in df.columns:
+        return {DEFAULT_TEAM: (0, len(df))}
+
+    runs_df = df.select(
+        pl.col(TEAM_COLUMN).cast(pl.Utf8).rle()
+    ).unnest(TEAM_COLUMN)
+
+    slices = {}
+    offset = 0
+    for length, team in runs_df.iter_rows():
+        slices[team] = (offset, length)
+        offset += length
+
+    return slices
@@ -0,0 +1,118 @@
+-- Daily rollup of timesheet hours by (Date, Engineer, task type, task number)
+-- kept in sync with the timesheet table by row triggers.
+--
+-- Placeholders are filled in by page_functions.install_ts_rollup:
+--   {ts_table}      timesheet table, e.g. timesheet_entries
+--   {rollup_table}  rollup table, e.g. timesheet_entries_daily_rollup
+--   {rollup_index}  name of the rollup's task lookup index
+--   {task_types}    ARRAY['ECR', 'EWR', ...] of task columns to roll up
+--   {task_values}   VALUES list of ('ECR', "ECR"), ... for the backfill
+--
+-- Task numbers are normalized with upper(btrim(...)); blank numbers are
+-- skipped. Safe to run again, existing objects are replaced.
+
+CREATE TABLE IF NOT EXISTS {rollup_table} (
+    "Date" date NOT NULL,
+    "Engineer" text NOT NULL,
+    "TaskType" text NOT NULL,
+    "TaskNumber" text NOT NULL,
+    "Time" double precision NOT NULL DEFAULT 0,
+    "Entries" integer NOT NULL DEFAULT 0,
+    PRIMARY KEY ("Date", "Engineer", "TaskType", "TaskNumber")
+);
+
+CREATE INDEX IF NOT EXISTS {rollup_index}
+    ON {rollup_table} ("TaskType", "TaskNumber", "Date");
+
+-- Add (sign = 1) or remove (sign = -1) one timesheet row from the rollup
+CREATE OR REPLACE FUNCTION {rollup_table}_apply(r {ts_table}, sign integer)
+RETURNS void AS $$
+DECLARE
+    task_type text;
+    task_number text;
+BEGIN
+    IF r."Date" IS NULL THEN
+        RETURN;
+    END IF;
+
+    FOREACH task_type IN ARRAY {task_types} LOOP
+        task_number := upper(btrim(to_jsonb(r) ->> task_type));
+        CONTINUE WHEN task_number IS NULL OR task_number = '';
+
+        INSERT INTO {rollup_table} AS ru
+            ("Date", "Engineer", "TaskType", "TaskNumber", "Time", "Entries")
+        VALUES (
+            r."Date",
+            coalesce(r."Engineer", ''),
+            task_type,
+            task_number,
+            sign * coalesce(r."Time", 0),
+            sign
+        )
+        ON CONFLICT ("Date", "Engineer", "TaskType", "TaskNumber")
+        DO UPDATE SET
+            "Time" = ru."Time" + EXCLUDED."Time",
+            "Entries" = ru."Entries" + EXCLUDED."Entries";
+    END LOOP;
+
+    IF sign < 0 THEN  -- Drop keys with no entries left
+        DELETE FROM {rollup_table}
+        WHERE "Date" = r."Date"
+            AND "Engineer" = coalesce(r."Engineer", '')
+            AND "Entries" <= 0;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION {rollup_table}_trigger()
+RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM {rollup_table}_apply(OLD, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM {rollup_table}_apply(NEW, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION {rollup_table}_truncate()
+RETURNS trigger AS $$
+BEGIN
+    TRUNCATE {rollup_table};
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Rebuild the rollup from scratch, used after installing the triggers
+CREATE OR REPLACE FUNCTION {rollup_table}_rebuild()
+RETURNS void AS $$
+BEGIN
+    TRUNCATE {rollup_table};
+    INSERT INTO {rollup_table}
+        ("Date", "Engineer", "TaskType", "TaskNumber", "Time", "Entries")
+    SELECT
+        ts."Date",
+        coalesce(ts."Engineer", ''),
+        t.task_type,
+        upper(btrim(t.task_number)),
+        sum(coalesce(ts."Time", 0)),
+        count(*)
+    FROM {ts_table} AS ts
+    CROSS JOIN LATERAL (VALUES {task_values}) AS t (task_type, task_number)
+    WHERE ts."Date" IS NOT NULL
+        AND coalesce(btrim(t.task_number), '') <> ''
+    GROUP BY 1, 2, 3, 4;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS rollup_sync ON {ts_table};
+CREATE TRIGGER rollup_sync
+    AFTER INSERT OR UPDATE OR DELETE ON {ts_table}
+    FOR EACH ROW EXECUTE FUNCTION {rollup_table}_trigger();
+
+DROP TRIGGER IF EXISTS rollup_truncate ON {ts_table};
+CREATE TRIGGER rollup_truncate
+    AFTER TRUNCATE ON {ts_table}
+    FOR EACH STATEMENT EXECUTE FUNCTION {rollup_table}_truncate();
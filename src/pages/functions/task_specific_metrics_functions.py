@@ -3,8 +3,18 @@
 import os
 import polars as pl
 import datetime as dt
+from bisect import bisect_left, bisect_right
 from dotenv import load_dotenv
-from .global_vars import TS_COLUMNS
+from .global_vars import (
+    TS_COLUMNS,
+    TASK_TYPES,
+    ENGINEER_NAMES,
+    HOURS_SUM,
+    DATE_GROUPINGS,
+)
+from . import dataset_functions as dsfu
+from . import metrics_functions as mfu
+from .cache_functions import LRUCache
 
 load_dotenv()
 DATABASE = os.environ.get("DATABASE")
@@ -13,49 +23,73 @@ DB_PASSWORD = os.environ.get("DB_PASSWORD")
 DB_HOST = os.environ.get("DB_HOST")
 DB_PORT = os.environ.get("DB_PORT")
 TS_TABLE = os.environ.get("TS_TABLE")
+# Number of task_specific_metrics results kept per worker
+METRICS_CACHE_SIZE = int(os.environ.get("METRICS_CACHE_SIZE", "256"))
+# Most bars per engineer a task graph gets, coarser groupings are used past it
+MAX_DATE_BUCKETS = int(os.environ.get("MAX_DATE_BUCKETS", "60"))
+
+METRICS_CACHE = LRUCache(METRICS_CACHE_SIZE)
+mfu.watch_cache("task_metrics", METRICS_CACHE.stats)
+# Date grouping -> hours cube level it is summed from, see build_hours_cube
+CUBE_LEVELS = {
+    "1d": "1d",
+    "1w": "1w",
+    "2w": "1w",
+    "1mo": "1mo",
+    "1q": "1mo",
+    "1y": "1mo",
+}
+# Results are keyed by dataset version, drop them with their dataset
+dsfu.add_drop_listener(
+    lambda version: METRICS_CACHE.invalidate(lambda key: key[0] == version)
+)
 
 
 def find_unique_tasks(
-    df: pl.DataFrame,
+    df: pl.DataFrame | pl.LazyFrame,
     task_type: str,
 ) -> list[str]:
     """
     Function that finds the unique task numbers in a DataFrame
-    :param df: Output from page_functions.query_ts_table
+    :param df: Output from page_functions.query_ts_table, or a LazyFrame such
+               as page_functions.scan_ts_mirror
     :param task_type: "ECR", "EWR", or "NPR"
     return tasks: List of unique task numbers in the DataFrame provided
     """
-    tasks = df.select(pl.col(task_type).str.to_uppercase()).unique()
-    tasks = tasks.filter(
-        ~pl.col(task_type).is_in(["", " "])
-    )
-    tasks = tasks[task_type].drop_nulls().sort(descending=True).to_list()
-    return tasks
+    # Task numbers are already upper-cased with blanks nulled at load. Only
+    # the one column is read, and only its unique values are cast to strings
+    tasks = df.lazy().select(
+        pl.col(task_type).drop_nulls().unique().cast(pl.Utf8)
+    ).sort(task_type, descending=True).collect()
+    return tasks[task_type].to_list()
 
 
 def find_task_dates(
-    df: pl.DataFrame,
+    df: pl.DataFrame | pl.LazyFrame,
     task_type: str,
     task_numbers: list[str],
 ) -> (dt.date, dt.date, str):
     """
     Function that returns the first and last date for a task in a DataFrame of
     timesheets.
-    :param df: Output from page_functions.query_ts_table
+    :param df: Output from page_functions.query_ts_table, or a LazyFrame such
+               as page_functions.scan_ts_mirror
     :param task_type: "ECR", "EWR", "NPR", "Model"
     :param task_numbers: List of strings of numbers representing specific task
     return start_date: dt.date object representing the first date of task
     return end_date: dt.date object representing the last date of task
     return date_grouping: str containing how the dates should be grouped
     """
-    # Filter to task
-    filtered_df = df.filter(
-        pl.col(task_type).str.to_uppercase().is_in(task_numbers)
-    )
-    # Find the dates present
-    dates = filtered_df.select(pl.col(TS_COLUMNS[0])).to_series()
-    start_date = dates.dt.min()  # Find min date
-    end_date = dates.dt.max()  # Find max date
+    # Filter to task and find the dates present in one pass, the filtered
+    # rows are never materialized
+    dates_df = df.lazy().filter(
+        pl.col(task_type).is_in(task_numbers)
+    ).select(
+        pl.col(TS_COLUMNS[0]).min().alias("start_date"),  # Find min date
+        pl.col(TS_COLUMNS[0]).max().alias("end_date"),  # Find max date
+    ).collect()
+    start_date = dates_df["start_date"][0]
+    end_date = dates_df["end_date"][0]
 
     failed = False
     # If you change the task type without clearing the project, this operation
@@ -70,52 +104,214 @@ def find_task_dates(
         return None, None, "1mo"
 
     # Didn't fail, get to finish the function
-    if total_completion_time < dt.timedelta(weeks=15):
-        date_grouping = "1d"
-    elif total_completion_time < dt.timedelta(weeks=40):
-        date_grouping = "1w"
-    else:
-        date_grouping = "1mo"
+    date_grouping = choose_date_grouping(total_completion_time)
+
+    return start_date, end_date, date_grouping
+
+
+def count_date_buckets(
+    total_completion_time: dt.timedelta,
+    date_grouping: str,
+) -> int:
+    """
+    Function that estimates how many bars a span of time needs per engineer
+    :param total_completion_time: dt.timedelta between the first and last date
+    :param date_grouping: One of DATE_GROUPINGS
+    return num_buckets: Approximate number of date groups
+    """
+    return int(total_completion_time.days // DATE_GROUPINGS[date_grouping]) + 1
+
+
+def choose_date_grouping(
+    total_completion_time: dt.timedelta,
+    max_buckets: int = MAX_DATE_BUCKETS,
+) -> str:
+    """
+    Function that picks how dates should be grouped for a span of time, the
+    finest grouping that needs at most max_buckets bars
+    :param total_completion_time: dt.timedelta between the first and last date
+    :param max_buckets: Most date groups allowed
+    return date_grouping: str containing how the dates should be grouped
+    """
+    for date_grouping in DATE_GROUPINGS:
+        num_buckets = count_date_buckets(total_completion_time, date_grouping)
+        if num_buckets <= max_buckets:
+            return date_grouping
+
+    return list(DATE_GROUPINGS)[-1]  # Coarsest there is
+
+
+def cap_date_grouping(
+    date_grouping: str,
+    start_date: dt.date,
+    end_date: dt.date,
+    max_buckets: int = MAX_DATE_BUCKETS,
+) -> str:
+    """
+    Function that coarsens a requested grouping that would need more than
+    max_buckets bars, e.g. "1d" over several years
+    :param date_grouping: Requested grouping, one of DATE_GROUPINGS
+    :param start_date: dt.date representing the start of the period
+    :param end_date: dt.date representing the end of the period
+    :param max_buckets: Most date groups allowed
+    return date_grouping: The requested grouping, or choose_date_grouping's
+                          when that is coarser
+    """
+    fitting = choose_date_grouping(end_date - start_date, max_buckets)
+    if date_grouping not in DATE_GROUPINGS:
+        return fitting
+
+    groupings = list(DATE_GROUPINGS)
+    return groupings[
+        max(groupings.index(date_grouping), groupings.index(fitting))
+    ]
+
+
+def build_task_index(df: pl.DataFrame) -> dict:
+    """
+    Function that indexes every task in a DataFrame of timesheets, so the
+    dropdowns and date pickers don't have to scan the whole frame.
+    :param df: Output from page_functions.query_ts_table
+    return task_index: Dictionary of task type -> upper-cased task number ->
+                       dict with first_date, last_date and hours
+    """
+    task_index = {}
+    for task_type in TASK_TYPES:
+        if task_type not in df.columns:
+            continue
+        tasks_df = df.select(
+            pl.col(task_type).cast(pl.Utf8).alias("task"),
+            pl.col(TS_COLUMNS[0]),
+            pl.col(TS_COLUMNS[2]),
+        ).filter(
+            pl.col("task").is_not_null()
+        ).group_by("task").agg(
+            pl.col(TS_COLUMNS[0]).min().alias("first_date"),
+            pl.col(TS_COLUMNS[0]).max().alias("last_date"),
+            HOURS_SUM.alias("hours"),
+        )
+        task_index[task_type] = {
+            row.pop("task"): row for row in tasks_df.iter_rows(named=True)
+        }
+
+    return task_index
+
+
+def find_unique_tasks_from_index(
+    task_index: dict,
+    task_type: str,
+) -> list[str]:
+    """
+    Function that does find_unique_tasks with a lookup in a task index
+    :param task_index: Output from build_task_index
+    :param task_type: "ECR", "EWR", or "NPR"
+    return tasks: List of unique task numbers in the index
+    """
+    return sorted(task_index.get(task_type, {}).keys(), reverse=True)
+
+
+def find_task_dates_from_index(
+    task_index: dict,
+    task_type: str,
+    task_numbers: list[str],
+) -> (dt.date, dt.date, str):
+    """
+    Function that does find_task_dates with lookups in a task index
+    :param task_index: Output from build_task_index
+    :param task_type: "ECR", "EWR", "NPR", "Model"
+    :param task_numbers: List of strings of numbers representing specific task
+    return start_date: dt.date object representing the first date of task
+    return end_date: dt.date object representing the last date of task
+    return date_grouping: str containing how the dates should be grouped
+    """
+    tasks = task_index.get(task_type, {})
+    entries = [tasks[number] for number in task_numbers if number in tasks]
+    # Task type changed without clearing the project, nothing to look up
+    if not entries:
+        return None, None, "1mo"
+
+    start_date = min(entry["first_date"] for entry in entries)
+    end_date = max(entry["last_date"] for entry in entries)
+    date_grouping = choose_date_grouping(end_date - start_date)
 
     return start_date, end_date, date_grouping
 
 
 def task_specific_metrics(
-    df: pl.DataFrame,
+    df: pl.DataFrame | pl.LazyFrame,
     task_type: str,
     task_numbers: list[str],
     start_date: dt.date,
     end_date: dt.date,
     date_grouping: str,
+    engineer_names: dict | None = None,
 ) -> (pl.DataFrame, str):
     """
     Function that finds the task specific metrics from a DataFrame
-    :param df: Output from page_functions.query_ts_table
+    :param df: Output from page_functions.query_ts_table, or a LazyFrame such
+               as page_functions.scan_ts_mirror
     :param task_type: "ECR", "EWR", "NPR", "Models"
     :param task_numbers: List of strings of numbers representing specific task
     :param start_date: dt.date representing the start of the period
     :param end_date: dt.date representing the end of the period
     :param date_grouping: str representing the grouping for dates
+    :param engineer_names: Dictionary of username -> display name for the
+                           columns of stats_df, see
+                           roster_functions.team_engineers. Defaults to
+                           ENGINEER_NAMES.
     return stats_df: DataFrame containing the time each engineer spent on each
-                     task.
-    return date_grouping: Str representing how the dates are grouped
+                     task, one column per engineer in engineer_names.
+    return date_grouping: Str representing how the dates are grouped, coarser
+                          than requested when the range would need more than
+                          MAX_DATE_BUCKETS groups
     """
-    filtered_df = df.filter(  # Filter to task
-        (pl.col(task_type).str.to_uppercase().is_in(task_numbers))
-        & (pl.col(TS_COLUMNS[0]).is_between(start_date, end_date))
-    )
+    # Keeps the figure small whatever range and grouping were picked
+    date_grouping = cap_date_grouping(date_grouping, start_date, end_date)
 
-    grouped_df = filtered_df.group_by_dynamic(
+    # One plan from filter to grouped hours, so only the Date, Engineer, Time
+    # and task columns are read and the Date range is pushed into a Parquet
+    # scan. group_by_dynamic needs Date order: the cached frame is sorted by
+    # Team, then Date, so only one team's slice is already in that order.
+    grouped_df = df.lazy().filter(  # Filter to task
+        (pl.col(task_type).is_in(task_numbers))
+        & (pl.col(TS_COLUMNS[0]).is_between(start_date, end_date))
+    ).sort(
+        TS_COLUMNS[0]
+    ).group_by_dynamic(
         pl.col(TS_COLUMNS[0]),  # Group the date column
         every=date_grouping,  # Into months
         group_by=TS_COLUMNS[1]  # Group by engineer
     ).agg(
-        pl.col(TS_COLUMNS[2]).sum()  # Take the sum of time
-    ).select(pl.col(TS_COLUMNS[0:3]))  # Re-order columns to match filtered_df
+        HOURS_SUM  # Take the sum of time
+    ).select(
+        pl.col(TS_COLUMNS[0:3])  # Re-order columns to match filtered_df
+    ).collect()
+
+    stats_df = pivot_engineer_hours(
+        grouped_df, [TS_COLUMNS[0]], engineer_names
+    )
 
-    # Pivot into stats df
+    return stats_df, date_grouping
+
+
+def pivot_engineer_hours(
+    grouped_df: pl.DataFrame,
+    index: list[str],
+    engineer_names: dict | None = None,
+) -> pl.DataFrame:
+    """
+    Function that pivots grouped hours into one column per engineer
+    :param grouped_df: DataFrame with the index columns, Engineer and Time,
+                       one row per index and engineer
+    :param index: Columns kept as rows, e.g. ["Date"]
+    :param engineer_names: See task_specific_metrics
+    return stats_df: DataFrame with the index columns and one column of hours
+                     per engineer in engineer_names, named by display name.
+                     Engineers without hours get zeros.
+    """
+    # Pivot is eager only but runs on grouped rows
     stats_df = grouped_df.pivot(
-        index=TS_COLUMNS[0],
+        index=index,
         columns=TS_COLUMNS[1],
         values=TS_COLUMNS[2],
         aggregate_function=None,
@@ -123,11 +319,8 @@ def task_specific_metrics(
 
     num_groups = len(stats_df)
     rename_dict = {
-        TS_COLUMNS[0]: TS_COLUMNS[0],
-        "ashahinian": "Andre",
-        "jbarron": "Jacob",
-        "jtorres": "Josiah",
-        "malpert": "Michael",
+        **{col: col for col in index},
+        **(ENGINEER_NAMES if engineer_names is None else engineer_names),
     }
 
     for key in rename_dict.keys():
@@ -139,7 +332,7 @@ def task_specific_metrics(
     stats_df = stats_df.rename(rename_dict).select(
         pl.col(rename_dict.values()))
 
-    return stats_df, date_grouping
+    return stats_df
 
 
 def build_totals_dict(stats_df: pl.DataFrame) -> dict:
@@ -147,24 +340,496 @@ def build_totals_dict(stats_df: pl.DataFrame) -> dict:
     Function to calculate the totals from the stats_df
     :param stats_df: Output from task_specific_metrics
     return totals_dict: Dictionary containing total hours worked by department
-                        and each engineer
+                        and each engineer column of stats_df
     """
 
     totals_df = stats_df.select(
         pl.col(stats_df.columns[1:])
     ).sum()
 
-    totals_dict = {
-        "Department": 0,
-        "Andre": 0,
-        "Jacob": 0,
-        "Josiah": 0,
-        "Michael": 0
-    }
+    totals_dict = {"Department": 0}
 
+    # Rounded so float32 hours and float sums don't show noise like 0.30000004
     for col in totals_df.columns:
-        totals_dict[col] = totals_df.select(pl.col(col))[col][0]
+        totals_dict[col] = round(totals_df.select(pl.col(col))[col][0], 2)
 
-    totals_dict["Department"] = totals_df.sum_horizontal().to_list()[0]
+    totals_dict["Department"] = round(
+        totals_df.sum_horizontal().to_list()[0], 2
+    )
 
     return totals_dict
+
+
+def build_hours_cube(df: pl.DataFrame) -> dict:
+    """
+    Function that sums a DataFrame of timesheets into daily hours per task
+    and engineer, with weekly and monthly levels rolled up from the daily
+    one. Task graphs are then sliced and summed from the cube instead of
+    grouping the entries again for every task, range and grouping.
+    :param df: Output from dataset_functions.get_team_dataset
+    return hours_cube: Dictionary of level in CUBE_LEVELS values -> dict with
+                       "frame", a DataFrame of Type, Task, Date, Engineer and
+                       Time sorted by Type, Task and Date, and "tasks", a
+                       dictionary of (task type, task number) -> (offset,
+                       length) of the task's rows in the frame
+    """
+    daily_df = pl.concat(
+        [
+            df.lazy().select(
+                pl.lit(task_type).alias("Type"),
+                pl.col(task_type).cast(pl.Utf8).alias("Task"),
+                pl.col(TS_COLUMNS[0]),
+                pl.col(TS_COLUMNS[1]).cast(pl.Utf8),
+                pl.col(TS_COLUMNS[2]),
+            ).filter(
+                pl.col("Task").is_not_null()
+            )
+            for task_type in TASK_TYPES
+            if task_type in df.columns
+        ],
+    ).group_by(
+        ["Type", "Task", TS_COLUMNS[0], TS_COLUMNS[1]]
+    ).agg(
+        HOURS_SUM
+    ).collect()
+
+    hours_cube = {}
+    for level in dict.fromkeys(CUBE_LEVELS.values()):
+        # Each level's buckets fit inside the coarser groupings built on it
+        level_df = daily_df.lazy().with_columns(
+            pl.col(TS_COLUMNS[0]).dt.truncate(level)
+        ).group_by(
+            ["Type", "Task", TS_COLUMNS[0], TS_COLUMNS[1]]
+        ).agg(
+            HOURS_SUM
+        ).sort(
+            ["Type", "Task", TS_COLUMNS[0]]
+        ).collect()
+
+        tasks_df = level_df.with_row_index("row").group_by(
+            ["Type", "Task"], maintain_order=True
+        ).agg(
+            pl.col("row").first().alias("offset"),
+            pl.len().alias("length"),
+        )
+        hours_cube[level] = {
+            "frame": level_df,
+            "tasks": {
+                (task_type, task): (offset, length)
+                for task_type, task, offset, length in tasks_df.iter_rows()
+            },
+        }
+
+    return hours_cube
+
+
+def _cube_slices(
+    cube_level: dict,
+    task_type: str,
+    task_numbers: list[str],
+    first_date: dt.date | None = None,
+    after_date: dt.date | None = None,
+) -> list[pl.DataFrame]:
+    # Rows of each task between first_date and after_date (exclusive). Dates
+    # are sorted within a task, so each range is two binary searches.
+    frame = cube_level["frame"]
+    slices = []
+    for task in dict.fromkeys(task_numbers):
+        offset, length = cube_level["tasks"].get((task_type, task), (0, 0))
+        task_df = frame.slice(offset, length)
+        first, last = 0, length
+        if first_date is not None:
+            first = task_df[TS_COLUMNS[0]].search_sorted(
+                first_date, side="left"
+            )
+        if after_date is not None:
+            last = task_df[TS_COLUMNS[0]].search_sorted(
+                after_date, side="left"
+            )
+        if last > first:
+            slices.append(task_df.slice(first, last - first))
+
+    return slices
+
+
+def cube_hours(
+    hours_cube: dict,
+    task_type: str,
+    task_numbers: list[str],
+    start_date: dt.date,
+    end_date: dt.date,
+    date_grouping: str,
+) -> pl.DataFrame:
+    """
+    Function that sums a task selection's hours per date group from an hours
+    cube. Date groups inside the range come from the level the grouping is
+    rolled up from, the partial groups at either end from the daily level,
+    so the sums match grouping the entries between the dates.
+    :param hours_cube: Output from build_hours_cube
+    :param task_type: "ECR", "EWR", "NPR", "Models"
+    :param task_numbers: List of strings of numbers representing specific task
+    :param start_date: dt.date representing the start of the period
+    :param end_date: dt.date representing the end of the period (inclusive)
+    :param date_grouping: One of DATE_GROUPINGS
+    return hours_df: DataFrame with Task, Date (start of the date group),
+                     Engineer and Time columns, one row per task, date group
+                     and engineer with hours
+    """
+    after_end = end_date + dt.timedelta(days=1)
+    bounds = pl.Series([start_date, after_end]).dt.truncate(date_grouping)
+    # First and after last date of the whole date groups in the range
+    inner_start = bounds[0]
+    if inner_start < start_date:
+        inner_start = pl.Series([inner_start]).dt.offset_by(
+            date_grouping
+        )[0]
+    inner_end = max(bounds[1], inner_start)
+
+    slices = _cube_slices(
+        hours_cube[CUBE_LEVELS[date_grouping]],
+        task_type,
+        task_numbers,
+        inner_start,
+        inner_end,
+    )
+    for first_date, after_date in [
+        (start_date, min(inner_start, after_end)),
+        (max(inner_end, start_date), after_end),
+    ]:
+        slices += _cube_slices(
+            hours_cube["1d"], task_type, task_numbers, first_date, after_date
+        )
+
+    hours_df = pl.concat(
+        slices or [hours_cube["1d"]["frame"].clear()]
+    ).lazy().with_columns(
+        pl.col(TS_COLUMNS[0]).dt.truncate(date_grouping)
+    ).group_by(
+        ["Task", TS_COLUMNS[0], TS_COLUMNS[1]]
+    ).agg(
+        HOURS_SUM
+    ).collect()
+
+    return hours_df
+
+
+def cube_task_specific_metrics(
+    hours_cube: dict,
+    task_type: str,
+    task_numbers: list[str],
+    start_date: dt.date,
+    end_date: dt.date,
+    date_grouping: str,
+    engineer_names: dict | None = None,
+) -> (pl.DataFrame, str):
+    """
+    Function that does task_specific_metrics from an hours cube
+    :param hours_cube: Output from build_hours_cube
+    :param task_type: "ECR", "EWR", "NPR", "Models"
+    :param task_numbers: List of strings of numbers representing specific task
+    :param start_date: dt.date representing the start of the period
+    :param end_date: dt.date representing the end of the period
+    :param date_grouping: str representing the grouping for dates
+    :param engineer_names: See task_specific_metrics
+    return stats_df: See task_specific_metrics, sorted by Date
+    return date_grouping: Str representing how the dates are grouped
+    """
+    date_grouping = cap_date_grouping(date_grouping, start_date, end_date)
+
+    grouped_df = cube_hours(
+        hours_cube,
+        task_type,
+        task_numbers,
+        start_date,
+        end_date,
+        date_grouping,
+    ).group_by(
+        [TS_COLUMNS[0], TS_COLUMNS[1]]
+    ).agg(
+        HOURS_SUM
+    ).sort(
+        TS_COLUMNS[0]
+    )
+
+    stats_df = pivot_engineer_hours(
+        grouped_df, [TS_COLUMNS[0]], engineer_names
+    )
+
+    return stats_df, date_grouping
+
+
+def cached_task_specific_metrics(
+    version: str,
+    hours_cube: dict,
+    task_type: str,
+    task_numbers: list[str],
+    start_date: dt.date,
+    end_date: dt.date,
+    date_grouping: str,
+    engineer_names: dict | None = None,
+) -> (pl.DataFrame, str, dict):
+    """
+    Function that does cube_task_specific_metrics and build_totals_dict
+    through METRICS_CACHE, so flipping back to a task already viewed is a
+    lookup.
+    :param version: Dataset version id that hours_cube was built from
+    :param hours_cube: Output from build_hours_cube, through
+                       dataset_functions.get_team_derived
+    :param task_type: "ECR", "EWR", "NPR", "Models"
+    :param task_numbers: List of strings of numbers representing specific task
+    :param start_date: dt.date representing the start of the period
+    :param end_date: dt.date representing the end of the period
+    :param date_grouping: str representing the grouping for dates
+    :param engineer_names: See task_specific_metrics, the team's engineers
+    return stats_df: DataFrame containing the time each engineer spent on each
+                     task.
+    return date_grouping: Str representing how the dates are grouped
+    return totals_dict: Output from build_totals_dict for stats_df
+    """
+    key = (
+        version,
+        task_type,
+        tuple(sorted(task_numbers)),
+        start_date,
+        end_date,
+        date_grouping,
+        # Teams never share engineers, so this also tells teams apart
+        None if engineer_names is None else tuple(engineer_names.items()),
+    )
+
+    def compute():
+        stats_df, time_groups = cube_task_specific_metrics(
+            hours_cube,
+            task_type,
+            task_numbers,
+            start_date,
+            end_date,
+            date_grouping,
+            engineer_names,
+        )
+        return stats_df, time_groups, build_totals_dict(stats_df)
+
+    return METRICS_CACHE.get_or_compute(key, compute)
+
+
+def cube_task_comparison_metrics(
+    hours_cube: dict,
+    task_type: str,
+    task_numbers: list[str],
+    start_date: dt.date,
+    end_date: dt.date,
+    date_grouping: str,
+    engineer_names: dict | None = None,
+) -> (pl.DataFrame, str):
+    """
+    Function that does task_specific_metrics for each task separately from an
+    hours cube, with every task grouped in the same pass
+    :param hours_cube: Output from build_hours_cube
+    :param task_type: "ECR", "EWR", "NPR", "Models"
+    :param task_numbers: List of strings of numbers representing specific task
+    :param start_date: dt.date representing the start of the period
+    :param end_date: dt.date representing the end of the period
+    :param date_grouping: str representing the grouping for dates
+    :param engineer_names: See task_specific_metrics
+    return comparison_df: DataFrame with Date and Task columns and one column
+                          of hours per engineer in engineer_names, one row per
+                          task and date group with hours
+    return date_grouping: Str representing how the dates are grouped
+    """
+    date_grouping = cap_date_grouping(date_grouping, start_date, end_date)
+
+    grouped_df = cube_hours(
+        hours_cube,
+        task_type,
+        task_numbers,
+        start_date,
+        end_date,
+        date_grouping,
+    )
+    comparison_df = pivot_engineer_hours(
+        grouped_df, [TS_COLUMNS[0], "Task"], engineer_names
+    ).sort(
+        ["Task", TS_COLUMNS[0]]
+    )
+
+    return comparison_df, date_grouping
+
+
+def build_task_totals(comparison_df: pl.DataFrame) -> pl.DataFrame:
+    """
+    Function that totals each task's hours from cube_task_comparison_metrics
+    :param comparison_df: Output from cube_task_comparison_metrics
+    return task_totals_df: DataFrame with a Task column, one column of hours
+                           per engineer and a Total column, one row per task
+    """
+    engineer_cols = comparison_df.columns[2:]
+    task_totals_df = comparison_df.group_by(
+        "Task", maintain_order=True
+    ).agg(
+        pl.col(engineer_cols).sum().round(2)
+    ).with_columns(
+        pl.sum_horizontal(engineer_cols).round(2).alias("Total")
+    )
+
+    return task_totals_df
+
+
+def cached_task_comparison_metrics(
+    version: str,
+    hours_cube: dict,
+    task_type: str,
+    task_numbers: list[str],
+    start_date: dt.date,
+    end_date: dt.date,
+    date_grouping: str,
+    engineer_names: dict | None = None,
+) -> (pl.DataFrame, str, pl.DataFrame, dict):
+    """
+    Function that does cube_task_comparison_metrics, build_task_totals and
+    build_totals_dict through METRICS_CACHE
+    :param version: Dataset version id that hours_cube was built from
+    :param hours_cube: Output from build_hours_cube, through
+                       dataset_functions.get_team_derived
+    :param task_type: "ECR", "EWR", "NPR", "Models"
+    :param task_numbers: List of strings of numbers representing specific task
+    :param start_date: dt.date representing the start of the period
+    :param end_date: dt.date representing the end of the period
+    :param date_grouping: str representing the grouping for dates
+    :param engineer_names: See task_specific_metrics, the team's engineers
+    return comparison_df: Output from cube_task_comparison_metrics
+    return date_grouping: Str representing how the dates are grouped
+    return task_totals_df: Output from build_task_totals
+    return totals_dict: Output from build_totals_dict over every task
+    """
+    key = (
+        version,
+        "comparison",
+        task_type,
+        tuple(sorted(task_numbers)),
+        start_date,
+        end_date,
+        date_grouping,
+        None if engineer_names is None else tuple(engineer_names.items()),
+    )
+
+    def compute():
+        comparison_df, time_groups = cube_task_comparison_metrics(
+            hours_cube,
+            task_type,
+            task_numbers,
+            start_date,
+            end_date,
+            date_grouping,
+            engineer_names,
+        )
+        task_totals_df = build_task_totals(comparison_df)
+        totals_dict = build_totals_dict(task_totals_df.drop("Total"))
+        return comparison_df, time_groups, task_totals_df, totals_dict
+
+    return METRICS_CACHE.get_or_compute(key, compute)
+
+
+def build_range_index(
+    hours_cube: dict,
+    task_type: str,
+    task_numbers: list[str],
+    engineer_names: dict | None = None,
+) -> dict:
+    """
+    Function that builds a prefix-sum index of daily hours for a task
+    selection, so the hours inside any date range come from two binary
+    searches per engineer instead of a pass over the data.
+    :param hours_cube: Output from build_hours_cube
+    :param task_type: "ECR", "EWR", "NPR", "Models"
+    :param task_numbers: List of strings of numbers representing specific task
+    :param engineer_names: See task_specific_metrics
+    return range_index: Dictionary of engineer name -> (sorted list of dates,
+                        list of cumulative hours starting at 0)
+    """
+    # The selected tasks' daily rows, no entries are read
+    slices = _cube_slices(hours_cube["1d"], task_type, task_numbers)
+    daily_df = pl.concat(
+        slices or [hours_cube["1d"]["frame"].clear()]
+    ).group_by(
+        [TS_COLUMNS[1], TS_COLUMNS[0]]
+    ).agg(
+        HOURS_SUM
+    ).sort(
+        TS_COLUMNS[0]
+    )
+
+    range_index = {}
+    if engineer_names is None:
+        engineer_names = ENGINEER_NAMES
+    for eng, name in engineer_names.items():
+        eng_df = daily_df.filter(pl.col(TS_COLUMNS[1]) == eng)
+        cumulative = [0.0] + eng_df[TS_COLUMNS[2]].cum_sum().to_list()
+        range_index[name] = (eng_df[TS_COLUMNS[0]].to_list(), cumulative)
+
+    return range_index
+
+
+def range_totals_dict(
+    range_index: dict,
+    start_date: dt.date,
+    end_date: dt.date,
+) -> dict:
+    """
+    Function that does build_totals_dict for a date range using a prefix-sum
+    index
+    :param range_index: Output from build_range_index
+    :param start_date: dt.date representing the start of the period
+    :param end_date: dt.date representing the end of the period (inclusive)
+    return totals_dict: Dictionary containing total hours worked by department
+                        and each engineer
+    """
+    totals_dict = {"Department": 0}
+    for name, (dates, cumulative) in range_index.items():
+        first = bisect_left(dates, start_date)
+        last = bisect_right(dates, end_date)
+        # Rounded so the subtraction doesn't show floating point noise
+        totals_dict[name] = round(cumulative[last] - cumulative[first], 2)
+
+    totals_dict["Department"] = round(sum(list(totals_dict.values())[1:]), 2)
+
+    return totals_dict
+
+
+def cached_range_totals_dict(
+    version: str,
+    hours_cube: dict,
+    task_type: str,
+    task_numbers: list[str],
+    start_date: dt.date,
+    end_date: dt.date,
+    engineer_names: dict | None = None,
+) -> dict:
+    """
+    Function that does range_totals_dict with the task selection's range
+    index kept in METRICS_CACHE, so zooming the graph only does the lookups.
+    :param version: Dataset version id that hours_cube was built from
+    :param hours_cube: Output from build_hours_cube, through
+                       dataset_functions.get_team_derived
+    :param task_type: "ECR", "EWR", "NPR", "Models"
+    :param task_numbers: List of strings of numbers representing specific task
+    :param start_date: dt.date representing the start of the period
+    :param end_date: dt.date representing the end of the period (inclusive)
+    :param engineer_names: See task_specific_metrics, the team's engineers
+    return totals_dict: Dictionary containing total hours worked by department
+                        and each engineer
+    """
+    key = (
+        version,
+        "range_index",
+        task_type,
+        tuple(sorted(task_numbers)),
+        None if engineer_names is None else tuple(engineer_names.items()),
+    )
+    range_index = METRICS_CACHE.get_or_compute(
+        key,
+        lambda: build_range_index(
+            hours_cube, task_type, task_numbers, engineer_names
+        ),
+    )
+
+    return range_totals_dict(range_index, start_date, end_date)
@@ -1,9 +1,19 @@
 #!python3.11
 
 import os
+import datetime as dt
+from typing import Callable
 import polars as pl
 from dotenv import load_dotenv
-from .global_vars import TS_COLUMNS
+from . import page_functions as pfu
+from . import metrics_functions as mfu
+from .cache_functions import DayRangeCache
+from .global_vars import (
+    TS_COLUMNS,
+    ENGINEER_NAMES,
+    TASK_CATEGORY_RULES,
+    HOURS_SUM,
+)
 
 load_dotenv()
 DATABASE = os.environ.get("DATABASE")
@@ -12,82 +22,224 @@ DB_PASSWORD = os.environ.get("DB_PASSWORD")
 DB_HOST = os.environ.get("DB_HOST")
 DB_PORT = os.environ.get("DB_PORT")
 TS_TABLE = os.environ.get("TS_TABLE")
+# Days per query when a long range is totaled piece by piece
+ALLOCATION_CHUNK_DAYS = int(os.environ.get("ALLOCATION_CHUNK_DAYS", "31"))
+# Seconds the daily totals of the last ALLOCATION_VOLATILE_DAYS days are
+# reused before they are queried again, older days are reused until evicted
+ALLOCATION_CACHE_SECONDS = int(
+    os.environ.get("ALLOCATION_CACHE_SECONDS", "900")
+)
+ALLOCATION_VOLATILE_DAYS = int(
+    os.environ.get("ALLOCATION_VOLATILE_DAYS", "14")
+)
 
+DAILY_HOURS_CACHE = DayRangeCache(
+    {
+        TS_COLUMNS[0]: pl.Date,
+        TS_COLUMNS[1]: pl.Utf8,
+        **{rule[0]: pl.Float64 for rule in TASK_CATEGORY_RULES},
+    },
+    date_column=TS_COLUMNS[0],
+    ttl=ALLOCATION_CACHE_SECONDS,
+    volatile_days=ALLOCATION_VOLATILE_DAYS,
+)
+mfu.watch_cache("daily_hours", DAILY_HOURS_CACHE.stats)
 
-def find_task_type_hours(df: pl.DataFrame):
+
+def task_category_expr() -> pl.Expr:
+    """
+    Function that builds an expression classifying each timesheet entry into
+    one of the categories in TASK_CATEGORY_RULES
+    return category: Polars expression evaluating to the category name, null
+                     for entries that match no category
+    """
+    category = pl  # pl.when for the first rule, then chained .when calls
+    for name, task_col, null_cols in TASK_CATEGORY_RULES:
+        condition = pl.lit(True)
+        if task_col is not None:
+            condition = condition & pl.col(task_col).is_not_null()
+        if null_cols:
+            condition = condition & pl.all_horizontal(
+                pl.col(null_cols).is_null()
+            )
+        category = category.when(condition).then(pl.lit(name))
+
+    return category.otherwise(None).alias("Category")
+
+
+def find_task_type_hours(
+    df: pl.DataFrame,
+    engineer_names: dict | None = None,
+) -> pl.DataFrame:
     """
     Function that takes the output from query_ts_table and returns a DataFrame
-    with 5 columns (Engineer, ECR, EWR, NPR, Meetings, Miscellaneous)
+    with an Engineer column and one column of hours per category in
+    TASK_CATEGORY_RULES (ECR, EWR, NPR, NCR, TR, EN, Model, Meetings, Misc.)
     :param df: Output from page_functions/query_ts_table
+    :param engineer_names: See format_task_type_hours
+    return stats_df: DataFrame containing the time each engineer spent on each
+                     task.
+    """
+    # Classify every entry once, then total the hours in a single pass
+    grouped_df = df.with_columns(
+        task_category_expr()
+    ).filter(
+        pl.col("Category").is_not_null()
+    ).group_by(
+        [TS_COLUMNS[1], "Category"]
+    ).agg(
+        HOURS_SUM
+    )
+
+    hours_df = grouped_df.with_columns(
+        pl.col(TS_COLUMNS[1], "Category").cast(pl.Utf8)
+    ).pivot(
+        index=TS_COLUMNS[1],
+        columns="Category",
+        values=TS_COLUMNS[2],
+        aggregate_function=None,
+    )
+
+    return format_task_type_hours(hours_df, engineer_names)
+
+
+def format_task_type_hours(
+    hours_df: pl.DataFrame,
+    engineer_names: dict | None = None,
+) -> pl.DataFrame:
+    """
+    Function that puts per engineer category totals into the shape the Time
+    Allocation graph expects.
+    :param hours_df: DataFrame with an Engineer column holding usernames and a
+                     column of hours for some or all of the categories. The
+                     pivot in find_task_type_hours or the output of
+                     page_functions.query_task_type_hours_between_dates
+    :param engineer_names: Dictionary of username -> display name for the
+                           engineers that always get a bar, see
+                           roster_functions.team_engineers. Defaults to
+                           ENGINEER_NAMES.
     return stats_df: DataFrame containing the time each engineer spent on each
                      task.
     """
-    eng_dict = {
-        "ashahinian": "Andre",
-        "jbarron": "Jacob",
-        "jtorres": "Josiah",
-        "malpert": "Michael",
-    }
-
-    eng_time_dicts = []
-    for eng in list(eng_dict.keys()):
-        # Filter to only include rows for that engineer
-        eng_df = df.filter(pl.col(TS_COLUMNS[1]) == eng)
-        # Columns that need to be null to count as time spent for each task
-        ecr_null_cols = TS_COLUMNS[4:9] + [TS_COLUMNS[10]]
-        ewr_null_cols = [TS_COLUMNS[3]] + TS_COLUMNS[5:9] + [TS_COLUMNS[10]]
-        npr_null_cols = TS_COLUMNS[3:5] + TS_COLUMNS[6:9] + [TS_COLUMNS[10]]
-        misc_null_cols = TS_COLUMNS[3:9] + [TS_COLUMNS[10]]
-        # Filter engineer DataFrame for condition that the task column is not
-        # null and the null columns are null
-        ecr_df = eng_df.filter(  # ECR
-            pl.col(TS_COLUMNS[3]).is_not_null()
-            & pl.all_horizontal(pl.col(ecr_null_cols).is_null())
-        )
-        ewr_df = eng_df.filter(  # EWR
-            pl.col(TS_COLUMNS[4]).is_not_null()
-            & pl.all_horizontal(pl.col(ewr_null_cols).is_null())
-        )
-        npr_df = eng_df.filter(  # NPR
-            pl.col(TS_COLUMNS[5]).is_not_null()
-            & pl.all_horizontal(pl.col(npr_null_cols).is_null())
-        )
-        mtg_df = eng_df.filter(  # Meetings
-            pl.col(TS_COLUMNS[10]).is_not_null()
-        )
-        misc_df = eng_df.filter(  # Miscellaneous
-            pl.all_horizontal(pl.col(misc_null_cols).is_null())
-        )
-        # Find the total time spent on the task from the appropriately filtered
-        # DataFrame
-        ecr_time = ecr_df.select(  # ECR
-            pl.col(TS_COLUMNS[2])
-        ).sum()[TS_COLUMNS[2]].to_list()[0]
-        ewr_time = ewr_df.select(  # EWR
-            pl.col(TS_COLUMNS[2])
-        ).sum()[TS_COLUMNS[2]].to_list()[0]
-        npr_time = npr_df.select(  # NPR
-            pl.col(TS_COLUMNS[2])
-        ).sum()[TS_COLUMNS[2]].to_list()[0]
-        mtg_time = mtg_df.select(  # Meeting
-            pl.col(TS_COLUMNS[2])
-        ).sum()[TS_COLUMNS[2]].to_list()[0]
-        misc_time = misc_df.select(  # Miscellaneous
-            pl.col(TS_COLUMNS[2])
-        ).sum()[TS_COLUMNS[2]].to_list()[0]
-        # Build a Dictionary for the engineers time
-        eng_time_dict = {
-            "Engineer": eng_dict[eng],
-            "ECR": ecr_time,
-            "EWR": ewr_time,
-            "NPR": npr_time,
-            "Meetings": mtg_time,
-            "Misc.": misc_time,
-        }
-        # Add dictionary to the list of dictionaries
-        eng_time_dicts.append(eng_time_dict)
-
-    # Create DataFrame from list of dictionaries
-    stats_df = pl.from_dicts(eng_time_dicts)
+    categories = [rule[0] for rule in TASK_CATEGORY_RULES]
+
+    hours_df = hours_df.with_columns(pl.col(TS_COLUMNS[1]).cast(pl.Utf8))
+
+    if engineer_names is None:
+        engineer_names = ENGINEER_NAMES
+
+    # Known engineers always get a bar, anyone else in the data is added after
+    engineers = list(engineer_names.keys())
+    engineers += sorted(
+        set(hours_df[TS_COLUMNS[1]].drop_nulls().to_list()) - set(engineers)
+    )
+    stats_df = pl.DataFrame(
+        {TS_COLUMNS[1]: engineers}
+    ).join(
+        hours_df, on=TS_COLUMNS[1], how="left"
+    ).with_columns(
+        pl.col(TS_COLUMNS[1]).replace(engineer_names)  # Display names
+    )
+
+    for category in categories:
+        if category not in stats_df.columns:
+            stats_df = stats_df.with_columns(pl.lit(None).alias(category))
+
+    stats_df = stats_df.select(
+        pl.col(TS_COLUMNS[1]),
+        pl.col(categories).cast(pl.Float64).fill_null(0),
+    )
 
     return stats_df
+
+
+def split_date_range(
+    start_date: dt.date,
+    end_date: dt.date,
+    days: int = ALLOCATION_CHUNK_DAYS,
+) -> list[tuple[dt.date, dt.date]]:
+    """
+    Function that splits a date range into consecutive pieces of at most
+    days days, so a long range can be totaled with progress in between. End
+    dates are exclusive, like query_task_type_hours_between_dates.
+    :param start_date: dt.date of the first day
+    :param end_date: dt.date after the last day
+    :param days: Maximum number of days per piece
+    return ranges: List of (start, end) dt.date tuples, at least one
+    """
+    ranges = []
+    chunk_start = start_date
+    while chunk_start < end_date:
+        chunk_end = min(chunk_start + dt.timedelta(days=days), end_date)
+        ranges.append((chunk_start, chunk_end))
+        chunk_start = chunk_end
+
+    return ranges or [(start_date, end_date)]
+
+
+def combine_task_type_hours(hours_dfs: list[pl.DataFrame]) -> pl.DataFrame:
+    """
+    Function that adds up per engineer category totals from several date
+    ranges
+    :param hours_dfs: List of outputs from
+                      page_functions.query_task_type_hours_between_dates
+    return hours_df: DataFrame with one row per engineer, ready for
+                     format_task_type_hours
+    """
+    hours_df = pl.concat(
+        [df for df in hours_dfs if len(df) > 0] or hours_dfs[:1],
+        how="diagonal_relaxed",
+    )
+    categories = [col for col in hours_df.columns if col != TS_COLUMNS[1]]
+
+    return hours_df.group_by(TS_COLUMNS[1]).agg(
+        pl.col(categories).cast(pl.Float64).sum()
+    )
+
+
+def cached_task_type_hours(
+    start_date: dt.date,
+    end_date: dt.date,
+    on_progress: Callable[[int, int], None] | None = None,
+    engineers: list[str] | None = None,
+) -> pl.DataFrame:
+    """
+    Function that does page_functions.query_task_type_hours_between_dates
+    from per-day totals cached in DAILY_HOURS_CACHE. Only the days missing
+    from the cache are queried, in pieces of ALLOCATION_CHUNK_DAYS.
+    :param start_date: dt.date of the first day
+    :param end_date: dt.date after the last day
+    :param on_progress: Function called with (queries done, queries needed)
+                        before each query and once at the end. May raise to
+                        stop, e.g. when the user cancels.
+    :param engineers: Usernames to total, None for everyone. The cache holds
+                      every engineer, so teams share it.
+    return hours_df: DataFrame with one row per engineer, ready for
+                     format_task_type_hours
+    """
+    cached_df, missing = DAILY_HOURS_CACHE.get_range(start_date, end_date)
+    date_ranges = [
+        date_range
+        for gap_start, gap_end in missing
+        for date_range in split_date_range(gap_start, gap_end)
+    ]
+
+    daily_dfs = [cached_df]
+    for i, (range_start, range_end) in enumerate(date_ranges):
+        if on_progress is not None:
+            on_progress(i, len(date_ranges))
+        daily_df = pfu.query_daily_task_type_hours(range_start, range_end)
+        DAILY_HOURS_CACHE.put_range(range_start, range_end, daily_df)
+        daily_dfs.append(daily_df)
+    if on_progress is not None:
+        on_progress(len(date_ranges), len(date_ranges))
+
+    if engineers is not None:
+        daily_dfs = [
+            daily_df.filter(pl.col(TS_COLUMNS[1]).is_in(engineers))
+            for daily_df in daily_dfs
+        ]
+
+    return combine_task_type_hours(
+        [daily_df.drop(TS_COLUMNS[0]) for daily_df in daily_dfs]
+    )
@@ -1,17 +1,20 @@
 #!python3.11
 
 from dash.exceptions import PreventUpdate
-from dash import html, dcc, callback, Output, Input, register_page
+from dash import html, dcc, callback, Output, Input, State, register_page
+from dash import clientside_callback, ClientsideFunction, ALL, ctx
 import dash_bootstrap_components as dbc
 from dash_bootstrap_templates import load_figure_template
 import polars as pl
 import datetime as dt
-import plotly.express as px
-from .functions import page_functions as pfu
 from .functions import task_specific_metrics_functions as tsmfu
+from .functions import dataset_functions as dsfu
+from .functions import roster_functions as rfu
+from .functions import figure_functions as ffu
+from .functions import export_functions as efu
 from dotenv import load_dotenv
 import os
-from io import StringIO
+import re
 import json
 
 load_dotenv()
@@ -29,94 +32,171 @@ register_page(
     top_nav=True,
     path="/task-specific-metrics",
 )
-# Query all of timesheet entries
-df = pfu.query_ts_table(f"SELECT * FROM {TS_TABLE}")
-json_data = df.write_json()  # Convert to JSON to use in dcc.Store object
-
-
-layout = html.Div([
-    dcc.Store(id="df-store", data=json_data),
-    dbc.Row(
-        [
-            dbc.Col(
-                html.Div(
-                    children=[
-                        html.H1("Task Specific Metrics"),
-                        dcc.Dropdown(
-                            ["ECR", "EWR", "NPR", "Model", "Meetings"],
-                            placeholder="Select Task Type",
-                            id="task-type-dropdown",
-                            style={"margin-bottom": "15px"},
-                        ),
-                        dcc.Dropdown(
-                            placeholder="Select Task Number",
-                            id="task-numbers-dropdown",
-                            value=[],
-                            style={"margin-bottom": "15px"},
-                            multi=True,
-                        ),
-                        dcc.DatePickerRange(
-                            id="task-date-picker-range",
-                        ),
-                        html.H3("Time Frame Grouping"),
-                        dbc.RadioItems(
-                            options=[
-                                {"label": "Daily", "value": "1d"},
-                                {"label": "Weekly", "value": "1w"},
-                                {"label": "Monthly", "value": "1mo"},
-                            ],
-                            inline=True,
-                            id="date-grouping-radioitems",
-                        ),
-                    ],
-                    className="dash-bootstrap",
-                    style={
-                        "display": "inline-block",
-                        "justifyContent": "left"
-                    },
-                ),
-                width=3,
-            ),
-            dbc.Col(
-                html.Div(
-                    children=[
-                        html.H1("Results", id="results"),
-                        html.H3(id="dpmt-total"),
-                        html.H4(id="andre-total"),
-                        html.H4(id="jacob-total"),
-                        html.H4(id="josiah-total"),
-                        html.H4(id="michael-total"),
-                    ],
-                    className="dash-bootstrap",
-                    style={
-                        "display": "inline-block",
-                        "justifyContent": "left"
-                    },
+# Load timesheet entries in the background so the worker starts immediately
+dsfu.start_warmup()
+
+
+def layout():
+    # The DataFrame stays server side, the dcc.Store only holds its version id
+    last_refreshed = dsfu.last_refreshed()
+    if last_refreshed is None:
+        refreshed_str = "Data loading..."
+    else:
+        refreshed_str = (
+            f"Data last refreshed: {last_refreshed.strftime('%m/%d/%Y %H:%M')}"
+        )
+    version = dsfu.current_version()
+    if version is None:  # Teams come from the dataset's roster
+        teams = [rfu.DEFAULT_TEAM]
+    else:
+        teams = rfu.team_names(dsfu.get_roster(version))
+
+    return html.Div([
+        dcc.Store(id="df-store", data=version),
+        dbc.Row(
+            [
+                dbc.Col(
+                    html.Div(
+                        children=[
+                            html.H1("Task Specific Metrics"),
+                            html.P(refreshed_str, id="data-refreshed"),
+                            dcc.Dropdown(
+                                teams,
+                                value=teams[0],
+                                id="team-dropdown",
+                                clearable=False,
+                                persistence=True,
+                                style={"margin-bottom": "15px"},
+                            ),
+                            dcc.Dropdown(
+                                ["ECR", "EWR", "NPR", "Model", "Meetings"],
+                                placeholder="Select Task Type",
+                                id="task-type-dropdown",
+                                style={"margin-bottom": "15px"},
+                            ),
+                            dcc.Dropdown(
+                                placeholder="Select Task Number",
+                                id="task-numbers-dropdown",
+                                value=[],
+                                style={"margin-bottom": "15px"},
+                                multi=True,
+                            ),
+                            dcc.DatePickerRange(
+                                id="task-date-picker-range",
+                            ),
+                            html.H3("Time Frame Grouping"),
+                            dbc.RadioItems(
+                                options=[
+                                    {"label": "Daily", "value": "1d"},
+                                    {"label": "Weekly", "value": "1w"},
+                                    {"label": "Biweekly", "value": "2w"},
+                                    {"label": "Monthly", "value": "1mo"},
+                                    {"label": "Quarterly", "value": "1q"},
+                                    {"label": "Yearly", "value": "1y"},
+                                ],
+                                inline=True,
+                                id="date-grouping-radioitems",
+                            ),
+                            # One graph per task instead of their sum
+                            dbc.Switch(
+                                id="compare-switch",
+                                label="Compare tasks",
+                                value=False,
+                            ),
+                        ],
+                        className="dash-bootstrap",
+                        style={
+                            "display": "inline-block",
+                            "justifyContent": "left"
+                        },
+                    ),
+                    width=3,
                 ),
+                dbc.Col(
+                    html.Div(
+                        children=[
+                            html.H1("Results", id="results"),
+                            html.H3(id="dpmt-total"),
+                            # One header per engineer on the team, see
+                            # engineer_total_headers
+                            html.Div(id="engineer-totals"),
+                            # Links to the numbers behind the graph, see
+                            # update_export_links
+                            html.Div(
+                                children=[
+                                    html.A(
+                                        "Download hours (CSV)",
+                                        id="task-export-hours",
+                                        style={"margin-right": "15px"},
+                                    ),
+                                    html.A(
+                                        "Download entries (CSV)",
+                                        id="task-export-entries",
+                                    ),
+                                ],
+                                id="task-export-links",
+                                style={"display": "none"},
+                            ),
+                        ],
+                        className="dash-bootstrap",
+                        style={
+                            "display": "inline-block",
+                            "justifyContent": "left"
+                        },
+                    ),
+                )
+            ]
+        ),
+        # Trace names drawn in task-graph, new data for the same traces is
+        # sent as a Patch instead of a whole figure
+        dcc.Store(id="task-graph-traces", data=[]),
+        # Zooms the browser can't total from the figure, see
+        # update_totals_calc
+        dcc.Store(id="totals-fallback"),
+        dcc.Graph(
+            id="task-graph",
+            figure=ffu.build_bar_figure(  # Load Page with Empty Bar Graph
+                [], {}, "Task Workflow"
             )
-        ]
-    ),
-    dcc.Graph(
-        id="task-graph",
-        figure=px.bar(  # Load Page with Empty Bar Graph
-            template="darkly",
-            title="Task Workflow",
+        ),
+        # Hours per task when comparing tasks
+        html.Div(id="task-comparison-table", className="m-4"),
+    ])
+
+
+def engineer_total_headers(engineer_names: dict, totals_dict: dict) -> list:
+    """
+    Function that builds the per engineer totals under Results
+    :param engineer_names: Output from roster_functions.team_engineers
+    :param totals_dict: Output from task_specific_metrics_functions
+                        build_totals_dict or range_totals_dict
+    return headers: List of html.H4, ids indexed by display name so the
+                    zoom callbacks can update them all at once
+    """
+    return [
+        html.H4(
+            f"{name}: {totals_dict.get(name, 0)} Hours",
+            id={"type": "engineer-total", "index": name},
         )
-    )
-])
+        for name in engineer_names.values()
+    ]
 
 
 @callback(  # Populates Task Numbers Dropdown
     Output("task-numbers-dropdown", "options"),
     Input("task-type-dropdown", "value"),
+    Input("team-dropdown", "value"),
     Input("df-store", "data"),
 )
-def find_task_specific_projects(value, data):
+def find_task_specific_projects(value, team, data):
     if not value:  # No value selected from task type dropdown
         return []
     else:  # Selected a task type
-        df = pl.read_json(StringIO(data))  # Create a DataFrame again
-        tasks = tsmfu.find_unique_tasks(df, value)  # Find unique tasks
+        # Task index is built once per dataset version and team
+        task_index = dsfu.get_team_derived(
+            data, team, "task_index", tsmfu.build_task_index
+        )
+        tasks = tsmfu.find_unique_tasks_from_index(task_index, value)
 
         return tasks  # Populate second dropdown
 
@@ -129,15 +209,18 @@ def find_task_specific_projects(value, data):
     Output("date-grouping-radioitems", "value"),
     Input("task-type-dropdown", "value"),
     Input("task-numbers-dropdown", "value"),
+    Input("team-dropdown", "value"),
     Input("df-store", "data"),
 )
-def populate_date_picker_range(task_type, task_numbers, data):
+def populate_date_picker_range(task_type, task_numbers, team, data):
     if not task_type or len(task_numbers) == 0:
         return (None, None, None, None, None)
     else:  # Selected a task type
-        df = pl.read_json(StringIO(data))  # Create a DataFrame again
-        start_date, end_date, date_grouping = tsmfu.find_task_dates(
-            df, task_type, task_numbers
+        task_index = dsfu.get_team_derived(
+            data, team, "task_index", tsmfu.build_task_index
+        )
+        start_date, end_date, date_grouping = tsmfu.find_task_dates_from_index(
+            task_index, task_type, task_numbers
         )
 
         return (
@@ -151,18 +234,20 @@ def populate_date_picker_range(task_type, task_numbers, data):
 
 @callback(
     Output("task-graph", "figure"),
+    Output("task-graph-traces", "data"),
     Output("results", "children", allow_duplicate=True),
     Output("dpmt-total", "children", allow_duplicate=True),
-    Output("andre-total", "children", allow_duplicate=True),
-    Output("jacob-total", "children", allow_duplicate=True),
-    Output("josiah-total", "children", allow_duplicate=True),
-    Output("michael-total", "children", allow_duplicate=True),
+    Output("engineer-totals", "children"),
+    Output("task-comparison-table", "children"),
     Input("task-type-dropdown", "value"),
     Input("task-numbers-dropdown", "value"),
     Input("task-date-picker-range", "start_date"),
     Input("task-date-picker-range", "end_date"),
     Input("date-grouping-radioitems", "value"),
+    Input("team-dropdown", "value"),
+    Input("compare-switch", "value"),
     Input("df-store", "data"),
+    State("task-graph-traces", "data"),
     prevent_initial_call=True,
 )
 def create_task_graph(
@@ -171,75 +256,195 @@ def create_task_graph(
     start_date,
     end_date,
     date_grouping,
+    team,
+    compare,
     data,
+    current_traces,
 ):
     # No value selected from task type dropdown
     if not task_type or len(task_numbers) == 0:
-        fig = px.bar(  # Load Page with Empty Bar Graph
-            template="darkly",
-            title="Task Workflow",
+        fig, traces = ffu.update_bar_figure(  # Empty Bar Graph
+            current_traces, [], {}, "Task Workflow"
         )
-        return fig, "Results", "", "", "", "", ""
+        return fig, traces, "Results", "", [], []
 
     else:
-        df = pl.read_json(StringIO(data))
+        version = dsfu.resolve_version(data)
+        # Daily, weekly and monthly hours of the team's tasks, built once per
+        # dataset version, so regrouping never reads the entries again
+        hours_cube = dsfu.get_team_derived(
+            version, team, "hours_cube", tsmfu.build_hours_cube
+        )
+        engineer_names = rfu.team_engineers(dsfu.get_roster(version), team)
         start_date_object = dt.date.fromisoformat(start_date)
         end_date_object = dt.date.fromisoformat(end_date)
 
-        stats_df, time_groups = tsmfu.task_specific_metrics(
-            df,
-            task_type,
-            task_numbers,
-            start_date_object,
-            end_date_object,
-            date_grouping,
-        )
-
-        fig = px.bar(
-            stats_df,
-            x="Date",
-            y=stats_df.columns[1:],
-            template="darkly",
-        )
-
-        x_label_dict = {"1d": "Days", "1w": "Weeks", "1mo": "Months"}
+        # Grouping may be coarser than picked, see MAX_DATE_BUCKETS
+        x_label_dict = {
+            "1d": "Days",
+            "1w": "Weeks",
+            "2w": "Two Week Periods",
+            "1mo": "Months",
+            "1q": "Quarters",
+            "1y": "Years",
+        }
 
-        fig.update_layout(
-            title="Task Workflow",
-            xaxis_title=x_label_dict[time_groups],
-            yaxis_title="Hours",
-        )
+        if compare and len(task_numbers) > 1:
+            # Every task is summed from the hours cube together
+            comparison_df, time_groups, task_totals_df, totals_dict = (
+                tsmfu.cached_task_comparison_metrics(
+                    version,
+                    hours_cube,
+                    task_type,
+                    task_numbers,
+                    start_date_object,
+                    end_date_object,
+                    date_grouping,
+                    engineer_names,
+                )
+            )
+            task_dfs = {  # Task -> its rows, in task order
+                task_df["Task"][0]: task_df.drop("Task")
+                for task_df in comparison_df.partition_by(
+                    "Task", maintain_order=True
+                )
+            }
+            fig = ffu.build_faceted_bar_figure(
+                {
+                    task: task_df["Date"].cast(pl.Utf8).to_list()
+                    for task, task_df in task_dfs.items()
+                },
+                {
+                    task: {
+                        col: task_df[col].to_list()
+                        for col in task_df.columns[1:]
+                    }
+                    for task, task_df in task_dfs.items()
+                },
+                "Task Workflow",
+                xaxis_title=x_label_dict[time_groups],
+                yaxis_title="Hours",
+            )
+            traces = None  # Rebuild the figure when comparing stops
+            table = ffu.build_table(
+                task_totals_df.columns, task_totals_df.rows()
+            )
+        else:
+            # Cached per dataset version, repeat views skip the computation
+            stats_df, time_groups, totals_dict = (
+                tsmfu.cached_task_specific_metrics(
+                    version,
+                    hours_cube,
+                    task_type,
+                    task_numbers,
+                    start_date_object,
+                    end_date_object,
+                    date_grouping,
+                    engineer_names,
+                )
+            )
 
-        totals_dict = tsmfu.build_totals_dict(stats_df)
+            # Only the bar data and axis title are sent when the traces match
+            fig, traces = ffu.update_bar_figure(
+                current_traces,
+                stats_df["Date"].cast(pl.Utf8).to_list(),
+                {
+                    col: stats_df[col].to_list()
+                    for col in stats_df.columns[1:]
+                },
+                "Task Workflow",
+                xaxis_title=x_label_dict[time_groups],
+                yaxis_title="Hours",
+            )
+            table = []
 
         start_date_str = start_date_object.strftime("%m/%d/%Y")
         end_date_str = end_date_object.strftime("%m/%d/%Y")
 
         return (
             fig,
+            traces,
             f"Results: {start_date_str} to {end_date_str}",
             f"Department Total: {totals_dict['Department']} Hours",
-            f"Andre: {totals_dict['Andre']} Hours",
-            f"Jacob: {totals_dict['Jacob']} Hours",
-            f"Josiah: {totals_dict['Josiah']} Hours",
-            f"Michael: {totals_dict['Michael']} Hours",
+            engineer_total_headers(engineer_names, totals_dict),
+            table,
         )
 
 
 @callback(
-    Output("results", "children"),
-    Output("dpmt-total", "children"),
-    Output("andre-total", "children"),
-    Output("jacob-total", "children"),
-    Output("josiah-total", "children"),
-    Output("michael-total", "children"),
-    Input("task-graph", "relayoutData"),
+    Output("task-export-hours", "href"),
+    Output("task-export-entries", "href"),
+    Output("task-export-links", "style"),
     Input("task-type-dropdown", "value"),
     Input("task-numbers-dropdown", "value"),
-    Input("date-grouping-radioitems", "value"),
     Input("task-date-picker-range", "start_date"),
     Input("task-date-picker-range", "end_date"),
-    Input("df-store", "data"),
+    Input("date-grouping-radioitems", "value"),
+    Input("team-dropdown", "value"),
+)
+def update_export_links(
+    task_type,
+    task_numbers,
+    start_date,
+    end_date,
+    date_grouping,
+    team,
+):
+    if not task_type or not task_numbers or not start_date or not end_date:
+        return None, None, {"display": "none"}
+
+    # Same filters as the graph, streamed by export_functions
+    filters = {
+        "team": team,
+        "task_type": task_type,
+        "task_number": task_numbers,
+        "start_date": start_date,
+        "end_date": end_date,
+    }
+
+    return (
+        efu.export_url(
+            "task-workflow", date_grouping=date_grouping, **filters
+        ),
+        efu.export_url("entries", **filters),
+        {"display": "block"},
+    )
+
+
+# Sums the bars already in the figure, see assets/task_totals.js. Zooming
+# never calls the server, but totals cover whole bars so a range that cuts a
+# weekly or monthly bar counts all of that bar's hours. A figure without the
+# bars' data hands the relayout to update_totals_calc through totals-fallback.
+clientside_callback(
+    ClientsideFunction(namespace="task_metrics", function_name="totals"),
+    Output("results", "children"),
+    Output("dpmt-total", "children"),
+    Output({"type": "engineer-total", "index": ALL}, "children"),
+    Output("totals-fallback", "data"),
+    Input("task-graph", "relayoutData"),
+    State("task-graph", "figure"),
+    State("task-date-picker-range", "start_date"),
+    State("task-date-picker-range", "end_date"),
+)
+
+
+@callback(  # Server side totals, when the browser can't sum the figure
+    Output("results", "children", allow_duplicate=True),
+    Output("dpmt-total", "children", allow_duplicate=True),
+    Output(
+        {"type": "engineer-total", "index": ALL},
+        "children",
+        allow_duplicate=True,
+    ),
+    Input("totals-fallback", "data"),
+    State("task-type-dropdown", "value"),
+    State("task-numbers-dropdown", "value"),
+    State("date-grouping-radioitems", "value"),
+    State("task-date-picker-range", "start_date"),
+    State("task-date-picker-range", "end_date"),
+    State("team-dropdown", "value"),
+    State("df-store", "data"),
+    prevent_initial_call=True,
 )
 def update_totals_calc(
     graph_data,
@@ -248,6 +453,7 @@ def update_totals_calc(
     date_grouping,
     dd_start_date,
     dd_end_date,
+    team,
     df_data,
 ):
     # There was no modification to the graph
@@ -260,22 +466,26 @@ def update_totals_calc(
         # Extract Data
         json_str = json.dumps(graph_data)
         layout_data = json.loads(json_str)
-        # Verify that the x axis was scaled
+        # Verify that the x axis was scaled, compared tasks have one x axis
+        # per task (xaxis2, xaxis3, ...) that all share a range
+        axis, _, prop = list(layout_data.keys())[0].partition(".")
+        if re.fullmatch(r"xaxis\d*", axis) is None:
+            prop = None
         # Scaled by user
-        if list(layout_data.keys())[0] == "xaxis.range[0]":
+        if prop == "range[0]":
             # Extract start and end of scaling
-            start_date_data = layout_data["xaxis.range[0]"][0:10]
+            start_date_data = layout_data[f"{axis}.range[0]"][0:10]
             start_date = dt.datetime.strptime(
                 start_date_data,
                 "%Y-%m-%d"
             ).date()
-            end_date_data = layout_data["xaxis.range[1]"][0:10]
+            end_date_data = layout_data[f"{axis}.range[1]"][0:10]
             end_date = dt.datetime.strptime(
                 end_date_data,
                 "%Y-%m-%d"
             ).date()
         # Autoscaled
-        elif list(layout_data.keys())[0] == "xaxis.autorange":
+        elif prop == "autorange":
             start_date = dt.date.fromisoformat(dd_start_date)
             end_date = dt.date.fromisoformat(dd_end_date)
         # Axis not scaled, Prevent Update
@@ -286,24 +496,33 @@ def update_totals_calc(
 
             start_date_str = start_date.strftime("%m/%d/%Y")
             end_date_str = end_date.strftime("%m/%d/%Y")
-            df = pl.read_json(StringIO(df_data))  # Create a DataFrame again
+            version = dsfu.resolve_version(df_data)
+            # Look up the team's hours cube
+            hours_cube = dsfu.get_team_derived(
+                version, team, "hours_cube", tsmfu.build_hours_cube
+            )
+            engineer_names = rfu.team_engineers(
+                dsfu.get_roster(version), team
+            )
 
-            stats_df, time_groups = tsmfu.task_specific_metrics(
-                df,
+            # Prefix sums over daily hours, a zoom is two binary searches
+            totals_dict = tsmfu.cached_range_totals_dict(
+                version,
+                hours_cube,
                 task_type,
                 task_numbers,
                 start_date,
                 end_date,
-                date_grouping,
+                engineer_names,
             )
 
-            totals_dict = tsmfu.build_totals_dict(stats_df)
-
             return (
                 f"Results: {start_date_str} to {end_date_str}",
                 f"Department Total: {totals_dict['Department']} Hours",
-                f"Andre: {totals_dict['Andre']} Hours",
-                f"Jacob: {totals_dict['Jacob']} Hours",
-                f"Josiah: {totals_dict['Josiah']} Hours",
-                f"Michael: {totals_dict['Michael']} Hours",
+                [  # In the order the headers are on the page
+                    f"{output['id']['index']}: "
+                    f"{totals_dict.get(output['id']['index'], 0)} Hours"
+                    for output in ctx.outputs_list[2]
+                ],
             )
+
@@ -1,12 +1,16 @@
 #!python3.11
 
-from dash import html, dcc, callback, Output, Input, register_page
+from dash import html, dcc, callback, Output, Input, State, register_page
+import dash_bootstrap_components as dbc
 from dash_bootstrap_templates import load_figure_template
 from datetime import date
 import datetime as dt
-import plotly.express as px
-from .functions import page_functions as pfu
 from .functions import time_allocation_functions as tafu
+from .functions import figure_functions as ffu
+from .functions import background_functions as bgfu
+from .functions import export_functions as efu
+from .functions import dataset_functions as dsfu
+from .functions import roster_functions as rfu
 from dotenv import load_dotenv
 import os
 
@@ -19,6 +23,13 @@ TS_TABLE = os.environ.get("TS_TABLE")
 
 load_figure_template("darkly")
 
+PROGRESS_ROW_STYLE = {
+    "display": "flex",
+    "justifyContent": "center",
+    "alignItems": "center",
+    "margin-top": "15px",
+}
+
 register_page(
     __name__,
     name="Time Allocation",
@@ -26,65 +37,181 @@ register_page(
     path="/time-allocation",
 )
 
-layout = html.Div([
-    html.H1(children="Division of Labor", style={"textAlign": "center"}),
-    html.Div(
-        children=[
-            dcc.DatePickerRange(
-                id="allocation-date-picker-range",
-                min_date_allowed=date(2021, 1, 1),
-                max_date_allowed=dt.datetime.now().date(),
-                initial_visible_month=dt.datetime.now().date(),
-                end_date=dt.datetime.now().date(),
-                start_date=dt.datetime.now().date() - dt.timedelta(weeks=2),
-            )
-        ],
-        className="dash-bootstrap",
-        style={"display": "flex", "justifyContent": "center"},
-    ),
-    dcc.Graph(id="graph-content", className="m-4")
-])
+
+def team_options() -> list[str]:
+    """
+    Function that lists the teams for the team dropdown
+    return teams: Team names from the cached dataset's roster, only
+                  DEFAULT_TEAM while the dataset is loading
+    """
+    version = dsfu.current_version()
+    if version is None:
+        return [rfu.DEFAULT_TEAM]
+    return rfu.team_names(dsfu.get_roster(version))
+
+
+def layout():
+    teams = team_options()
+
+    return html.Div([
+        html.H1(children="Division of Labor", style={"textAlign": "center"}),
+        html.Div(
+            children=[
+                dcc.Dropdown(
+                    teams,
+                    value=teams[0],
+                    id="allocation-team-dropdown",
+                    clearable=False,
+                    persistence=True,
+                    style={"width": "200px", "margin-right": "15px"},
+                ),
+                dcc.DatePickerRange(
+                    id="allocation-date-picker-range",
+                    min_date_allowed=date(2021, 1, 1),
+                    max_date_allowed=dt.datetime.now().date(),
+                    initial_visible_month=dt.datetime.now().date(),
+                    end_date=dt.datetime.now().date(),
+                    start_date=(
+                        dt.datetime.now().date() - dt.timedelta(weeks=2)
+                    ),
+                )
+            ],
+            className="dash-bootstrap",
+            style={"display": "flex", "justifyContent": "center"},
+        ),
+        html.Div(
+            children=[
+                html.A(
+                    "Download hours (CSV)",
+                    id="allocation-export",
+                ),
+            ],
+            style={
+                "display": "flex",
+                "justifyContent": "center",
+                "margin-top": "15px",
+            },
+        ),
+        # Shown while update_graph_content runs in the background
+        html.Div(
+            children=[
+                dbc.Progress(
+                    id="allocation-progress",
+                    value=0,
+                    max=1,
+                    style={"width": "300px", "margin-right": "15px"},
+                ),
+                dbc.Button(
+                    "Cancel",
+                    id="allocation-cancel",
+                    size="sm",
+                    color="secondary",
+                    disabled=True,
+                ),
+            ],
+            id="allocation-progress-row",
+            style={**PROGRESS_ROW_STYLE, "visibility": "hidden"},
+        ),
+        # Trace names drawn in graph-content, new data for the same traces is
+        # sent as a Patch instead of a whole figure
+        dcc.Store(id="graph-content-traces", data=[]),
+        dcc.Graph(id="graph-content", className="m-4")
+    ])
 
 
 @callback(
-    Output("graph-content", "figure"),
+    Output("allocation-export", "href"),
     Input("allocation-date-picker-range", "start_date"),
-    Input("allocation-date-picker-range", "end_date")
+    Input("allocation-date-picker-range", "end_date"),
+    Input("allocation-team-dropdown", "value"),
 )
-def update_graph_content(start_date, end_date):
+def update_export_link(start_date, end_date, team):
     if not start_date or not end_date:  # Either date is not entered
-        fig = px.bar(  # Load Page with Empty Bar Graph
-            template="darkly",
-        )
+        return None
+
+    # Same filters as the graph, streamed by export_functions
+    return efu.export_url(
+        "division-of-labor",
+        team=team,
+        start_date=start_date,
+        end_date=end_date,
+    )
 
-        fig.update_layout(
-            title="Division of Labor",
+
+@callback(
+    Output("graph-content", "figure"),
+    Output("graph-content-traces", "data"),
+    Input("allocation-date-picker-range", "start_date"),
+    Input("allocation-date-picker-range", "end_date"),
+    Input("allocation-team-dropdown", "value"),
+    State("graph-content-traces", "data"),
+    # Runs on a background thread, the request returns straight away and the
+    # browser polls for progress and the result
+    background=True,
+    manager=bgfu.BACKGROUND_MANAGER,
+    running=[
+        (Output("allocation-cancel", "disabled"), False, True),
+        (
+            Output("allocation-progress-row", "style"),
+            {**PROGRESS_ROW_STYLE, "visibility": "visible"},
+            {**PROGRESS_ROW_STYLE, "visibility": "hidden"},
+        ),
+    ],
+    cancel=[Input("allocation-cancel", "n_clicks")],
+    progress=[
+        Output("allocation-progress", "value"),
+        Output("allocation-progress", "max"),
+    ],
+)
+def update_graph_content(
+    set_progress,
+    start_date,
+    end_date,
+    team,
+    current_traces,
+):
+    if not start_date or not end_date:  # Either date is not entered
+        return ffu.update_bar_figure(  # Load Page with Empty Bar Graph
+            current_traces,
+            [],
+            {},
+            "Division of Labor",
             xaxis_title="Engineer",
             yaxis_title="Hours",
         )
-
-        return fig
     else:
         start_date_object = date.fromisoformat(start_date)
-        start_date_str = start_date_object.strftime('%Y-%m-%d')
         end_date_object = date.fromisoformat(end_date)
-        end_date_str = end_date_object.strftime('%Y-%m-%d')
-        df = pfu.query_ts_table_between_dates(start_date_str, end_date_str)
 
-        stats_df = tafu.find_task_type_hours(df)
-        eng_time_dict = stats_df.to_dict()
+        def on_progress(done, total):
+            bgfu.raise_if_cancelled()  # Cancel button stops between queries
+            set_progress((done, total))
 
-        fig = px.bar(
-            stats_df,
-            x="Engineer",
-            y=list(eng_time_dict.keys())[1:],
-            template="darkly",
+        # Daily totals are cached, Postgres is only asked for the days not
+        # seen yet, a month at a time to report progress
+        # Roster of the cached dataset if this process has one, the dataset
+        # is never loaded just for names. Otherwise (still loading, or a
+        # background worker) the roster is read on its own.
+        version = dsfu.current_version()
+        if version is None:
+            roster_df = rfu.load_roster()
+        else:
+            roster_df = dsfu.get_roster(version)
+        engineer_names = rfu.team_engineers(roster_df, team)
+        hours_df = tafu.cached_task_type_hours(
+            start_date_object,
+            end_date_object,
+            on_progress,
+            engineers=list(engineer_names.keys()),
         )
+        stats_df = tafu.format_task_type_hours(hours_df, engineer_names)
 
-        fig.update_layout(
-            title="Division of Labor",
+        # Only the bar data is sent when the categories match
+        return ffu.update_bar_figure(
+            current_traces,
+            stats_df["Engineer"].to_list(),
+            {col: stats_df[col].to_list() for col in stats_df.columns[1:]},
+            "Division of Labor",
             xaxis_title="Engineer",
             yaxis_title="Hours",
         )
-
-        return fig
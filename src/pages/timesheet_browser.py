@@ -0,0 +1,86 @@
+#!python3.11
+
+from dash.exceptions import PreventUpdate
+from dash import html, callback, Output, Input, register_page
+import dash_ag_grid as dag
+from .functions import grid_functions as gfu
+from .functions.global_vars import TS_COLUMNS
+
+register_page(
+    __name__,
+    name="Timesheet Browser",
+    top_nav=True,
+    path="/timesheet-browser",
+)
+
+
+def column_def(column: str) -> dict:
+    """
+    Function that builds the AG Grid column definition for a TS_COLUMNS
+    column. Filters only offer the types grid_functions can run in SQL.
+    :param column: Column name
+    return column_def: Dictionary for columnDefs
+    """
+    if column == TS_COLUMNS[0]:
+        grid_filter = "agDateColumnFilter"
+    elif column == TS_COLUMNS[2]:
+        grid_filter = "agNumberColumnFilter"
+    else:
+        grid_filter = "agTextColumnFilter"
+
+    return {
+        "field": column,
+        "filter": grid_filter,
+        "filterParams": {
+            "filterOptions": gfu.GRID_FILTER_OPTIONS[grid_filter],
+            "buttons": ["apply", "reset"],
+        },
+        # Keyset pagination runs on (Date, primary key) only
+        "sortable": column == TS_COLUMNS[0],
+    }
+
+
+layout = html.Div([
+    html.H1(children="Timesheet Browser", style={"textAlign": "center"}),
+    dag.AgGrid(
+        id="timesheet-grid",
+        # Rows are read from the database a block at a time as the grid
+        # scrolls, see grid_functions.query_grid_rows
+        rowModelType="infinite",
+        columnDefs=[
+            {"field": gfu.TS_PRIMARY_KEY, "hide": True},
+            *[column_def(column) for column in TS_COLUMNS],
+        ],
+        defaultColDef={"resizable": True, "floatingFilter": True},
+        getRowId=f"params.data.{gfu.TS_PRIMARY_KEY}",
+        dashGridOptions={
+            "cacheBlockSize": gfu.GRID_BLOCK_SIZE,
+            "maxBlocksInCache": 10,
+            "infiniteInitialRowCount": gfu.GRID_BLOCK_SIZE,
+            "rowBuffer": 0,
+        },
+        style={"height": "75vh"},
+        className="ag-theme-alpine m-4",  # Themed by the app's dbc-ag-grid
+    ),
+])
+
+
+@callback(
+    Output("timesheet-grid", "getRowsResponse"),
+    Input("timesheet-grid", "getRowsRequest"),
+)
+def get_timesheet_rows(request):
+    if request is None:  # Grid hasn't asked for rows yet
+        raise PreventUpdate
+
+    rows, row_count = gfu.query_grid_rows(
+        request["startRow"],
+        request["endRow"],
+        request.get("sortModel"),
+        request.get("filterModel"),
+    )
+
+    if row_count is None:  # Tells the grid there may be more rows
+        row_count = -1
+
+    return {"rowData": rows, "rowCount": row_count}
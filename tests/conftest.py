@@ -0,0 +1,7 @@
+#!python3.11
+
+import os
+import sys
+
+# The app is run from src/, so its packages are imported from there
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
@@ -0,0 +1,56 @@
+#!python3.11
+
+import datetime as dt
+import polars as pl
+from pages.functions.cache_functions import DayRangeCache
+
+SCHEMA = {"Date": pl.Date, "Hours": pl.Float64}
+
+
+def day_rows(days: list[dt.date]) -> pl.DataFrame:
+    # One hour on each day
+    return pl.DataFrame(
+        {"Date": days, "Hours": [1.0] * len(days)}, schema=SCHEMA
+    )
+
+
+def test_get_range_returns_only_the_gaps():
+    cache = DayRangeCache(SCHEMA)
+    jan = [dt.date(2020, 1, day) for day in range(1, 11)]
+    # Jan 2 had no entries, it is cached as an empty day
+    cache.put_range(jan[0], jan[3], day_rows([jan[0], jan[2]]))
+    cache.put_range(jan[5], jan[7], day_rows([jan[5], jan[6]]))
+
+    df, missing = cache.get_range(jan[0], jan[9])
+    assert missing == [(jan[3], jan[5]), (jan[7], jan[9])]
+    assert df["Date"].to_list() == [jan[0], jan[2], jan[5], jan[6]]
+
+    cache.put_range(jan[3], jan[5], day_rows([jan[4]]))
+    cache.put_range(jan[7], jan[9], day_rows([]))
+    df, missing = cache.get_range(jan[0], jan[9])
+    assert missing == []
+    assert df["Date"].to_list() == [jan[0], jan[2], jan[4], jan[5], jan[6]]
+
+
+def test_recent_days_expire_after_the_ttl():
+    today = dt.date.today()
+    old_day = today - dt.timedelta(days=30)
+    recent_day = today - dt.timedelta(days=2)
+    # ttl=0, every recent day is stale as soon as it is cached
+    cache = DayRangeCache(SCHEMA, ttl=0, volatile_days=14)
+    cache.put_range(old_day, old_day + dt.timedelta(1), day_rows([old_day]))
+    cache.put_range(
+        recent_day, recent_day + dt.timedelta(1), day_rows([recent_day])
+    )
+
+    df, missing = cache.get_range(old_day, today)
+    assert df["Date"].to_list() == [old_day]  # Older days never expire
+    assert missing == [(old_day + dt.timedelta(1), today)]
+
+    cache = DayRangeCache(SCHEMA, ttl=900, volatile_days=14)
+    cache.put_range(
+        recent_day, recent_day + dt.timedelta(1), day_rows([recent_day])
+    )
+    _, missing = cache.get_range(recent_day, recent_day + dt.timedelta(1))
+    assert missing == []  # Within the ttl
+    assert cache.stats()["hits"] == 1
@@ -0,0 +1,92 @@
+#!python3.11
+
+import time
+import threading
+import datetime as dt
+import polars as pl
+from polars.testing import assert_frame_equal
+from pages.functions import dataset_functions as dsfu
+
+
+def wait_for(condition, timeout: float = 10) -> bool:
+    # Poll until condition() is true or the timeout passes
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return condition()
+
+
+def test_failed_refresh_keeps_scheduler_running(monkeypatch):
+    calls = []
+
+    def flaky_refresh():
+        calls.append(threading.current_thread().name)
+        if len(calls) == 1:  # e.g. Postgres is down for the first refresh
+            raise ConnectionError("database unavailable")
+        return "version"
+
+    schedulers = []
+
+    class RecordedScheduler(dsfu.schedule.Scheduler):
+        def __init__(self):
+            super().__init__()
+            schedulers.append(self)
+
+    monkeypatch.setattr(dsfu, "refresh_dataset", flaky_refresh)
+    monkeypatch.setattr(dsfu, "_SCHEDULER_PID", None)
+    monkeypatch.setattr(dsfu.schedule, "Scheduler", RecordedScheduler)
+    dsfu.start_refresh_scheduler(minutes=1 / 60)  # Every second
+
+    try:
+        assert wait_for(lambda: len(calls) >= 2)
+        assert set(calls) == {"dataset-refresh"}
+    finally:
+        schedulers[0].clear()  # The thread can't be stopped, idle it
+
+
+def test_run_scheduler_survives_job_errors():
+    calls = []
+
+    def failing_job():
+        calls.append(time.monotonic())
+        raise RuntimeError("job failed")
+
+    scheduler = dsfu.schedule.Scheduler()
+    scheduler.every(1).seconds.do(failing_job)
+    threading.Thread(
+        target=dsfu.run_scheduler,
+        args=(scheduler, 0.05),
+        daemon=True,
+    ).start()
+
+    try:
+        assert wait_for(lambda: len(calls) >= 2)
+    finally:
+        scheduler.clear()
+
+
+def test_shared_dataset_round_trip(tmp_path, monkeypatch):
+    df = pl.DataFrame(
+        {
+            "Date": [dt.date(2024, 1, 2), dt.date(2024, 1, 3)],
+            "Engineer": ["a", "b"],
+            "Time": [1.5, 2.25],
+            "ECR": ["E1", None],
+            "Comments": ["first", None],
+        },
+        schema_overrides={"Time": pl.Float32},
+    ).with_columns(pl.col("Engineer", "ECR").cast(pl.Categorical))
+    monkeypatch.setattr(dsfu, "SHARED_DATASET_DIR", str(tmp_path))
+    monkeypatch.setattr(dsfu, "MAX_VERSIONS", 1)
+
+    old_path = dsfu.publish_shared_dataset(df.head(1))
+    path = dsfu.publish_shared_dataset(df)
+    assert dsfu.shared_dataset_path() == path
+    assert not (tmp_path / old_path.split("/")[-1]).exists()  # Pruned
+
+    version, mapped = dsfu.map_shared_dataset(path)
+    assert version == dsfu.dataset_version(df)
+    assert_frame_equal(mapped, df, categorical_as_str=True)
+    assert mapped.schema == df.schema
@@ -0,0 +1,49 @@
+#!python3.11
+
+import datetime as dt
+from types import SimpleNamespace
+import flask
+import polars as pl
+from werkzeug.datastructures import MultiDict
+from pages.functions import export_functions as efu
+from pages.functions import page_functions as pfu
+from pages.functions import task_specific_metrics_functions as tsmfu
+from pages.functions.global_vars import TS_COLUMNS, TS_DB_DTYPES
+
+
+def test_float32_hours_are_exported_rounded():
+    df = pfu.normalize_ts_frame(
+        pl.DataFrame(
+            {
+                TS_COLUMNS[0]: [dt.date(2024, 1, 2), dt.date(2024, 1, 3)],
+                TS_COLUMNS[1]: ["eng", "eng"],
+                TS_COLUMNS[2]: [0.1, 0.2],
+            },
+        ).with_columns(
+            pl.lit(None, dtype=dtype).alias(col)
+            for col, dtype in zip(TS_COLUMNS[3:], TS_DB_DTYPES[3:])
+        )
+    )
+    assert df.schema[TS_COLUMNS[2]] == pl.Float32
+
+    filters = efu.parse_export_args(MultiDict())
+    batch = next(efu.entry_batches(df, [(0, len(df))], filters))
+    assert batch[TS_COLUMNS[2]].to_list() == [0.1, 0.2]
+    assert b"0.1000000" not in b"".join(
+        efu.csv_chunks(iter([batch]), efu.ENTRIES_SCHEMA)
+    )
+
+    stats_df = df.select(TS_COLUMNS[0], pl.col(TS_COLUMNS[2]).alias("eng"))
+    assert tsmfu.build_totals_dict(stats_df) == {
+        "Department": 0.3,
+        "eng": 0.3,
+    }
+
+
+def test_entries_export_is_refused_from_the_rollup(monkeypatch):
+    monkeypatch.setattr(efu.dsfu, "DATASET_SOURCE", "rollup")
+    app = flask.Flask(__name__)
+    efu.register_export_routes(SimpleNamespace(server=app))  # As a Dash app
+
+    response = app.test_client().get(f"{efu.EXPORT_PATH}/entries")
+    assert response.status_code == 400
@@ -0,0 +1,93 @@
+#!python3.11
+
+import datetime as dt
+import polars as pl
+import pytest
+from pages.functions import grid_functions as gfu
+from pages.functions.cache_functions import LRUCache
+from pages.functions.global_vars import TS_COLUMNS
+
+
+def test_filter_sql_binds_every_value():
+    params = {}
+    conditions = gfu.filter_sql(
+        {
+            "Comments": {
+                "filterType": "text",
+                "type": "contains",
+                "filter": "50%_done",
+            },
+            "Time": {
+                "filterType": "number",
+                "operator": "OR",
+                "conditions": [
+                    {"filterType": "number", "type": "lessThan", "filter": 1},
+                    {
+                        "filterType": "number",
+                        "type": "inRange",
+                        "filter": 4,
+                        "filterTo": 8,
+                    },
+                ],
+            },
+            "ECR": {"filterType": "text", "type": "blank"},
+        },
+        params,
+    )
+
+    assert conditions == [
+        '"Comments" ILIKE %(p0)s',
+        '("Time" < %(p1)s OR "Time" BETWEEN %(p2)s AND %(p3)s)',
+        "(\"ECR\" IS NULL OR \"ECR\"::text = '')",
+    ]
+    # LIKE wildcards typed into the filter are matched literally
+    assert params == {"p0": "%50\\%\\_done%", "p1": 1, "p2": 4, "p3": 8}
+
+
+def test_filter_sql_rejects_unknown_columns_and_types():
+    with pytest.raises(ValueError):
+        gfu.filter_sql({"id; DROP TABLE x": {"type": "blank"}}, {})
+    with pytest.raises(ValueError):
+        gfu.filter_sql(
+            {"Comments": {"filterType": "text", "type": "regex"}}, {}
+        )
+
+
+def test_query_grid_rows_continues_from_the_last_key(monkeypatch):
+    reads = []
+
+    def read_query(q_string, params=None, schema_overrides=None, source=""):
+        reads.append((q_string, dict(params)))
+        start = 10 * (len(reads) - 1)
+        return pl.DataFrame({
+            gfu.TS_PRIMARY_KEY: list(range(start, start + 10)),
+            TS_COLUMNS[0]: [dt.date(2024, 1, 1)] * 10,
+        })
+
+    monkeypatch.setattr(gfu.pfu, "read_query", read_query)
+    monkeypatch.setattr(gfu, "_KEY_CHECKED", True)
+    monkeypatch.setattr(gfu, "GRID_CURSORS", LRUCache(8))
+
+    gfu.query_grid_rows(0, 10)
+    gfu.query_grid_rows(10, 20)
+    gfu.query_grid_rows(30, 40)  # Jumped ahead, no cursor for row 30
+
+    first, second, jump = reads
+    assert "OFFSET" not in first[0] and "cursor_date" not in first[1]
+    assert f'("Date", "{gfu.TS_PRIMARY_KEY}") < (%(cursor_date)s' in second[0]
+    assert second[1] == {"cursor_date": dt.date(2024, 1, 1), "cursor_key": 9}
+    assert "OFFSET" not in second[0]
+    assert jump[0].endswith("LIMIT 10 OFFSET 30")
+
+
+def test_primary_key_is_checked_before_the_first_block(monkeypatch):
+    def read_query(q_string, params=None, schema_overrides=None, source=""):
+        assert source == "check_primary_key"
+        return pl.DataFrame(schema={"column_name": pl.Utf8})
+
+    monkeypatch.setattr(gfu.pfu, "read_query", read_query)
+    monkeypatch.setattr(gfu, "TS_TABLE", "public.timesheet_entries")
+    monkeypatch.setattr(gfu, "_KEY_CHECKED", False)
+
+    with pytest.raises(ValueError, match="TS_PRIMARY_KEY"):
+        gfu.query_grid_rows(0, 10)
@@ -0,0 +1,57 @@
+#!python3.11
+
+import dash
+from pages.functions import metrics_functions as mfu
+from pages.functions import task_specific_metrics_functions  # noqa: F401
+from pages.functions import time_allocation_functions  # noqa: F401
+from pages.functions.cache_functions import LRUCache
+
+
+def test_cache_counters_are_rendered(monkeypatch):
+    cache = LRUCache(max_size=1)
+    monkeypatch.setitem(mfu._CACHES, "test", cache.stats)
+    cache.get("a")
+    cache.put("a", 1)
+    cache.get("a")
+    cache.put("b", 2)  # Evicts a
+
+    lines = mfu.render_metrics().splitlines()
+    assert 'cache_entries{cache="test"} 1' in lines
+    assert 'cache_hits{cache="test"} 1' in lines
+    assert 'cache_misses{cache="test"} 1' in lines
+    assert 'cache_evictions{cache="test"} 1' in lines
+    # The shared caches are reported once their modules are imported
+    for name in ("task_metrics", "daily_hours"):
+        assert any(
+            line.startswith(f'cache_entries{{cache="{name}"}}')
+            for line in lines
+        )
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = mfu.Histogram(
+        "test_duration_seconds", "Test", ("source",), buckets=(0.1, 1.0)
+    )
+    mfu.REGISTRY.remove(histogram)  # Not rendered with the app's metrics
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, source="a")
+
+    lines = histogram.render()
+    assert 'test_duration_seconds_bucket{source="a",le="0.1"} 1' in lines
+    assert 'test_duration_seconds_bucket{source="a",le="1.0"} 3' in lines
+    assert 'test_duration_seconds_bucket{source="a",le="+Inf"} 4' in lines
+    assert 'test_duration_seconds_count{source="a"} 4' in lines
+    assert 'test_duration_seconds_sum{source="a"} 6.05' in lines
+
+
+def test_metrics_route_serves_the_text_format():
+    app = dash.Dash(__name__)
+    app.layout = dash.html.Div()
+    mfu.instrument_app(app)
+
+    response = app.server.test_client().get(mfu.METRICS_PATH)
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    text = response.get_data(as_text=True)
+    assert "# TYPE db_query_duration_seconds histogram" in text
+    assert "process_resident_memory_bytes " in text
@@ -0,0 +1,156 @@
+#!python3.11
+
+import time
+import threading
+import datetime as dt
+import polars as pl
+from psycopg2.pool import PoolError
+from pages.functions import page_functions as pfu
+from pages.functions.global_vars import TS_COLUMNS, TS_DB_DTYPES
+
+
+def ts_frame(dates: list[dt.date]) -> pl.DataFrame:
+    # Timesheet entries as read from the database, one hour each
+    return pl.DataFrame(
+        {
+            TS_COLUMNS[0]: dates,
+            TS_COLUMNS[1]: ["eng"] * len(dates),
+            TS_COLUMNS[2]: [1.0] * len(dates),
+        },
+        schema={TS_COLUMNS[0]: pl.Date, TS_COLUMNS[1]: pl.Utf8,
+                TS_COLUMNS[2]: pl.Float64},
+    ).with_columns(
+        pl.lit(None, dtype=dtype).alias(col)
+        for col, dtype in zip(TS_COLUMNS[3:], TS_DB_DTYPES[3:])
+    )
+
+
+def test_mirror_watermark_skips_empty_partitions(tmp_path):
+    pfu._write_mirror_partition(
+        ts_frame([dt.date(2024, 1, 5), dt.date(2024, 1, 20)]),
+        pfu._mirror_partition_path(str(tmp_path), dt.date(2024, 1, 1)),
+    )
+    pfu._write_mirror_partition(  # Left empty by an older sync
+        ts_frame([]),
+        pfu._mirror_partition_path(str(tmp_path), dt.date(2024, 2, 1)),
+    )
+
+    assert pfu.mirror_watermark(str(tmp_path)) == dt.date(2024, 1, 20)
+
+
+def test_sync_after_deleting_newest_month(tmp_path, monkeypatch):
+    table = ts_frame(
+        [dt.date(2024, 1, 5), dt.date(2024, 1, 20), dt.date(2024, 2, 2)]
+    )
+    full_reads = []
+
+    def query_ts_table(q_string, params=None):
+        return table.filter(pl.col(TS_COLUMNS[0]) >= params["since"])
+
+    def query_ts_table_partitioned():
+        full_reads.append(True)
+        return table
+
+    monkeypatch.setattr(pfu, "query_ts_table", query_ts_table)
+    monkeypatch.setattr(
+        pfu, "query_ts_table_partitioned", query_ts_table_partitioned
+    )
+
+    pfu.sync_ts_mirror(str(tmp_path), rescan_days=14)
+    assert pfu.mirror_watermark(str(tmp_path)) == dt.date(2024, 2, 2)
+
+    # Every February entry is deleted
+    table = table.filter(pl.col(TS_COLUMNS[0]) < dt.date(2024, 2, 1))
+    pfu.sync_ts_mirror(str(tmp_path), rescan_days=14)
+    assert len(pfu._mirror_partitions(str(tmp_path))) == 1
+    assert pfu.mirror_watermark(str(tmp_path)) == dt.date(2024, 1, 20)
+
+    # Later syncs stay incremental
+    pfu.sync_ts_mirror(str(tmp_path), rescan_days=14)
+    assert full_reads == [True]
+    assert len(pfu.scan_ts_mirror(str(tmp_path)).collect()) == 2
+
+
+def test_db_connection_waits_for_a_free_connection(monkeypatch):
+    class FakeConnection:
+        autocommit = False
+
+    class FakePool:
+        # Raises like ThreadedConnectionPool once maxconn are checked out
+        def __init__(self, minconn, maxconn, **kwargs):
+            self.maxconn = maxconn
+            self.used = 0
+            self.lock = threading.Lock()
+
+        def getconn(self):
+            with self.lock:
+                if self.used == self.maxconn:
+                    raise PoolError("connection pool exhausted")
+                self.used += 1
+            return FakeConnection()
+
+        def putconn(self, conn):
+            with self.lock:
+                self.used -= 1
+
+    monkeypatch.setattr(pfu, "ThreadedConnectionPool", FakePool)
+    monkeypatch.setattr(pfu, "DB_POOL_MAX", 2)
+    monkeypatch.setattr(pfu, "_POOL", None)  # Restored with the others
+    monkeypatch.setattr(pfu, "_POOL_SLOTS", None)
+    monkeypatch.setattr(pfu, "_POOL_PID", None)
+    errors = []
+
+    def borrow():
+        try:
+            with pfu.db_connection():
+                time.sleep(0.02)
+        except PoolError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=borrow) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+
+
+def test_sync_holds_the_mirror_lock(tmp_path, monkeypatch):
+    table = ts_frame([dt.date(2024, 1, 5)])
+    entered = threading.Event()
+    release = threading.Event()
+    reads = []
+
+    def query_ts_table_partitioned():
+        reads.append("full")
+        entered.set()
+        release.wait(5)  # First sync stays inside the lock
+        return table
+
+    def query_ts_table(q_string, params=None):
+        reads.append("since")
+        return table.filter(pl.col(TS_COLUMNS[0]) >= params["since"])
+
+    monkeypatch.setattr(pfu, "query_ts_table", query_ts_table)
+    monkeypatch.setattr(
+        pfu, "query_ts_table_partitioned", query_ts_table_partitioned
+    )
+    first = threading.Thread(
+        target=pfu.sync_ts_mirror, args=(str(tmp_path),)
+    )
+    first.start()
+    assert entered.wait(5)
+    second = threading.Thread(
+        target=pfu.sync_ts_mirror, args=(str(tmp_path),)
+    )
+    second.start()
+    time.sleep(0.2)
+    assert reads == ["full"]  # Second sync waits for the first one
+    release.set()
+    first.join()
+    second.join()
+
+    # The second sync saw the first one's watermark, no second full copy
+    assert reads == ["full", "since"]
+    assert not [p for p in tmp_path.iterdir() if p.suffix == ".tmp"]
@@ -0,0 +1,147 @@
+#!python3.11
+
+import datetime as dt
+import polars as pl
+import pytest
+from pages.functions import page_functions as pfu
+from pages.functions import dataset_functions as dsfu
+from pages.functions import task_specific_metrics_functions as tsmfu
+from pages.functions.global_vars import TS_COLUMNS, TASK_TYPES
+
+TEST_TABLE = "rollup_test_entries"
+TEST_ROLLUP_TABLE = f"{TEST_TABLE}_daily_rollup"
+INSERT_SQL = (
+    f'INSERT INTO {TEST_TABLE} ("Date", "Engineer", "Time", "ECR", "EWR") '
+    "VALUES (%s, %s, %s, %s, %s)"
+)
+
+
+def execute(q_string: str, params=None) -> None:
+    with pfu.db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(q_string, params)
+
+
+@pytest.fixture
+def rollup_table(monkeypatch):
+    # Scratch timesheet table with the rollup installed on a local Postgres
+    try:
+        execute("SELECT 1")
+    except Exception:
+        pytest.skip("needs a local Postgres, see DB_* in .env")
+
+    columns = ", ".join(
+        [
+            '"Date" date',
+            '"Engineer" text',
+            '"Time" double precision',
+        ]
+        + [f'"{col}" text' for col in TS_COLUMNS[3:]]
+    )
+    execute(f"DROP TABLE IF EXISTS {TEST_TABLE} CASCADE")
+    execute(f"CREATE TABLE {TEST_TABLE} (id serial PRIMARY KEY, {columns})")
+    monkeypatch.setattr(pfu, "TS_TABLE", TEST_TABLE)
+    monkeypatch.setattr(pfu, "TS_ROLLUP_TABLE", TEST_ROLLUP_TABLE)
+
+    yield TEST_TABLE
+
+    execute(f"DROP TABLE IF EXISTS {TEST_TABLE} CASCADE")
+    execute(f"DROP TABLE IF EXISTS {TEST_ROLLUP_TABLE}")
+    for name in ["trigger", "truncate", "rebuild"]:
+        execute(f"DROP FUNCTION IF EXISTS {TEST_ROLLUP_TABLE}_{name}()")
+
+
+def expected_rollup() -> pl.DataFrame:
+    # Daily hours per task summed from the entries themselves
+    df = pfu.normalize_ts_frame(
+        pfu.query_ts_table(f"SELECT * FROM {TEST_TABLE}")
+    )
+    return pl.concat(
+        [
+            df.filter(pl.col(task_type).is_not_null()).group_by(
+                TS_COLUMNS[0], TS_COLUMNS[1], task_type
+            ).agg(
+                pl.col(TS_COLUMNS[2]).cast(pl.Float64).sum()
+            ).select(
+                pl.col(TS_COLUMNS[0]),
+                pl.col(TS_COLUMNS[1]).cast(pl.Utf8),
+                pl.lit(task_type).alias("TaskType"),
+                pl.col(task_type).cast(pl.Utf8).alias("TaskNumber"),
+                pl.col(TS_COLUMNS[2]),
+            )
+            for task_type in TASK_TYPES
+        ]
+    ).sort(pl.all())
+
+
+def test_rollup_follows_inserts_updates_and_deletes(rollup_table):
+    day = dt.date(2024, 3, 4)
+    for row in [
+        (day, "eng1", 1.5, " ecr-1 ", None),
+        (day, "eng1", 2.0, "ECR-1", "ewr-9"),
+        (day, "eng2", 0.25, "", "EWR-9"),  # Blank ECR is skipped
+    ]:
+        execute(INSERT_SQL, row)
+    pfu.install_ts_rollup()  # Backfills the rows already there
+
+    next_day = day + dt.timedelta(days=1)
+    execute(INSERT_SQL, (next_day, "eng2", 3.0, "ECR-2", None))
+    execute(
+        f'UPDATE {rollup_table} SET "Time" = 4.0, "ECR" = %s '
+        f'WHERE "Engineer" = %s AND "Time" = %s',
+        ("ECR-2", "eng1", 1.5),
+    )
+    execute(f'DELETE FROM {rollup_table} WHERE "Time" = %s', (0.25,))
+
+    rollup_df = pfu.query_ts_rollup().select(
+        pl.exclude("Entries")
+    ).sort(pl.all())
+    assert rollup_df.equals(expected_rollup())
+
+    # Filters are pushed into the query
+    ecr_df = pfu.query_ts_rollup(
+        start_date=day, end_date=day, task_type="ECR", task_numbers=["ECR-2"]
+    )
+    assert ecr_df[TS_COLUMNS[2]].to_list() == [4.0]
+
+
+def test_rollup_dataset_source_matches_table(rollup_table, monkeypatch):
+    start = dt.date(2024, 1, 1)
+    for i in range(40):
+        execute(
+            INSERT_SQL,
+            (
+                start + dt.timedelta(days=i * 3),
+                f"eng{i % 3}",
+                0.5 + i % 4,
+                f"ECR-{i % 5}",
+                f"EWR-{i % 2}" if i % 3 == 0 else None,
+            ),
+        )
+    pfu.install_ts_rollup()
+
+    table_df = pfu.normalize_ts_frame(
+        pfu.query_ts_table(f"SELECT * FROM {rollup_table}")
+    )
+    monkeypatch.setattr(dsfu, "DATASET_SOURCE", "rollup")
+    rollup_df = dsfu.load_ts_dataset()
+
+    engineer_names = {f"eng{i}": f"Engineer {i}" for i in range(3)}
+    for task_type, task_numbers in [
+        ("ECR", ["ECR-1", "ECR-3"]),
+        ("EWR", ["EWR-0"]),
+    ]:
+        for date_grouping in ["1d", "1w", "1mo"]:
+            args = (
+                task_type,
+                task_numbers,
+                start,
+                start + dt.timedelta(days=120),
+                date_grouping,
+                engineer_names,
+            )
+            expected, _ = tsmfu.task_specific_metrics(table_df, *args)
+            result, _ = tsmfu.task_specific_metrics(rollup_df, *args)
+            assert result.sort(TS_COLUMNS[0]).equals(
+                expected.sort(TS_COLUMNS[0])
+            )
@@ -0,0 +1,62 @@
+#!python3.11
+
+import datetime as dt
+import polars as pl
+from pages.functions import roster_functions as rfu
+from pages.functions.global_vars import ROSTER_COLUMNS, TEAM_COLUMN
+
+
+def roster_table() -> pl.DataFrame:
+    # As read from TS_ROSTER_TABLE, two people named Alex on one team
+    return pl.DataFrame({
+        ROSTER_COLUMNS[0]: ["alee", "akim", "bo", "cy"],
+        ROSTER_COLUMNS[1]: ["Alex", "Alex", "Bo", None],
+        ROSTER_COLUMNS[2]: ["Tooling", "Tooling", "Design", "Design"],
+    })
+
+
+def test_load_roster_fills_in_missing_engineers(monkeypatch):
+    monkeypatch.setattr(rfu.pfu, "TS_ROSTER_TABLE", "roster")
+    monkeypatch.setattr(rfu.pfu, "query_roster", roster_table)
+    monkeypatch.setattr(rfu, "DEFAULT_TEAM", "Unassigned")
+
+    roster_df = rfu.load_roster(["bo", "new"])
+
+    assert rfu.team_names(roster_df) == ["Design", "Tooling", "Unassigned"]
+    assert rfu.team_engineers(roster_df, "Tooling") == {
+        "alee": "Alex (alee)",
+        "akim": "Alex (akim)",
+    }
+    assert rfu.team_engineers(roster_df, "Design") == {"bo": "Bo", "cy": "cy"}
+    assert rfu.team_engineers(roster_df, "Unassigned") == {"new": "new"}
+
+
+def test_assign_teams_makes_one_date_sorted_slice_per_team(monkeypatch):
+    monkeypatch.setattr(rfu.pfu, "TS_ROSTER_TABLE", "roster")
+    monkeypatch.setattr(rfu.pfu, "query_roster", roster_table)
+    monkeypatch.setattr(rfu, "DEFAULT_TEAM", "Unassigned")
+    engineers = ["cy", "alee", "new", "bo", "akim", "alee", "new", "cy"]
+    df = pl.DataFrame({
+        "Date": [dt.date(2024, 1, 8 - i) for i in range(len(engineers))],
+        "Engineer": engineers,
+    }).with_columns(pl.col("Engineer").cast(pl.Categorical))
+
+    df = rfu.assign_teams(df, rfu.dataset_roster(df))
+    slices = rfu.team_slices(df)
+
+    assert list(slices) == ["Design", "Tooling", "Unassigned"]
+    assert sum(length for _, length in slices.values()) == len(df)
+    for team, (offset, length) in slices.items():
+        team_df = df.slice(offset, length)
+        assert team_df[TEAM_COLUMN].cast(pl.Utf8).unique().to_list() == [
+            team
+        ]
+        assert team_df["Date"].is_sorted()
+    assert df.slice(*slices["Tooling"])["Engineer"].cast(
+        pl.Utf8
+    ).to_list() == ["alee", "akim", "alee"]
+
+
+def test_team_slices_without_teams():
+    df = pl.DataFrame({"Date": [dt.date(2024, 1, 1)] * 3})
+    assert rfu.team_slices(df) == {rfu.DEFAULT_TEAM: (0, 3)}
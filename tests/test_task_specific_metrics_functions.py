@@ -0,0 +1,148 @@
+#!python3.11
+
+import datetime as dt
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+from benchmarks.generator import generate_ts_frame
+from pages.functions import page_functions as pfu
+from pages.functions import task_specific_metrics_functions as tsmfu
+from pages.functions.global_vars import TS_COLUMNS
+
+
+def normalized_frame(rows: int = 5000) -> pl.DataFrame:
+    # Synthetic timesheets in the shape the dataset cache holds
+    return pfu.normalize_ts_frame(
+        generate_ts_frame(rows, tasks=50, years=2)
+    )
+
+
+@pytest.fixture(scope="module")
+def task_selection() -> (pl.DataFrame, list[str], dt.date, dt.date):
+    # The ECR tasks busiest in a range cutting into weeks and months
+    df = normalized_frame()
+    start_date = df[TS_COLUMNS[0]].min() + dt.timedelta(days=200)
+    end_date = start_date + dt.timedelta(days=50)
+    tasks = df.filter(
+        pl.col("ECR").is_not_null()
+        & pl.col(TS_COLUMNS[0]).is_between(start_date, end_date)
+    ).group_by(
+        pl.col("ECR").cast(pl.Utf8)
+    ).len().sort("len", descending=True)["ECR"].head(3).to_list()
+    return df, tasks, start_date, end_date
+
+
+@pytest.mark.parametrize("date_grouping", ["1d", "1w", "1mo"])
+def test_cube_matches_task_specific_metrics(task_selection, date_grouping):
+    df, tasks, start_date, end_date = task_selection
+    hours_cube = tsmfu.build_hours_cube(df)
+
+    expected_df, expected_grouping = tsmfu.task_specific_metrics(
+        df, "ECR", tasks, start_date, end_date, date_grouping
+    )
+    stats_df, grouping = tsmfu.cube_task_specific_metrics(
+        hours_cube, "ECR", tasks, start_date, end_date, date_grouping
+    )
+
+    assert grouping == expected_grouping == date_grouping
+    assert len(stats_df) > 1
+    assert_frame_equal(
+        stats_df, expected_df.sort(TS_COLUMNS[0]), check_dtype=False,
+        atol=1e-6,
+    )
+
+
+def test_build_task_index_matches_frame():
+    df = normalized_frame()
+    task_index = tsmfu.build_task_index(df)
+
+    expected = df.filter(pl.col("ECR").is_not_null()).group_by(
+        pl.col("ECR").cast(pl.Utf8)
+    ).agg(
+        pl.col(TS_COLUMNS[0]).min().alias("first_date"),
+        pl.col(TS_COLUMNS[0]).max().alias("last_date"),
+        pl.col(TS_COLUMNS[2]).cast(pl.Float64).sum().alias("hours"),
+    )
+    assert len(task_index["ECR"]) == len(expected)
+    for row in expected.iter_rows(named=True):
+        entry = task_index["ECR"][row["ECR"]]
+        assert set(entry) == {"first_date", "last_date", "hours"}
+        assert entry["first_date"] == row["first_date"]
+        assert entry["last_date"] == row["last_date"]
+        assert abs(entry["hours"] - row["hours"]) < 1e-6
+
+
+def test_range_totals_match_build_totals_dict(task_selection):
+    df, tasks, start_date, end_date = task_selection
+    range_index = tsmfu.build_range_index(
+        tsmfu.build_hours_cube(df), "ECR", tasks
+    )
+
+    # Zoomed into part of the graph, then zoomed out to all of it
+    for first_date, last_date in [
+        (start_date + dt.timedelta(days=10), end_date - dt.timedelta(days=9)),
+        (start_date, end_date),
+    ]:
+        stats_df, _ = tsmfu.task_specific_metrics(
+            df, "ECR", tasks, first_date, last_date, "1d"
+        )
+        assert tsmfu.range_totals_dict(
+            range_index, first_date, last_date
+        ) == tsmfu.build_totals_dict(stats_df)
+
+
+def test_cap_date_grouping_keeps_to_the_bucket_budget():
+    start_date = dt.date(2020, 1, 1)
+    for days, requested, expected in [
+        (30, "1d", "1d"),  # Fits, kept
+        (365, "1d", "1w"),  # 366 days, 53 weeks
+        (365, "1mo", "1mo"),  # Coarser than needed is kept
+        (3 * 365, "1w", "1mo"),
+        (30 * 365, "1d", "1y"),
+        (365, "5d", "1w"),  # Not a grouping, the fitting one is used
+    ]:
+        end_date = start_date + dt.timedelta(days=days)
+        date_grouping = tsmfu.cap_date_grouping(
+            requested, start_date, end_date, max_buckets=60
+        )
+        assert date_grouping == expected
+        if expected != "1y":  # Coarsest there is, may still be over
+            assert tsmfu.count_date_buckets(
+                end_date - start_date, date_grouping
+            ) <= 60
+
+
+def test_task_graph_rows_stay_within_max_date_buckets(task_selection):
+    df, tasks, _, _ = task_selection
+    stats_df, date_grouping = tsmfu.task_specific_metrics(
+        df, "ECR", tasks, dt.date(2018, 1, 1), dt.date(2019, 12, 31), "1d"
+    )
+
+    assert date_grouping != "1d"
+    assert len(stats_df) <= tsmfu.MAX_DATE_BUCKETS
+
+
+def test_comparison_matches_each_task_on_its_own(task_selection):
+    df, tasks, start_date, end_date = task_selection
+    hours_cube = tsmfu.build_hours_cube(df)
+
+    comparison_df, _ = tsmfu.cube_task_comparison_metrics(
+        hours_cube, "ECR", tasks, start_date, end_date, "1w"
+    )
+    task_totals_df = tsmfu.build_task_totals(comparison_df)
+
+    assert task_totals_df["Task"].to_list() == sorted(tasks)
+    for task, total in task_totals_df.select("Task", "Total").iter_rows():
+        stats_df, _ = tsmfu.task_specific_metrics(
+            df, "ECR", [task], start_date, end_date, "1w"
+        )
+        # Engineers only on other tasks are null here, not a zero column
+        assert_frame_equal(
+            comparison_df.filter(
+                pl.col("Task") == task
+            ).drop("Task").fill_null(0),
+            stats_df.sort(TS_COLUMNS[0]).fill_null(0),
+            check_dtype=False,
+            atol=1e-6,
+        )
+        assert total == tsmfu.build_totals_dict(stats_df)["Department"]